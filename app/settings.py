@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'core',
@@ -49,6 +50,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -95,6 +97,32 @@ DATABASE_URL = os.environ.get('DATABASE_URL')
 db_from_env = dj_database_url.config(default=DATABASE_URL, conn_max_age=500, ssl_require=True)
 DATABASES['default'].update(db_from_env)
 
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Cache alias and timeout (seconds) for cached whiskey API responses
+WHISKEY_CACHE_ALIAS = 'default'
+WHISKEY_CACHE_TIMEOUT = 300
+
+# Cached token authentication: entries per process, lifetime in seconds and
+# an optional cache alias to share entries between processes. Without that
+# alias, a deleted token or changed user is still accepted by the other
+# processes for up to TOKEN_CACHE_LOCAL_TIMEOUT seconds.
+TOKEN_CACHE_MAX_SIZE = 10000
+TOKEN_CACHE_TIMEOUT = 60
+TOKEN_CACHE_LOCAL_TIMEOUT = 5
+TOKEN_CACHE_ALIAS = os.environ.get('TOKEN_CACHE_ALIAS')
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -134,11 +162,87 @@ USE_TZ = True
 # STATIC_ROOT = '/vol/web/static'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATIC_URL = '/static/'
+# Static files are collected with hashed names and compressed copies, which
+# WhiteNoise serves with far future cache headers
+STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # MEDIA_ROOT = '/vol/web/media'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
+# Media files are sent by the WSGI server with sendfile, or handed to the
+# front server when MEDIA_OFFLOAD is 'x-accel-redirect' (nginx, below the
+# internal MEDIA_OFFLOAD_PREFIX location) or 'x-sendfile' (Apache, lighttpd)
+MEDIA_OFFLOAD = os.environ.get('MEDIA_OFFLOAD', '').lower()
+MEDIA_OFFLOAD_PREFIX = '/protected-media/'
 
 AUTH_USER_MODEL = 'core.User'
 
-django_heroku.settings(locals())
\ No newline at end of file
+# JSON library used by the API renderer and parser: 'orjson' when it is
+# installed, or 'json' for the standard library
+API_JSON_LIBRARY = os.environ.get('API_JSON_LIBRARY', 'orjson')
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'whiskey.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+    ] + (['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Upper bound for the page_size query parameter on paginated endpoints
+WHISKEY_MAX_PAGE_SIZE = 500
+
+# Maximum number of whiskeys accepted by one bulk create request
+WHISKEY_BULK_MAX_ITEMS = 1000
+
+# Rows fetched per database round trip when exporting a collection
+WHISKEY_EXPORT_CHUNK_SIZE = 2000
+
+# Text search configuration and result cap for ?search= on whiskeys
+WHISKEY_SEARCH_CONFIG = 'english'
+WHISKEY_SEARCH_LIMIT = 100
+
+# Build list responses straight from values() rows instead of serializers
+WHISKEY_FAST_LIST = os.environ.get('WHISKEY_FAST_LIST', '') == '1'
+
+# Uploaded images are re-encoded by a pool of worker processes (0 processes
+# them during the request) to at most WHISKEY_IMAGE_MAX_SIZE pixels per
+# side, with a thumbnail for each of WHISKEY_IMAGE_SIZES
+WHISKEY_IMAGE_WORKERS = int(os.environ.get('WHISKEY_IMAGE_WORKERS', 2))
+WHISKEY_IMAGE_FORMAT = 'WEBP'
+WHISKEY_IMAGE_QUALITY = 80
+WHISKEY_IMAGE_MAX_SIZE = 2048
+WHISKEY_IMAGE_SIZES = (128, 512)
+
+# Uploads larger than FILE_UPLOAD_MAX_MEMORY_SIZE are streamed to a temporary
+# file. Images are validated from their header against the size, format,
+# dimension and pixel limits before anything decodes them.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+WHISKEY_IMAGE_MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+WHISKEY_IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'WEBP')
+WHISKEY_IMAGE_MAX_DIMENSION = 12000
+WHISKEY_IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+
+# Resized images served on demand are cached below MEDIA_ROOT, evicting the
+# least recently used ones past WHISKEY_IMAGE_CACHE_MAX_BYTES
+WHISKEY_IMAGE_CACHE_PATH = 'cache/whiskey'
+WHISKEY_IMAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Directories below MEDIA_ROOT served at MEDIA_URL. Content-named files in
+# MEDIA_IMMUTABLE_DIRECTORIES are never rewritten and cached by clients for
+# good, while cached variants may be evicted and are revalidated
+MEDIA_SERVED_DIRECTORIES = ('uploads', WHISKEY_IMAGE_CACHE_PATH)
+MEDIA_IMMUTABLE_DIRECTORIES = ('uploads',)
+
+# Autocomplete: users whose name indexes are kept in memory per process,
+# and the default and largest number of completions per kind
+WHISKEY_AUTOCOMPLETE_MAX_USERS = 1000
+WHISKEY_AUTOCOMPLETE_LIMIT = 10
+WHISKEY_AUTOCOMPLETE_MAX_LIMIT = 50
+
+django_heroku.settings(locals(), staticfiles=False)
\ No newline at end of file
@@ -16,12 +16,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.shortcuts import redirect
-from django.conf.urls.static import static
-from django.conf import settings
+
+from core.media import media_urlpatterns
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls')),
     path('', lambda request: redirect('api/whiskey', permanent=False)),
     path('api/whiskey/', include('whiskey.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+] + media_urlpatterns()
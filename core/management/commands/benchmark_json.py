@@ -0,0 +1,73 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer, use_orjson
+
+
+def sample_whiskeys(count):
+    """Return rows shaped like a whiskey list response"""
+    return [
+        {
+            'id': pk,
+            'brand': f'Brand {pk}',
+            'style': ('Bourbon', 'Rye', 'Scotch', 'Irish')[pk % 4],
+            'year': str(1990 + pk % 30),
+            'price': f'{20 + pk % 180}.99',
+            'link': f'https://example.com/whiskeys/{pk}',
+            'tags': list(range(pk % 5)),
+            'places': list(range(pk % 3)),
+        }
+        for pk in range(1, count + 1)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Measure JSON render and parse throughput of whiskey lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['repeat'] < 1:
+            raise CommandError('--rows and --repeat must be positive')
+
+        data = sample_whiskeys(options['rows'])
+        self.stdout.write(
+            f'{options["rows"]} whiskeys, best of {options["repeat"]} runs, '
+            f'fast backend: {"orjson" if use_orjson() else "json"}'
+        )
+        for name, renderer, parser in (
+                ('json', JSONRenderer(), JSONParser()),
+                ('fast', FastJSONRenderer(), FastJSONParser())):
+            content = renderer.render(data)
+            render = self.best(options['repeat'], renderer.render, data)
+            parse = self.best(
+                options['repeat'],
+                lambda: parser.parse(io.BytesIO(content))
+            )
+            self.stdout.write(
+                f'{name}: render {self.throughput(content, render)}, '
+                f'parse {self.throughput(content, parse)}'
+            )
+
+    def best(self, repeat, func, *args):
+        """Return the fastest of repeated calls in seconds"""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func(*args)
+            timings.append(time.perf_counter() - started)
+
+        return min(timings)
+
+    def throughput(self, content, seconds):
+        """Format the bytes per second of processing content"""
+        rate = len(content) / seconds if seconds else float('inf')
+        return f'{rate / 1e6:.1f} MB/s ({seconds * 1000:.1f} ms)'
@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from whiskey.stats import check_stats, rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or check the collection statistics of users'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='users',
+            help='Username to process, may be repeated (default: all users)'
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Report inconsistent statistics instead of rebuilding them'
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk')
+        if options['users']:
+            users = users.filter(username__in=options['users'])
+            found = set(users.values_list('username', flat=True))
+            missing = sorted(set(options['users']) - found)
+            if missing:
+                raise CommandError(
+                    f'User "{missing[0]}" does not exist'
+                )
+
+        processed = inconsistent = 0
+        for pk, username in users.values_list('pk', 'username').iterator():
+            processed += 1
+            if not options['check']:
+                rebuild_stats(pk)
+                continue
+
+            problems = check_stats(pk)
+            if problems:
+                inconsistent += 1
+            for name, (stored, actual) in sorted(problems.items()):
+                self.stdout.write(
+                    f'{username}: {name} is {stored}, expected {actual}'
+                )
+
+        if inconsistent:
+            raise CommandError(
+                f'{inconsistent} of {processed} users have inconsistent '
+                'statistics'
+            )
+        verb = 'Checked' if options['check'] else 'Rebuilt'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} statistics of {processed} users'
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from whiskey.images import image_storage, orphaned_images, storage_report
+
+
+class Command(BaseCommand):
+    help = 'Report the storage saved by image deduplication'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Delete uploaded files that no whiskey references'
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=3600,
+            help='Seconds an unreferenced file must be old to be orphaned'
+        )
+
+    def handle(self, *args, **options):
+        report = storage_report()
+        share = report['saved'] / report['referenced'] * 100 \
+            if report['referenced'] else 0.0
+        self.stdout.write(
+            f'{report["blobs"]} images shared by {report["references"]} '
+            f'whiskeys: {report["stored"]} bytes stored, '
+            f'{report["saved"]} bytes saved ({share:.1f}%)'
+        )
+
+        orphans = list(orphaned_images(options['min_age']))
+        if options['prune']:
+            for name in orphans:
+                image_storage.delete(name)
+            self.stdout.write(f'Deleted {len(orphans)} orphaned files')
+        else:
+            self.stdout.write(f'{len(orphans)} orphaned files')
@@ -0,0 +1,279 @@
+import csv
+import io
+import json
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.models import Tag, Place, Whiskey
+from core.numbers import parse_price, parse_year
+from core.signals import whiskeys_created
+
+from whiskey.cache import collection_changes, mark_collection_changed
+from whiskey.stats import OBJECT_COUNTERS, apply_changes
+
+
+NAME_SEPARATOR = '|'
+TEXT_FIELDS = ('brand', 'style', 'link')
+
+
+def read_csv(stream):
+    """Yield rows of a CSV file with a header row"""
+    for row in csv.DictReader(stream):
+        yield row
+
+
+def read_ndjson(stream):
+    """Yield rows of a newline delimited JSON file"""
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+def split_names(value):
+    """Return a list of names from a list or a separated string"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(NAME_SEPARATOR)
+
+    return [name.strip() for name in value if name and name.strip()]
+
+
+NUMBER_PARSERS = {'year': parse_year, 'price': parse_price}
+
+
+def copy_value(value):
+    """Encode a value for COPY in CSV format, where NULL is unquoted"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, int):
+        return str(value)
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+
+    return '"{}"'.format(str(value).replace('"', '""'))
+
+
+class Command(BaseCommand):
+    help = 'Import whiskeys for a user from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help='Owner username')
+        parser.add_argument('--format', choices=sorted(READERS))
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Skip the rows committed by a previous run'
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Insert with bulk_create even on PostgreSQL'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            self.user = get_user_model().objects.get(
+                username=options['user']
+            )
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" does not exist')
+
+        file_format = options['format'] or \
+            os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(f'Unsupported format "{file_format}"')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        self.use_copy = connection.vendor == 'postgresql' and \
+            not options['no_copy']
+        self.names = {Tag: {}, Place: {}}
+        self.checkpoint = f'{path}.progress'
+        skip = self.read_checkpoint() if options['resume'] else 0
+
+        imported = skipped = 0
+        started = time.monotonic()
+        with open(path, newline='', encoding='utf-8') as stream:
+            rows = islice(READERS[file_format](stream), skip, None)
+            done = skip
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+
+                with collection_changes():
+                    count = self.import_batch(batch, done)
+                done += len(batch)
+                imported += count
+                skipped += len(batch) - count
+                self.write_checkpoint(done)
+
+                self.stdout.write(
+                    f'{done} rows processed, {imported} imported '
+                    f'({self.rate(imported, started):.0f} rows/s)'
+                )
+
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} whiskeys in '
+            f'{time.monotonic() - started:.1f}s '
+            f'({self.rate(imported, started):.0f} rows/s), '
+            f'skipped {skipped}'
+        ))
+
+    def rate(self, count, started):
+        """Return the rows per second since the start time"""
+        elapsed = time.monotonic() - started
+        return count / elapsed if elapsed else 0.0
+
+    def read_checkpoint(self):
+        """Return the number of rows committed by a previous run"""
+        try:
+            with open(self.checkpoint) as checkpoint:
+                return int(checkpoint.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def write_checkpoint(self, done):
+        """Record the number of committed rows"""
+        temp = f'{self.checkpoint}.tmp'
+        with open(temp, 'w') as checkpoint:
+            checkpoint.write(str(done))
+        os.replace(temp, self.checkpoint)
+
+    def import_batch(self, batch, offset):
+        """Insert one batch of rows and return the number imported"""
+        whiskeys, tags, places = [], [], []
+        for line, row in enumerate(batch, start=offset + 1):
+            attrs = {
+                field: str(row.get(field) or '').strip()
+                for field in TEXT_FIELDS
+            }
+            if not attrs['brand'] or not attrs['style']:
+                self.stderr.write(f'Row {line}: brand and style are required')
+                continue
+            for field, parse in NUMBER_PARSERS.items():
+                value = row.get(field)
+                attrs[field] = parse(value)
+                if attrs[field] is None and value not in (None, ''):
+                    self.stderr.write(
+                        f'Row {line}: ignoring invalid {field} "{value}"'
+                    )
+            whiskeys.append(Whiskey(user=self.user, **attrs))
+            tags.append(split_names(row.get('tags')))
+            places.append(split_names(row.get('places')))
+
+        tag_ids = self.resolve_names(Tag, tags)
+        place_ids = self.resolve_names(Place, places)
+        if self.use_copy:
+            self.copy_whiskeys(whiskeys, tag_ids, place_ids)
+        else:
+            Whiskey.objects.bulk_create_with_relations(
+                whiskeys, tag_ids, place_ids
+            )
+
+        return len(whiskeys)
+
+    def resolve_names(self, model, names_per_row):
+        """Map names to ids, creating the missing objects in one batch"""
+        known = self.names[model]
+        wanted = {name for names in names_per_row for name in names}
+        missing = wanted - known.keys()
+        if missing:
+            existing = model.objects.filter(
+                user=self.user, name__in=missing
+            ).order_by('-id').values_list('name', 'id')
+            known.update(existing)
+            created = model.objects.bulk_create(
+                model(user=self.user, name=name)
+                for name in missing - known.keys()
+            )
+            apply_changes(
+                self.user.pk, **{OBJECT_COUNTERS[model]: len(created)}
+            )
+            mark_collection_changed(self.user.pk)
+            known.update(model.objects.filter(
+                user=self.user, name__in=missing - known.keys()
+            ).values_list('name', 'id'))
+
+        return [
+            list(dict.fromkeys(known[name] for name in names))
+            for names in names_per_row
+        ]
+
+    def copy_whiskeys(self, whiskeys, tag_ids, place_ids):
+        """Insert whiskeys and their relations with PostgreSQL COPY"""
+        if not whiskeys:
+            return
+
+        fields = [
+            field for field in Whiskey._meta.concrete_fields
+            if not field.primary_key
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+                "FROM generate_series(1, %s)",
+                [Whiskey._meta.db_table, len(whiskeys)]
+            )
+            for whiskey, (pk,) in zip(whiskeys, cursor.fetchall()):
+                whiskey.pk = pk
+
+            columns = ['id'] + [field.column for field in fields]
+            rows = (
+                [whiskey.pk] + [
+                    field.get_db_prep_save(
+                        field.pre_save(whiskey, True), connection
+                    )
+                    for field in fields
+                ]
+                for whiskey in whiskeys
+            )
+            self.copy(cursor, Whiskey._meta.db_table, columns, rows)
+
+            for name, related_ids in (('tags', tag_ids),
+                                      ('places', place_ids)):
+                field = Whiskey._meta.get_field(name)
+                self.copy(
+                    cursor,
+                    field.remote_field.through._meta.db_table,
+                    [field.m2m_column_name(), field.m2m_reverse_name()],
+                    (
+                        [whiskey.pk, pk]
+                        for whiskey, ids in zip(whiskeys, related_ids)
+                        for pk in ids
+                    )
+                )
+
+        whiskeys_created.send(sender=Whiskey, whiskeys=whiskeys)
+
+    def copy(self, cursor, table, columns, rows):
+        """Stream rows into a table with COPY FROM STDIN"""
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write(','.join(copy_value(value) for value in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        cursor.copy_expert(
+            'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+                connection.ops.quote_name(table),
+                ', '.join(connection.ops.quote_name(c) for c in columns)
+            ),
+            buffer
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from whiskey.images import requeue_uploads, shutdown_executor
+
+
+class Command(BaseCommand):
+    help = 'Process the image uploads a stopped server left pending'
+
+    def handle(self, *args, **options):
+        count = requeue_uploads()
+        shutdown_executor()
+        self.stdout.write(f'Processed {count} pending images')
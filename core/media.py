@@ -0,0 +1,199 @@
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+
+OFFLOAD_HEADERS = {
+    'x-accel-redirect': 'X-Accel-Redirect',
+    'x-sendfile': 'X-Sendfile',
+}
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Content-addressed names sit in a directory named after the first two
+# characters of their digest, processed images adding a suffix and
+# thumbnails the size to the stem.
+CONTENT_NAME = re.compile(
+    r'(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{38,}(?:_processed)?(?:_\d+)?\.\w+$'
+)
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Lock files and partly written files are never served
+HIDDEN_SUFFIXES = ('.lock', '.tmp')
+
+
+class FileRange:
+    """Read at most length bytes of a file from its current position
+
+    The file descriptor stays reachable, so WSGI servers that send files
+    with os.sendfile, bounded by Content-Length, still do for ranges.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def is_content_named(path):
+    """Return whether a media file is named after its content"""
+    return CONTENT_NAME.search(path) is not None
+
+
+def in_directories(path, directories):
+    """Return whether a media path lies below one of the directories"""
+    return any(
+        path.startswith(directory.rstrip('/') + '/')
+        for directory in directories
+    )
+
+
+def is_served(path):
+    """Return whether a media file may be served"""
+    return not path.endswith(HIDDEN_SUFFIXES) and \
+        in_directories(path, settings.MEDIA_SERVED_DIRECTORIES)
+
+
+def is_immutable(path):
+    """Return whether a media file never changes once written"""
+    return is_content_named(path) and \
+        in_directories(path, settings.MEDIA_IMMUTABLE_DIRECTORIES)
+
+
+def parse_range(header, size):
+    """Return the start and end of a single byte range, or None to ignore it
+
+    Raises ValueError when the range lies past the end of the file.
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if match is None or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start == '':
+        if int(end) == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - int(end), 0), size - 1
+    start = int(start)
+    if end != '' and int(end) < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    end = size - 1 if end == '' else min(int(end), size - 1)
+
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    """Return whether the If-Range header allows a partial response"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is None:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(last_modified)
+
+
+def serve_media(request, path):
+    """Serve a file below MEDIA_SERVED_DIRECTORIES
+
+    Files are handed to the front server when MEDIA_OFFLOAD is set, and
+    otherwise streamed with FileResponse, which WSGI servers send with
+    os.sendfile. Single byte ranges are honoured and content-named files
+    of MEDIA_IMMUTABLE_DIRECTORIES are cached by clients for good.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    if not is_served(path):
+        raise Http404('The file does not exist.')
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(fullpath)
+    except (OSError, SuspiciousFileOperation):
+        raise Http404('The file does not exist.')
+    if not os.path.isfile(fullpath):
+        raise Http404('The file does not exist.')
+
+    etag = quote_etag(f'{int(stat.st_mtime):x}-{stat.st_size:x}')
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        response = file_response(request, path, fullpath, stat, etag)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if is_immutable(path):
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True
+        )
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+
+    return response
+
+
+def file_response(request, path, fullpath, stat, etag):
+    """Return the content of a media file, or the part of it requested"""
+    content_type, encoding = mimetypes.guess_type(path)
+    content_type = content_type or 'application/octet-stream'
+
+    offload = OFFLOAD_HEADERS.get(settings.MEDIA_OFFLOAD)
+    if offload is not None:
+        response = HttpResponse(content_type=content_type)
+        response[offload] = fullpath if offload == 'X-Sendfile' else \
+            quote(posixpath.join(settings.MEDIA_OFFLOAD_PREFIX, path))
+        return response
+
+    byte_range = None
+    header = request.META.get('HTTP_RANGE')
+    if header is not None and request.method == 'GET' and \
+            if_range_matches(request, etag, stat.st_mtime):
+        try:
+            byte_range = parse_range(header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+    file = open(fullpath, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(
+            FileRange(file, end - start + 1), content_type=content_type,
+            status=206
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['Accept-Ranges'] = 'bytes'
+    if encoding:
+        response['Content-Encoding'] = encoding
+
+    return response
+
+
+def media_urlpatterns():
+    """Return the URL patterns serving MEDIA_URL"""
+    prefix = settings.MEDIA_URL.lstrip('/')
+
+    return [re_path(rf'^{re.escape(prefix)}(?P<path>.+)$', serve_media)]
@@ -0,0 +1,39 @@
+# Generated by Django 3.0.14 on 2026-10-17 20:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_whiskey_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='place',
+            index=models.Index(fields=['user', 'name', 'id'], name='core_place_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'name', 'id'], name='core_tag_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='whiskey',
+            index=models.Index(fields=['user', 'id'], name='core_whiskey_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='whiskey',
+            index=models.Index(fields=['user', 'brand'], name='core_whiskey_user_brand_idx'),
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX core_whiskey_tags_tag_whiskey_idx '
+            'ON core_whiskey_tags (tag_id, whiskey_id);',
+            reverse_sql='DROP INDEX core_whiskey_tags_tag_whiskey_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX core_whiskey_places_place_whiskey_idx '
+            'ON core_whiskey_places (place_id, whiskey_id);',
+            reverse_sql='DROP INDEX core_whiskey_places_place_whiskey_idx;',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-17 20:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_collection_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collectionversion',
+            name='modified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 3.0.14 on 2026-10-17 20:52
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class PostgresAddIndex(migrations.AddIndex):
+    """Add an index on PostgreSQL only, other databases keep the state"""
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+
+def populate_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("""
+        UPDATE core_whiskey SET search_vector =
+            setweight(to_tsvector('english', brand), 'A') ||
+            setweight(to_tsvector('english', style), 'B') ||
+            setweight(to_tsvector('english', COALESCE((
+                SELECT string_agg(core_tag.name, ' ')
+                FROM core_whiskey_tags
+                JOIN core_tag ON core_tag.id = core_whiskey_tags.tag_id
+                WHERE core_whiskey_tags.whiskey_id = core_whiskey.id
+            ), '')), 'C') ||
+            setweight(to_tsvector('english', COALESCE((
+                SELECT string_agg(core_place.name, ' ')
+                FROM core_whiskey_places
+                JOIN core_place ON core_place.id = core_whiskey_places.place_id
+                WHERE core_whiskey_places.whiskey_id = core_whiskey.id
+            ), '')), 'D')
+    """)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Enable pg_trgm and index brand/style when the server provides it"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX core_whiskey_brand_trgm_idx '
+        'ON core_whiskey USING gin (brand gin_trgm_ops)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX core_whiskey_style_trgm_idx '
+        'ON core_whiskey USING gin (style gin_trgm_ops)'
+    )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS core_whiskey_brand_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS core_whiskey_style_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_collection_modified_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='whiskey',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        PostgresAddIndex(
+            model_name='whiskey',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='core_whiskey_search_idx'),
+        ),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,116 @@
+# Generated by Django 3.0.14 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+from core.numbers import parse_price, parse_year
+
+
+class PostgresRunSQL(migrations.RunSQL):
+    """Run SQL on PostgreSQL only, other databases skip it"""
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+
+def parse_numbers(apps, schema_editor):
+    Whiskey = apps.get_model('core', 'Whiskey')
+    whiskeys = Whiskey.objects.exclude(price='', year='').only(
+        'price', 'year'
+    )
+    invalid = []
+    for whiskey in whiskeys.iterator():
+        whiskey.price_amount = parse_price(whiskey.price)
+        whiskey.year_number = parse_year(whiskey.year)
+        for field, number in (('price', whiskey.price_amount),
+                              ('year', whiskey.year_number)):
+            text = getattr(whiskey, field).strip()
+            if number is None and text:
+                invalid.append(f'whiskey {whiskey.pk} {field} "{text}"')
+        whiskey.save(update_fields=['price_amount', 'year_number'])
+
+    if invalid:
+        raise ValueError(
+            'These values are not numbers, fix or clear them and migrate '
+            'again: ' + ', '.join(invalid)
+        )
+
+
+def format_numbers(apps, schema_editor):
+    Whiskey = apps.get_model('core', 'Whiskey')
+    whiskeys = Whiskey.objects.exclude(
+        price_amount=None, year_number=None
+    ).only('price_amount', 'year_number')
+    for whiskey in whiskeys.iterator():
+        whiskey.price = '' if whiskey.price_amount is None \
+            else str(whiskey.price_amount)
+        whiskey.year = '' if whiskey.year_number is None \
+            else str(whiskey.year_number)
+        whiskey.save(update_fields=['price', 'year'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_whiskey_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='whiskey',
+            name='price_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='whiskey',
+            name='year_number',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(parse_numbers, format_numbers),
+        migrations.RemoveField(
+            model_name='whiskey',
+            name='price',
+        ),
+        migrations.RemoveField(
+            model_name='whiskey',
+            name='year',
+        ),
+        migrations.RenameField(
+            model_name='whiskey',
+            old_name='price_amount',
+            new_name='price',
+        ),
+        migrations.RenameField(
+            model_name='whiskey',
+            old_name='year_number',
+            new_name='year',
+        ),
+        migrations.AddIndex(
+            model_name='whiskey',
+            index=models.Index(fields=['user', 'price', 'id'], name='core_whiskey_user_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='whiskey',
+            index=models.Index(fields=['user', 'year', 'id'], name='core_whiskey_user_year_idx'),
+        ),
+        PostgresRunSQL(
+            'CREATE INDEX core_whiskey_user_price_desc_idx ON core_whiskey '
+            '(user_id, price DESC NULLS LAST, id DESC);',
+            reverse_sql='DROP INDEX core_whiskey_user_price_desc_idx;',
+        ),
+        PostgresRunSQL(
+            'CREATE INDEX core_whiskey_user_year_desc_idx ON core_whiskey '
+            '(user_id, year DESC NULLS LAST, id DESC);',
+            reverse_sql='DROP INDEX core_whiskey_user_year_desc_idx;',
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 3.0.14 on 2026-10-17 21:14
+
+import json
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def populate_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Tag = apps.get_model('core', 'Tag')
+    Place = apps.get_model('core', 'Place')
+    Whiskey = apps.get_model('core', 'Whiskey')
+    CollectionStats = apps.get_model('core', 'CollectionStats')
+    for user_id in User.objects.values_list('pk', flat=True).iterator():
+        whiskeys = Whiskey.objects.filter(user_id=user_id)
+        totals = whiskeys.aggregate(
+            whiskey_count=Count('pk'),
+            priced_count=Count('price'),
+            total_spend=Sum('price')
+        )
+        styles = whiskeys.values_list('style').annotate(
+            count=Count('pk')
+        ).order_by('style')
+        CollectionStats.objects.create(
+            user_id=user_id,
+            whiskey_count=totals['whiskey_count'],
+            priced_count=totals['priced_count'],
+            total_spend=totals['total_spend'] or 0,
+            style_counts=json.dumps(dict(styles)),
+            tag_count=Tag.objects.filter(user_id=user_id).count(),
+            place_count=Place.objects.filter(user_id=user_id).count(),
+            tag_assignments=Whiskey.tags.through.objects.filter(
+                whiskey__user_id=user_id
+            ).count(),
+            place_assignments=Whiskey.places.through.objects.filter(
+                whiskey__user_id=user_id
+            ).count()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_whiskey_numeric_price_year'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='collection_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('whiskey_count', models.PositiveIntegerField(default=0)),
+                ('priced_count', models.PositiveIntegerField(default=0)),
+                ('total_spend', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('style_counts', models.TextField(default='{}')),
+                ('tag_count', models.PositiveIntegerField(default=0)),
+                ('place_count', models.PositiveIntegerField(default=0)),
+                ('tag_assignments', models.PositiveIntegerField(default=0)),
+                ('place_assignments', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-17 21:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_collection_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='whiskey',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], max_length=10),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.0.14 on 2026-10-17 21:27
+
+import core.models
+import core.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_references(apps, schema_editor):
+    Whiskey = apps.get_model('core', 'Whiskey')
+    ImageBlob = apps.get_model('core', 'ImageBlob')
+    storage = Whiskey._meta.get_field('image').storage
+    images = Whiskey.objects.exclude(image='').exclude(image=None).values(
+        'image'
+    ).annotate(references=Count('pk')).order_by()
+    for row in images.iterator():
+        try:
+            size = storage.size(row['image'])
+        except OSError:
+            size = 0
+        ImageBlob.objects.create(
+            name=row['image'], size=size, references=row['references']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_whiskey_image_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('references', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='whiskey',
+            name='image',
+            field=models.ImageField(null=True, storage=core.storage.ContentAddressedStorage(), upload_to=core.models.whiskey_image_file_path),
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
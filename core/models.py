@@ -1,9 +1,15 @@
+import json
 import uuid
 import os
-from django.db import models
+from django.db import connections, models, transaction
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager,\
                                        PermissionsMixin
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+
+from core.signals import whiskeys_created
+from core.storage import ContentAddressedStorage
 
 
 def whiskey_image_file_path(instance, filename):
@@ -36,6 +42,44 @@ class UserManager(BaseUserManager):
         return user
 
 
+class WhiskeyManager(models.Manager):
+
+    def bulk_create_with_relations(self, whiskeys, tags, places,
+                                   batch_size=None):
+        """Insert whiskeys and their tag/place relations in batches
+
+        tags and places hold one iterable of ids per whiskey. Receivers
+        of whiskeys_created index and count the new rows, as bulk_create
+        sends no post_save.
+        """
+        with transaction.atomic(using=self.db):
+            if self._db_returns_pks():
+                whiskeys = self.bulk_create(whiskeys, batch_size=batch_size)
+            else:
+                for whiskey in whiskeys:
+                    whiskey.save(using=self.db)
+
+            for name, related_ids in (('tags', tags), ('places', places)):
+                field = self.model._meta.get_field(name)
+                through = field.remote_field.through
+                column = field.m2m_reverse_name()
+                through.objects.using(self.db).bulk_create(
+                    [
+                        through(whiskey_id=whiskey.pk, **{column: pk})
+                        for whiskey, ids in zip(whiskeys, related_ids)
+                        for pk in ids
+                    ],
+                    batch_size=batch_size
+                )
+            whiskeys_created.send(sender=self.model, whiskeys=whiskeys)
+
+        return whiskeys
+
+    def _db_returns_pks(self):
+        connection = connections[self.db]
+        return connection.features.can_return_rows_from_bulk_insert
+
+
 class User(AbstractBaseUser, PermissionsMixin):
     """Custom User Model that supports using username instead of username"""
     username = models.CharField(max_length=255, unique=True)
@@ -56,6 +100,14 @@ class Tag(models.Model):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'name', 'id'],
+                name='core_tag_user_name_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -68,10 +120,25 @@ class Place(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'name', 'id'],
+                name='core_place_user_name_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
 
+class ImageStatus(models.TextChoices):
+    """Processing state of an uploaded whiskey image"""
+    PENDING = 'pending', 'Pending'
+    READY = 'ready', 'Ready'
+    FAILED = 'failed', 'Failed'
+
+
 class Whiskey(models.Model):
     """Whiskey Object"""
     user = models.ForeignKey(
@@ -80,12 +147,120 @@ class Whiskey(models.Model):
     )
     brand = models.CharField(max_length=255)
     style = models.CharField(max_length=255)
-    year = models.CharField(max_length=4, blank=True)
-    price = models.CharField(max_length=10, blank=True)
+    year = models.PositiveSmallIntegerField(null=True, blank=True)
+    price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True
+    )
     link = models.CharField(max_length=255, blank=True)
     places = models.ManyToManyField('Place')
     tags = models.ManyToManyField('Tag')
-    image = models.ImageField(null=True, upload_to=whiskey_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=whiskey_image_file_path,
+        storage=ContentAddressedStorage()
+    )
+    image_status = models.CharField(
+        max_length=10,
+        choices=ImageStatus.choices,
+        blank=True
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = WhiskeyManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'id'],
+                name='core_whiskey_user_id_idx'
+            ),
+            models.Index(
+                fields=['user', 'brand'],
+                name='core_whiskey_user_brand_idx'
+            ),
+            models.Index(
+                fields=['user', 'price', 'id'],
+                name='core_whiskey_user_price_idx'
+            ),
+            models.Index(
+                fields=['user', 'year', 'id'],
+                name='core_whiskey_user_year_idx'
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='core_whiskey_search_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.brand
+
+
+class ImageBlob(models.Model):
+    """Stored image file shared by every whiskey with the same content"""
+    name = models.CharField(max_length=100, unique=True)
+    size = models.PositiveIntegerField(default=0)
+    references = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+
+class CollectionVersion(models.Model):
+    """Version of a user's collection, bumped by every write to it
+
+    The row is kept off the user so saving a user never writes an old
+    version back, and its key is unique to each user, so responses
+    cached under a reused primary key are never served.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='collection_version'
+    )
+    key = models.UUIDField(default=uuid.uuid4, editable=False)
+    version = models.PositiveIntegerField(default=0)
+    modified_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.user} v{self.version}'
+
+
+class CollectionStats(models.Model):
+    """Running totals of a user's collection"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='collection_stats'
+    )
+    whiskey_count = models.PositiveIntegerField(default=0)
+    priced_count = models.PositiveIntegerField(default=0)
+    total_spend = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0
+    )
+    style_counts = models.TextField(default='{}')
+    tag_count = models.PositiveIntegerField(default=0)
+    place_count = models.PositiveIntegerField(default=0)
+    tag_assignments = models.PositiveIntegerField(default=0)
+    place_assignments = models.PositiveIntegerField(default=0)
+
+    def get_style_counts(self):
+        """Return the number of whiskeys of each style"""
+        return json.loads(self.style_counts)
+
+    def set_style_counts(self, counts):
+        """Store the number of whiskeys of each style"""
+        self.style_counts = json.dumps(
+            {style: count for style, count in sorted(counts.items())
+             if count > 0}
+        )
+
+    def __str__(self):
+        return str(self.user)
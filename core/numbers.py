@@ -0,0 +1,31 @@
+import re
+from decimal import Decimal, InvalidOperation
+
+
+# Currency symbols, thousands separators and spaces around a number
+NUMBER_NOISE_RE = re.compile(r'[^\d.\-]')
+MAX_PRICE = Decimal('99999999.99')
+MAX_YEAR = 9999
+
+
+def parse_price(value):
+    """Return the amount of a price such as '$1,200', or None"""
+    try:
+        price = Decimal(NUMBER_NOISE_RE.sub('', str(value or ''))).quantize(
+            Decimal('0.01')
+        )
+    except InvalidOperation:
+        return None
+
+    return price if 0 <= price <= MAX_PRICE else None
+
+
+def parse_year(value):
+    """Return the year of a value such as '2010', or None"""
+    digits = NUMBER_NOISE_RE.sub('', str(value or '')).split('.')[0]
+    try:
+        year = int(digits)
+    except ValueError:
+        return None
+
+    return year if 0 < year <= MAX_YEAR else None
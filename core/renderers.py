@@ -0,0 +1,61 @@
+from django.conf import settings
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def use_orjson():
+    """Return True if API JSON should be handled by orjson"""
+    return orjson is not None and settings.API_JSON_LIBRARY == 'orjson'
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON renderer backed by orjson, falling back to the stdlib
+
+    Compact output matches JSONRenderer for the strings, decimals, dates
+    and other values serializers return, including the escaping of
+    U+2028 and U+2029. Floats can differ: orjson writes 1e-7 where the
+    stdlib writes 1e-07, and renders NaN and infinities as null where
+    JSONRenderer raises. Indented output and non-default JSON settings
+    are left to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if not use_orjson() or indent is not None or self.ensure_ascii \
+                or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=(
+                orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        ).replace(
+            b'\xe2\x80\xa8', b'\\u2028'
+        ).replace(
+            b'\xe2\x80\xa9', b'\\u2029'
+        )
+
+
+class JSONErrorRenderer(BaseRenderer):
+    """Base for renderers of files that are streamed outside DRF
+
+    Only error responses reach render, so they are rendered as JSON and
+    labelled application/json rather than with the file's media type.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer = FastJSONRenderer()
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = renderer.media_type
+
+        return renderer.render(data)
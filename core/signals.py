@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# Sent with whiskeys once Whiskey.objects.bulk_create_with_relations or a
+# COPY import has inserted them and their relations
+whiskeys_created = Signal()
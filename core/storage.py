@@ -0,0 +1,62 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Store each distinct file once, named after the SHA-256 of its content
+
+    Only the directory and extension of the requested name are kept:
+    uploads/whiskey/photo.JPG is stored as uploads/whiskey/ab/ab....jpg.
+    The content is hashed while it is streamed to a temporary file, so
+    saving a file that is already stored only costs the read.
+
+    Stored files are shared through ImageBlob rows and deleted with the
+    row locked. Saving takes the same lock before checking whether the
+    file exists, and holds it until the caller's transaction ends, so a
+    reference taken in that transaction is never to a deleted file.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        os.makedirs(self.path(directory), exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, temp = tempfile.mkstemp(dir=self.path(directory), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as stream:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    stream.write(chunk)
+
+            digest = digest.hexdigest()
+            name = posixpath.join(
+                directory, digest[:2], f'{digest}{extension}'
+            )
+            path = self.path(name)
+            with transaction.atomic():
+                apps.get_model('core', 'ImageBlob').objects \
+                    .select_for_update().filter(name=name).exists()
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(temp, path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(path, self.file_permissions_mode)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+
+        return name
@@ -1,8 +1,25 @@
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
 from unittest.mock import patch
 
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, override_settings
+
+from core.management.commands.import_whiskeys import Command as ImportCommand
+from core.models import CollectionStats, CollectionVersion, ImageBlob, \
+                        ImageStatus, Tag, Place, Whiskey
+
+from whiskey.images import delete_image_files, image_storage
+from whiskey.stats import check_stats
 
 
 class CommandTests(TestCase):
@@ -21,3 +38,292 @@ class CommandTests(TestCase):
             gi.side_effect = [OperationalError] * 5 + [True]
             call_command('wait_for_db')
             self.assertEqual(gi.call_count, 6)
+
+
+class ImportWhiskeysCommandTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.tempdir.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def import_file(self, path, *args):
+        out = StringIO()
+        call_command(
+            'import_whiskeys', path, '--user', self.user.username, *args,
+            stdout=out, stderr=StringIO()
+        )
+        return out.getvalue()
+
+    def assert_imported(self):
+        """Assert the sample collection was imported with relations"""
+        laphroaig = Whiskey.objects.get(user=self.user, brand='Laphroaig')
+        self.assertEqual(laphroaig.year, 2010)
+        self.assertEqual(laphroaig.price, Decimal('1200.00'))
+        self.assertEqual(
+            sorted(laphroaig.tags.values_list('name', flat=True)),
+            ['Smoky', 'Sweet']
+        )
+        self.assertEqual(
+            list(laphroaig.places.values_list('name', flat=True)), ['Home']
+        )
+        bulleit = Whiskey.objects.get(user=self.user, brand='Bulleit')
+        self.assertEqual(
+            list(bulleit.tags.values_list('name', flat=True)), ['Sweet']
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Place.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(check_stats(self.user.pk), {})
+
+    def csv_content(self):
+        return (
+            'brand,style,year,price,link,tags,places\n'
+            'Laphroaig,Scotch,2010,"$1,200",,Smoky|Sweet,Home\n'
+            'Bulleit,Rye,,,,Sweet,\n'
+        )
+
+    def test_import_csv(self):
+        """Test importing a CSV file with COPY"""
+        path = self.write_file('whiskeys.csv', self.csv_content())
+
+        out = self.import_file(path, '--batch-size', '1')
+
+        self.assert_imported()
+        self.assertIn('rows/s', out)
+        self.assertFalse(os.path.exists(f'{path}.progress'))
+
+    def test_import_csv_bulk_create(self):
+        """Test importing a CSV file with bulk_create"""
+        path = self.write_file('whiskeys.csv', self.csv_content())
+
+        self.import_file(path, '--no-copy')
+
+        self.assert_imported()
+
+    def test_import_ndjson_reuses_existing_names(self):
+        """Test importing NDJSON reuses the user's existing tags"""
+        tag = Tag.objects.create(user=self.user, name='Sweet')
+        rows = [
+            {'brand': 'Laphroaig', 'style': 'Scotch', 'year': 2010,
+             'price': 1200, 'tags': ['Smoky', 'Sweet'], 'places': ['Home']},
+            {'brand': 'Bulleit', 'style': 'Rye', 'tags': ['Sweet']},
+        ]
+        path = self.write_file(
+            'whiskeys.ndjson', ''.join(json.dumps(row) + '\n' for row in rows)
+        )
+
+        self.import_file(path)
+
+        self.assert_imported()
+        self.assertTrue(Tag.objects.filter(pk=tag.pk).exists())
+
+    def test_import_skips_invalid_rows(self):
+        """Test rows without a brand are skipped"""
+        path = self.write_file(
+            'whiskeys.csv', 'brand,style\n,Rye\nBulleit,Rye\n'
+        )
+
+        out = self.import_file(path)
+
+        self.assertEqual(Whiskey.objects.filter(user=self.user).count(), 1)
+        self.assertIn('skipped 1', out)
+
+    def test_import_ignores_invalid_numbers(self):
+        """Test unparsable prices and years are imported as missing"""
+        path = self.write_file(
+            'whiskeys.csv', 'brand,style,year,price\nBulleit,Rye,NA,ask\n'
+        )
+
+        self.import_file(path)
+
+        whiskey = Whiskey.objects.get(user=self.user)
+        self.assertIsNone(whiskey.year)
+        self.assertIsNone(whiskey.price)
+
+    def test_import_resume(self):
+        """Test resuming skips the rows of the recorded checkpoint"""
+        path = self.write_file('whiskeys.csv', self.csv_content())
+        self.write_file('whiskeys.csv.progress', '1')
+
+        self.import_file(path, '--resume')
+
+        brands = Whiskey.objects.values_list('brand', flat=True)
+        self.assertEqual(list(brands), ['Bulleit'])
+
+    def test_import_bumps_version_per_batch(self):
+        """Test each committed batch invalidates cached responses"""
+        path = self.write_file('whiskeys.csv', self.csv_content())
+        version = CollectionVersion.objects.get(user=self.user).version
+        import_batch = ImportCommand.import_batch
+
+        def interrupted(command, batch, offset):
+            if offset:
+                raise RuntimeError('Interrupted')
+            return import_batch(command, batch, offset)
+
+        with patch.object(ImportCommand, 'import_batch', interrupted):
+            with self.assertRaises(RuntimeError):
+                self.import_file(path, '--batch-size', '1')
+
+        self.assertEqual(Whiskey.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(
+            CollectionVersion.objects.get(user=self.user).version,
+            version + 1
+        )
+
+    def test_import_unknown_user(self):
+        """Test importing for a missing user fails"""
+        path = self.write_file('whiskeys.csv', self.csv_content())
+
+        with self.assertRaises(CommandError):
+            call_command('import_whiskeys', path, '--user', 'missing')
+
+
+class CollectionStatsCommandTests(TestCase):
+    """Test rebuilding and checking collection statistics"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        Whiskey.objects.create(user=self.user, brand='Bulleit', style='Rye')
+        CollectionStats.objects.filter(user=self.user).update(
+            whiskey_count=3
+        )
+
+    def test_check_reports_inconsistencies(self):
+        """Test the check fails and names the inconsistent values"""
+        out = StringIO()
+
+        with self.assertRaises(CommandError):
+            call_command('collection_stats', '--check', stdout=out)
+
+        self.assertIn('TestUser: whiskey_count is 3, expected 1',
+                      out.getvalue())
+
+    def test_rebuild(self):
+        """Test rebuilding fixes the stored statistics"""
+        call_command('collection_stats', '--user', 'TestUser',
+                     stdout=StringIO())
+
+        self.assertEqual(
+            CollectionStats.objects.get(user=self.user).whiskey_count, 1
+        )
+        call_command('collection_stats', '--check', stdout=StringIO())
+
+    def test_unknown_user(self):
+        """Test naming a missing user fails"""
+        with self.assertRaises(CommandError):
+            call_command('collection_stats', '--user', 'missing')
+
+
+class BenchmarkJsonCommandTests(TestCase):
+    """Test the JSON benchmark command"""
+
+    def test_benchmark_json(self):
+        """Test both renderers are measured"""
+        out = StringIO()
+        call_command('benchmark_json', rows=10, repeat=1, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('10 whiskeys', output)
+        self.assertIn('json: render', output)
+        self.assertIn('fast: render', output)
+
+    def test_benchmark_json_invalid(self):
+        """Test invalid row counts are rejected"""
+        with self.assertRaises(CommandError):
+            call_command('benchmark_json', rows=0, stdout=StringIO())
+
+
+class ImageStorageCommandTests(TestCase):
+    """Test reporting and pruning stored images"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.orphan = image_storage.save(
+            'uploads/whiskey/orphan.webp', ContentFile(b'orphan')
+        )
+        ImageBlob.objects.create(name='uploads/whiskey/a.webp',
+                                 size=1000, references=3)
+
+    def test_report(self):
+        """Test the report shows the bytes saved by sharing images"""
+        out = StringIO()
+
+        call_command('image_storage', stdout=out)
+
+        self.assertIn('1 images shared by 3 whiskeys: 1000 bytes stored, '
+                      '2000 bytes saved (66.7%)', out.getvalue())
+        self.assertTrue(image_storage.exists(self.orphan))
+
+    def test_prune(self):
+        """Test pruning deletes unreferenced files"""
+        out = StringIO()
+
+        call_command('image_storage', '--prune', '--min-age', '-1',
+                     stdout=out)
+
+        self.assertIn('Deleted 1 orphaned files', out.getvalue())
+        self.assertFalse(image_storage.exists(self.orphan))
+
+
+@override_settings(WHISKEY_IMAGE_WORKERS=0)
+class RequeueImagesCommandTests(TestCase):
+    """Test processing the uploads left pending by a stopped server"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.user = get_user_model().objects.create_user(
+            'TestUser', 'TestPass123'
+        )
+
+    def pending_whiskey(self, brand, color):
+        whiskey = Whiskey.objects.create(
+            user=self.user, brand=brand, style='Rye'
+        )
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as photo:
+            Image.new('RGB', (40, 20), color).save(photo, 'JPEG')
+            photo.seek(0)
+            whiskey.image.save(f'{brand}.jpg', photo, save=False)
+        whiskey.image_status = ImageStatus.PENDING
+        whiskey.save()
+
+        return whiskey
+
+    def test_requeue_images(self):
+        """Test pending uploads are processed and others left alone"""
+        pending = self.pending_whiskey('Bulleit', 'red')
+        failed = self.pending_whiskey('Lagavulin', 'blue')
+        failed.image_status = ImageStatus.FAILED
+        failed.save()
+        out = StringIO()
+
+        call_command('requeue_images', stdout=out)
+
+        self.assertIn('Processed 1 pending images', out.getvalue())
+        pending.refresh_from_db()
+        self.addCleanup(delete_image_files, pending.image.name)
+        self.assertEqual(pending.image_status, ImageStatus.READY)
+        self.assertTrue(pending.image.name.endswith('.webp'))
+        failed.refresh_from_db()
+        self.assertEqual(failed.image_status, ImageStatus.FAILED)
+        self.assertTrue(failed.image.name.endswith('.jpg'))
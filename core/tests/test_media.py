@@ -0,0 +1,137 @@
+import os
+import tempfile
+
+from django.test import Client, TestCase, override_settings
+
+from core.media import parse_range
+
+
+DIGEST = 'ab' + '0' * 62
+VARIANT = 'cache/whiskey/ab/ab' + '0' * 38 + '.webp'
+
+
+class MediaServingTests(TestCase):
+    """Test serving files below MEDIA_ROOT"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+        self.client = Client()
+        self.content = b'0123456789'
+        for name in ('uploads/photo.jpg', f'uploads/ab/{DIGEST}_128.webp',
+                     VARIANT, 'cache/whiskey/locks/3.lock',
+                     f'uploads/ab/{DIGEST}.webp.1.2.tmp', 'private.txt'):
+            path = os.path.join(media.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(self.content)
+
+    def get(self, name='uploads/photo.jpg', **headers):
+        return self.client.get(f'/media/{name}', **headers)
+
+    def test_serve_file(self):
+        """Test a file is streamed whole and revalidated by clients"""
+        res = self.get()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), self.content)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Content-Length'], '10')
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertEqual(res['Cache-Control'], 'public, no-cache')
+
+    def test_content_named_files_are_immutable(self):
+        """Test files named after their digest are cached for good"""
+        res = self.get(f'uploads/ab/{DIGEST}_128.webp')
+
+        self.assertEqual(
+            res['Cache-Control'], 'public, max-age=31536000, immutable'
+        )
+
+    def test_cached_variants_are_revalidated(self):
+        """Test evictable variants are not cached for good"""
+        res = self.get(VARIANT)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Cache-Control'], 'public, no-cache')
+
+    def test_only_served_directories(self):
+        """Test lock files, temporary files and other files are hidden"""
+        for name in ('cache/whiskey/locks/3.lock',
+                     f'uploads/ab/{DIGEST}.webp.1.2.tmp', 'private.txt',
+                     'uploads/../private.txt'):
+            self.assertEqual(self.get(name).status_code, 404)
+
+    def test_not_modified(self):
+        """Test a matching ETag is answered without the content"""
+        etag = self.get()['ETag']
+
+        res = self.get(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_range(self):
+        """Test single byte ranges are served partially"""
+        for header, content, content_range in (
+            ('bytes=2-5', b'2345', 'bytes 2-5/10'),
+            ('bytes=7-', b'789', 'bytes 7-9/10'),
+            ('bytes=-3', b'789', 'bytes 7-9/10'),
+            ('bytes=8-20', b'89', 'bytes 8-9/10'),
+        ):
+            res = self.get(HTTP_RANGE=header)
+
+            self.assertEqual(res.status_code, 206)
+            self.assertEqual(b''.join(res.streaming_content), content)
+            self.assertEqual(res['Content-Length'], str(len(content)))
+            self.assertEqual(res['Content-Range'], content_range)
+
+    def test_unsatisfiable_range(self):
+        """Test ranges past the end of the file are rejected"""
+        res = self.get(HTTP_RANGE='bytes=10-')
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], 'bytes */10')
+
+    def test_stale_if_range_serves_whole_file(self):
+        """Test a range conditional on another version is ignored"""
+        res = self.get(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), self.content)
+
+    def test_parse_range(self):
+        """Test invalid or multiple ranges are ignored"""
+        self.assertIsNone(parse_range('bytes=5-2', 10))
+        self.assertIsNone(parse_range('bytes=0-1,4-5', 10))
+        self.assertIsNone(parse_range('items=0-1', 10))
+        with self.assertRaises(ValueError):
+            parse_range('bytes=-0', 10)
+
+    @override_settings(MEDIA_OFFLOAD='x-accel-redirect')
+    def test_accel_redirect(self):
+        """Test nginx is told to send the file from its internal location"""
+        res = self.get()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(
+            res['X-Accel-Redirect'], '/protected-media/uploads/photo.jpg'
+        )
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+
+    @override_settings(MEDIA_OFFLOAD='x-sendfile')
+    def test_sendfile(self):
+        """Test the front server is given the path of the file"""
+        res = self.get()
+
+        self.assertTrue(res['X-Sendfile'].endswith('/uploads/photo.jpg'))
+        self.assertTrue(os.path.isabs(res['X-Sendfile']))
+
+    def test_missing_files(self):
+        """Test missing files, directories and paths outside are not found"""
+        for name in ('uploads/missing.jpg', 'uploads', '../secret'):
+            self.assertEqual(self.get(name).status_code, 404)
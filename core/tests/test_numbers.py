@@ -0,0 +1,31 @@
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+
+from core.numbers import parse_price, parse_year
+
+
+class NumberParsingTests(SimpleTestCase):
+    """Test parsing the prices and years once stored as text"""
+
+    def test_parse_price(self):
+        """Test currency symbols and separators are ignored"""
+        self.assertEqual(parse_price('$1,200'), Decimal('1200.00'))
+        self.assertEqual(parse_price(' 45.5 '), Decimal('45.50'))
+        self.assertEqual(parse_price(12), Decimal('12.00'))
+
+    def test_parse_invalid_price(self):
+        """Test prices without a valid amount are rejected"""
+        for value in ('', 'cheap', '-1', '1.2.3', '10-20', '100000000'):
+            self.assertIsNone(parse_price(value), value)
+
+    def test_parse_year(self):
+        """Test years are read from their digits"""
+        self.assertEqual(parse_year('2010'), 2010)
+        self.assertEqual(parse_year('2010.0'), 2010)
+        self.assertEqual(parse_year(' 1999 '), 1999)
+
+    def test_parse_invalid_year(self):
+        """Test years without a valid number are rejected"""
+        for value in ('', 'old', '0', '-5', '1990-1995', '10000'):
+            self.assertIsNone(parse_year(value), value)
@@ -0,0 +1,113 @@
+import datetime
+import io
+import json
+import uuid
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+
+SAMPLE = {
+    'id': 1,
+    'brand': 'Ardbeg \u2028 Uigeadail \u2029 \xe9 \U0001f943',
+    'price': Decimal('59.99'),
+    'ratio': 0.1,
+    'tags': (1, 2, 3),
+    'created': datetime.datetime(2020, 1, 2, 3, 4, 5, 678901,
+                                 tzinfo=timezone.utc),
+    'day': datetime.date(2020, 1, 2),
+    'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'label': gettext_lazy('Whiskey'),
+    'errors': [ErrorDetail('Invalid', code='invalid')],
+    'nested': {1: None, 'flag': True},
+}
+
+
+class FastJSONRendererTests(TestCase):
+    """Test the orjson backed renderer"""
+
+    def test_render_matches_json_renderer(self):
+        """Test output is identical to the stdlib renderer"""
+        self.assertEqual(
+            FastJSONRenderer().render(SAMPLE),
+            JSONRenderer().render(SAMPLE)
+        )
+
+    @override_settings(API_JSON_LIBRARY='json')
+    def test_render_stdlib_fallback(self):
+        """Test the stdlib is used when configured"""
+        self.assertEqual(
+            FastJSONRenderer().render(SAMPLE),
+            JSONRenderer().render(SAMPLE)
+        )
+
+    def test_render_indent(self):
+        """Test indented output is left to the stdlib renderer"""
+        media_type = 'application/json; indent=2'
+
+        self.assertEqual(
+            FastJSONRenderer().render(SAMPLE, media_type),
+            JSONRenderer().render(SAMPLE, media_type)
+        )
+
+    def test_render_float_exponent(self):
+        """Test small floats keep their value but not the stdlib spelling"""
+        rendered = FastJSONRenderer().render([1e-7])
+
+        self.assertEqual(rendered, b'[1e-7]')
+        self.assertEqual(JSONRenderer().render([1e-7]), b'[1e-07]')
+        self.assertEqual(json.loads(rendered), [1e-7])
+
+    def test_render_non_finite_float(self):
+        """Test NaN renders as null where the stdlib renderer raises"""
+        self.assertEqual(FastJSONRenderer().render([float('nan')]), b'[null]')
+        with self.assertRaises(ValueError):
+            JSONRenderer().render([float('nan')])
+
+    def test_render_none(self):
+        """Test no data renders an empty body"""
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+class FastJSONParserTests(TestCase):
+    """Test the orjson backed parser"""
+
+    def parse(self, content, **context):
+        return FastJSONParser().parse(
+            io.BytesIO(content), 'application/json', context
+        )
+
+    def test_parse(self):
+        """Test parsing a UTF-8 document"""
+        self.assertEqual(
+            self.parse('{"brand": "Ardbeg é", "tags": [1]}'.encode()),
+            {'brand': 'Ardbeg é', 'tags': [1]}
+        )
+
+    def test_parse_other_encoding(self):
+        """Test non UTF-8 documents are decoded by the stdlib parser"""
+        self.assertEqual(
+            self.parse(
+                '{"brand": "é"}'.encode('utf-16'), encoding='utf-16'
+            ),
+            {'brand': 'é'}
+        )
+
+    def test_parse_errors(self):
+        """Test invalid documents and NaN are rejected"""
+        for content in (b'{"brand": ', b'{"price": NaN}'):
+            with self.assertRaises(ParseError):
+                self.parse(content)
+
+    @override_settings(API_JSON_LIBRARY='json')
+    def test_parse_stdlib_fallback(self):
+        """Test the stdlib is used when configured"""
+        self.assertEqual(self.parse(b'[1, 2]'), [1, 2])
@@ -0,0 +1,164 @@
+import copy
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """Bounded LRU cache of authenticated tokens with a time to live
+
+    Entries live in process memory and, when TOKEN_CACHE_ALIAS names a
+    Django cache, are shared with other processes through that backend.
+    The shared cache then also holds a random generation per token,
+    replaced on every eviction, and entries stored under another
+    generation are ignored, so every process stops accepting a deleted
+    token or changed user at once. Without a shared cache the other
+    processes cannot be told, and keep accepting an evicted token for
+    at most TOKEN_CACHE_LOCAL_TIMEOUT seconds.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _digest(self, key):
+        """Return the cache key of a token without exposing the token"""
+        return 'token:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def _shared_cache(self):
+        """Return the shared cache backend, if one is configured"""
+        alias = settings.TOKEN_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def generation(self, key):
+        """Return the current generation of a token, None when unshared
+
+        Read it before loading the token, so a lookup racing with an
+        eviction is stored under the generation the eviction replaced.
+        """
+        shared = self._shared_cache()
+        if shared is None:
+            return None
+        generation_key = self._digest(key) + ':generation'
+        generation = shared.get(generation_key)
+        if generation is None:
+            shared.add(
+                generation_key, uuid.uuid4().hex, settings.TOKEN_CACHE_TIMEOUT
+            )
+            generation = shared.get(generation_key)
+
+        return generation
+
+    def get(self, key, generation):
+        """Return a copy of the cached token, or None on a miss"""
+        digest = self._digest(key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and \
+                    (entry[0] <= now or entry[1] != generation):
+                del self._entries[digest]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(digest)
+        token = entry[2] if entry is not None else None
+
+        if token is None:
+            shared = self._shared_cache()
+            if shared is not None:
+                stored = shared.get(digest)
+                if stored is not None and stored[0] == generation:
+                    token = stored[1]
+                    self._store(digest, generation, token)
+
+        self._count('hits' if token is not None else 'misses')
+        if token is None:
+            return None
+
+        return self._copy(token)
+
+    def set(self, key, token, generation):
+        """Cache an authenticated token together with its user"""
+        digest = self._digest(key)
+        self._store(digest, generation, self._copy(token))
+        shared = self._shared_cache()
+        if shared is not None:
+            shared.set(
+                digest, (generation, token), settings.TOKEN_CACHE_TIMEOUT
+            )
+
+    def _store(self, digest, generation, token):
+        timeout = settings.TOKEN_CACHE_TIMEOUT
+        if generation is None:
+            timeout = min(timeout, settings.TOKEN_CACHE_LOCAL_TIMEOUT)
+        expires = time.monotonic() + timeout
+        with self._lock:
+            self._entries[digest] = (expires, generation, token)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > settings.TOKEN_CACHE_MAX_SIZE:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def _copy(self, token):
+        """Copy a token so requests never share a mutable user"""
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return token
+
+    def evict(self, key):
+        """Drop a token from the cache of every process sharing it"""
+        digest = self._digest(key)
+        with self._lock:
+            self._entries.pop(digest, None)
+        shared = self._shared_cache()
+        if shared is not None:
+            shared.set(
+                digest + ':generation', uuid.uuid4().hex,
+                settings.TOKEN_CACHE_TIMEOUT
+            )
+            shared.delete(digest)
+
+    def clear(self):
+        """Drop every locally cached token and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._stats.update(hits=0, misses=0, evictions=0)
+
+    def stats(self):
+        """Return the counters and hit rate of this process"""
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries))
+        total = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / total if total else 0.0
+
+        return stats
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches the token and user lookup"""
+
+    def authenticate_credentials(self, key):
+        generation = token_cache.generation(key)
+        token = token_cache.get(key, generation)
+        if token is not None:
+            return (token.user, token)
+
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, token, generation)
+
+        return (user, token)
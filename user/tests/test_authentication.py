@@ -0,0 +1,197 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import TokenCache, token_cache
+
+
+ME_URL = reverse('user:me')
+TOKEN_STATS_URL = reverse('user:token-stats')
+SHARED_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tokens',
+    },
+}
+
+
+def create_user(username='TestUser', **params):
+    return get_user_model().objects.create_user(
+        username=username, password='TestPass123', **params
+    )
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test caching of token authentication lookups"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = create_user(name='Name')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeated_requests_skip_token_query(self):
+        """Test the token lookup only hits the database once"""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['username'], self.user.username)
+        self.assertEqual(token_cache.stats()['hits'], 1)
+
+    def test_invalid_token_rejected(self):
+        """Test an unknown token is still rejected"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_rejected(self):
+        """Test a deleted token stops authenticating immediately"""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test a deactivated user stops authenticating immediately"""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_updated_user_reloaded(self):
+        """Test profile changes are visible on the next request"""
+        self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {'name': 'New Name'})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'New Name')
+
+    @override_settings(TOKEN_CACHE_TIMEOUT=10)
+    def test_entries_expire(self):
+        """Test cached tokens are reloaded once their lifetime passes"""
+        with patch('user.authentication.time.monotonic') as monotonic:
+            monotonic.return_value = 100
+            self.client.get(ME_URL)
+            monotonic.return_value = 111
+
+            with self.assertNumQueries(1):
+                self.client.get(ME_URL)
+
+    @override_settings(TOKEN_CACHE_TIMEOUT=60, TOKEN_CACHE_LOCAL_TIMEOUT=5)
+    def test_unshared_entries_expire_soon(self):
+        """Test entries only this process can evict have a short life"""
+        with patch('user.authentication.time.monotonic') as monotonic:
+            monotonic.return_value = 100
+            self.client.get(ME_URL)
+            monotonic.return_value = 106
+
+            with self.assertNumQueries(1):
+                self.client.get(ME_URL)
+
+    @override_settings(TOKEN_CACHE_MAX_SIZE=1)
+    def test_cache_is_bounded(self):
+        """Test the least recently used token is evicted"""
+        other = APIClient()
+        other_token = Token.objects.create(user=create_user('Other'))
+        other.credentials(HTTP_AUTHORIZATION=f'Token {other_token.key}')
+
+        self.client.get(ME_URL)
+        other.get(ME_URL)
+
+        stats = token_cache.stats()
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['evictions'], 1)
+
+
+@override_settings(CACHES=SHARED_CACHES, TOKEN_CACHE_ALIAS='tokens')
+class SharedTokenCacheTests(TestCase):
+    """Test token caches shared between processes"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+        # the cache of another process sharing the backend
+        self.other = TokenCache()
+        self.key = self.token.key
+        self.other.set(self.key, self.token, self.other.generation(self.key))
+
+    def other_get(self):
+        return self.other.get(self.key, self.other.generation(self.key))
+
+    def test_entries_are_shared(self):
+        """Test a token cached by one process authenticates in another"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+
+        with self.assertNumQueries(0):
+            res = client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_deleted_token_rejected_everywhere(self):
+        """Test deleting a token invalidates other processes' entries"""
+        self.assertIsNotNone(self.other_get())
+
+        self.token.delete()
+
+        self.assertIsNone(self.other_get())
+
+    def test_changed_user_reloaded_everywhere(self):
+        """Test changing a user invalidates other processes' entries"""
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertIsNone(self.other_get())
+
+    def test_lookup_racing_eviction_is_ignored(self):
+        """Test a token loaded before an eviction is not trusted after it"""
+        generation = self.other.generation(self.key)
+        token_cache.evict(self.key)
+        self.other.set(self.key, self.token, generation)
+
+        self.assertIsNone(self.other_get())
+
+
+class TokenCacheStatsTests(TestCase):
+    """Test the token cache statistics endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_stats_require_staff(self):
+        """Test only staff users can read token cache statistics"""
+        self.client.force_authenticate(create_user())
+
+        res = self.client.get(TOKEN_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stats_for_staff(self):
+        """Test staff users can read token cache statistics"""
+        admin = get_user_model().objects.create_superuser('Admin', 'Pass')
+        self.client.force_authenticate(admin)
+
+        res = self.client.get(TOKEN_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('hit_rate', res.data)
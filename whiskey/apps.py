@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class WhiskeyConfig(AppConfig):
     name = 'whiskey'
+
+    def ready(self):
+        from whiskey import signals  # noqa: F401
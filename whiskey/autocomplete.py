@@ -0,0 +1,173 @@
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from django.conf import settings
+
+from core.models import Tag, Place, Whiskey
+
+from whiskey.cache import get_collection_state
+
+
+SOURCES = OrderedDict((
+    ('brands', (Whiskey, 'brand')),
+    ('tags', (Tag, 'name')),
+    ('places', (Place, 'name')),
+))
+
+
+class NameIndex:
+    """Sorted names of one kind of object, searchable by prefix
+
+    Keys are (casefolded name, name) pairs kept in a sorted list, so a
+    prefix lookup is a binary search followed by a scan of the matches.
+    The owner of each name is remembered so renames and deletes can be
+    applied without reloading the collection.
+    """
+
+    def __init__(self, rows):
+        self._owners = {}
+        self._counts = {}
+        self._keys = []
+        for pk, name in rows:
+            self._owners[pk] = name
+            self._counts[name] = self._counts.get(name, 0) + 1
+        self._keys = sorted((name.casefold(), name) for name in self._counts)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _add(self, name):
+        count = self._counts.get(name, 0)
+        self._counts[name] = count + 1
+        if not count:
+            insort(self._keys, (name.casefold(), name))
+
+    def _remove(self, name):
+        count = self._counts.pop(name) - 1
+        if count:
+            self._counts[name] = count
+        else:
+            key = (name.casefold(), name)
+            del self._keys[bisect_left(self._keys, key)]
+
+    def set(self, pk, name):
+        """Record the current name of an object"""
+        old = self._owners.get(pk)
+        if old == name:
+            return
+        if old is not None:
+            self._remove(old)
+        self._owners[pk] = name
+        self._add(name)
+
+    def delete(self, pk):
+        """Forget a deleted object"""
+        old = self._owners.pop(pk, None)
+        if old is not None:
+            self._remove(old)
+
+    def complete(self, prefix, limit):
+        """Return up to limit names starting with prefix, in order"""
+        prefix = prefix.casefold()
+        position = bisect_left(self._keys, (prefix,))
+        names = []
+        for key, name in self._keys[position:position + limit]:
+            if not key.startswith(prefix):
+                break
+            names.append(name)
+
+        return names
+
+
+class UserIndex:
+    """Prefix indexes of one user's collection at a known version"""
+
+    def __init__(self, collection, version, indexes):
+        self.collection = collection
+        self.version = version
+        self.indexes = indexes
+
+    @classmethod
+    def build(cls, user_id, collection, version):
+        """Load the names of a user's collection"""
+        return cls(collection, version, {
+            kind: NameIndex(
+                model.objects.filter(user_id=user_id).values_list(
+                    'pk', field
+                ).iterator()
+            )
+            for kind, (model, field) in SOURCES.items()
+        })
+
+    def complete(self, prefix, limit, kinds):
+        """Return the completions of each requested kind"""
+        return OrderedDict(
+            (kind, self.indexes[kind].complete(prefix, limit))
+            for kind in kinds
+        )
+
+
+class AutocompleteIndex:
+    """Bounded LRU of per-user prefix indexes
+
+    Indexes are built on first use and checked against the collection
+    version of the user, so writes made by other processes are
+    never served stale. Writes made by this process are applied in
+    place once committed, avoiding a rebuild.
+    """
+
+    def __init__(self):
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return an up to date index of a user's collection"""
+        version, modified_at, collection = get_collection_state(user_id)
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is not None and index.collection == collection and \
+                    index.version == version:
+                self._users.move_to_end(user_id)
+                return index
+
+        index = UserIndex.build(user_id, collection, version)
+        with self._lock:
+            self._users[user_id] = index
+            self._users.move_to_end(user_id)
+            while len(self._users) > settings.WHISKEY_AUTOCOMPLETE_MAX_USERS:
+                self._users.popitem(last=False)
+
+        return index
+
+    def complete(self, user_id, prefix, limit, kinds):
+        """Return a user's completions of each requested kind"""
+        index = self.get(user_id)
+        with self._lock:
+            return index.complete(prefix, limit, kinds)
+
+    def apply(self, user_id, version, changes):
+        """Apply committed writes that moved a collection to version
+
+        changes holds (kind, pk, name) updates, where a name of None
+        removes the object. Indexes that missed an earlier change are
+        left alone and rebuilt on their next lookup.
+        """
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is None or index.version != version - 1:
+                return
+            for kind, pk, name in changes:
+                if name is None:
+                    index.indexes[kind].delete(pk)
+                else:
+                    index.indexes[kind].set(pk, name)
+            index.version = version
+
+    def clear(self):
+        """Drop every cached index"""
+        with self._lock:
+            self._users.clear()
+
+
+autocomplete_index = AutocompleteIndex()
@@ -0,0 +1,247 @@
+import hashlib
+import threading
+from calendar import timegm
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from core.models import CollectionVersion
+
+
+# Sent with user_id, version and changes once a collection is bumped
+collection_bumped = Signal()
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+_pending = threading.local()
+
+
+def get_cache():
+    """Return the cache backend used for whiskey responses"""
+    return caches[settings.WHISKEY_CACHE_ALIAS]
+
+
+def get_collection_state(user_id):
+    """Return the collection version, modification time and key of a user"""
+    state = CollectionVersion.objects.filter(user_id=user_id).values_list(
+        'version', 'modified_at', 'key'
+    ).first()
+    if state is None:
+        row = CollectionVersion.objects.get_or_create(user_id=user_id)[0]
+        state = (row.version, row.modified_at, row.key)
+
+    return state
+
+
+def bump_collection_version(user_id):
+    """Invalidate every cached response of a user's collection
+
+    Last-Modified has whole seconds, so it can repeat across writes made
+    within one second. The ETag changes with every version and takes
+    precedence in conditional requests. Returns the new version, or None
+    if the user has no version row.
+    """
+    now = timezone.now()
+    meta = CollectionVersion._meta
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE {table} SET {version} = {version} + 1, '
+                '{modified} = %s WHERE {pk} = %s RETURNING {version}'.format(
+                    table=connection.ops.quote_name(meta.db_table),
+                    version=connection.ops.quote_name(
+                        meta.get_field('version').column
+                    ),
+                    modified=connection.ops.quote_name(
+                        meta.get_field('modified_at').column
+                    ),
+                    pk=connection.ops.quote_name(meta.pk.column)
+                ),
+                [now, user_id]
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    rows = CollectionVersion.objects.filter(user_id=user_id)
+    rows.update(version=F('version') + 1, modified_at=now)
+    return rows.values_list('version', flat=True).first()
+
+
+def mark_collection_changed(user_id, change=None):
+    """Bump a user's collection now or at the end of collection_changes()
+
+    change is a (kind, pk, name) autocomplete update, or None when no
+    name changed.
+    """
+    changes = getattr(_pending, 'changes', None)
+    if changes is None:
+        bump_and_notify(user_id, [change] if change else [])
+    else:
+        changes.setdefault(user_id, [])
+        if change is not None:
+            changes[user_id].append(change)
+
+
+def bump_and_notify(user_id, changes):
+    """Bump a user's collection and send collection_bumped"""
+    version = bump_collection_version(user_id)
+    if version is not None:
+        collection_bumped.send(
+            sender=CollectionVersion,
+            user_id=user_id,
+            version=version,
+            changes=changes
+        )
+
+
+@contextmanager
+def collection_changes():
+    """Run a block of writes in one transaction with one bump per user
+
+    Collections changed in the block are bumped once as it ends, inside
+    its transaction. Nested blocks join the outermost one.
+    """
+    if getattr(_pending, 'changes', None) is not None:
+        yield
+        return
+
+    _pending.changes = {}
+    try:
+        with transaction.atomic():
+            yield
+            changes, _pending.changes = _pending.changes, None
+            for user_id, user_changes in changes.items():
+                bump_and_notify(user_id, user_changes)
+    finally:
+        _pending.changes = None
+
+
+def record(hit):
+    """Count a cache hit or miss"""
+    with _stats_lock:
+        _stats['hits' if hit else 'misses'] += 1
+
+
+def get_stats():
+    """Return the hit and miss counters of this process"""
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / total if total else 0.0
+
+    return stats
+
+
+def reset_stats():
+    """Reset the hit and miss counters of this process"""
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
+
+
+class CachedResponseMixin:
+    """Cache read responses per user until their collection changes
+
+    Responses carry an ETag and Last-Modified derived from the collection
+    version, so conditional requests are answered with 304 Not Modified
+    after a single lookup of the version.
+    """
+
+    def get_cache_key(self, request, collection, version):
+        """Return the cache key of a request at a collection version"""
+        url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+
+        return 'whiskey:{}:{}:{}:{}:{}:{}'.format(
+            self.basename, self.action, request.user.pk, collection.hex,
+            version, url
+        )
+
+    def get_etag(self, request, collection, version):
+        """Return the entity tag of a request at a collection version"""
+        key = '{}:{}'.format(
+            self.get_cache_key(request, collection, version),
+            request.accepted_renderer.format
+        )
+
+        return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        """Return a cached response, calling the handler on a miss"""
+        version, modified_at, collection = get_collection_state(
+            request.user.pk
+        )
+        etag = self.get_etag(request, collection, version)
+        last_modified = None
+        if modified_at is not None:
+            last_modified = timegm(modified_at.utctimetuple())
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = self.cache_lookup(
+                handler, request, collection, version, *args, **kwargs
+            )
+        if response.status_code in (status.HTTP_200_OK,
+                                    status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+
+        return response
+
+    def cache_lookup(self, handler, request, collection, version, *args,
+                     **kwargs):
+        """Return the cached response data or render it on a miss"""
+        key = self.get_cache_key(request, collection, version)
+        cache = get_cache()
+
+        data = cache.get(key)
+        record(data is not None)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.WHISKEY_CACHE_TIMEOUT)
+
+        return response
+
+
+class CollectionWriteMixin:
+    """Bump the collection once per write request"""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+
+        with collection_changes():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class CachedListMixin(CachedResponseMixin):
+    """Cache list responses"""
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+
+class CachedRetrieveMixin(CachedResponseMixin):
+    """Cache retrieve responses"""
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,102 @@
+import csv
+import json
+from itertools import islice
+
+from rest_framework.renderers import BaseRenderer
+
+from core.models import Whiskey
+from core.renderers import JSONErrorRenderer
+
+from whiskey.rows import blank_string
+
+
+EXPORT_FIELDS = ('id', 'brand', 'style', 'year', 'price', 'link')
+NUMBER_FIELDS = ('year', 'price')
+RELATED_FIELDS = ('tags', 'places')
+NAME_SEPARATOR = '|'
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline delimited JSON, one whiskey per line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode() + b'\n'
+
+
+class CSVRenderer(JSONErrorRenderer):
+    """Comma separated values with a header row"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+
+class Echo:
+    """File-like object that returns what is written to it"""
+
+    def write(self, value):
+        return value
+
+
+def related_names(field_name, whiskey_ids):
+    """Return the related object names of each whiskey"""
+    field = Whiskey._meta.get_field(field_name)
+    name = f'{field.m2m_reverse_field_name()}__name'
+    rows = field.remote_field.through.objects.filter(
+        whiskey_id__in=whiskey_ids
+    ).order_by('whiskey_id', name).values_list('whiskey_id', name)
+
+    names = {}
+    for whiskey_id, related_name in rows:
+        names.setdefault(whiskey_id, []).append(related_name)
+
+    return names
+
+
+def iter_collection(queryset, chunk_size):
+    """Yield whiskey rows with their tag and place names
+
+    Rows are read through a server-side cursor and the relations are
+    fetched once per chunk, so memory stays bounded by the chunk size.
+    """
+    rows = queryset.order_by('id').values(*EXPORT_FIELDS).iterator(
+        chunk_size=chunk_size
+    )
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+
+        ids = [row['id'] for row in chunk]
+        related = {name: related_names(name, ids) for name in RELATED_FIELDS}
+        for row in chunk:
+            for name in NUMBER_FIELDS:
+                row[name] = blank_string(row[name])
+            for name in RELATED_FIELDS:
+                row[name] = related[name].get(row['id'], [])
+            yield row
+
+
+def iter_ndjson(rows):
+    """Encode rows as newline delimited JSON"""
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+def iter_csv(rows):
+    """Encode rows as CSV, joining related names with a separator"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS + RELATED_FIELDS)
+    for row in rows:
+        yield writer.writerow(
+            [row[field] for field in EXPORT_FIELDS] +
+            [NAME_SEPARATOR.join(row[name]) for name in RELATED_FIELDS]
+        )
+
+
+ENCODERS = {
+    NDJSONRenderer.format: iter_ndjson,
+    CSVRenderer.format: iter_csv,
+}
@@ -0,0 +1,437 @@
+import hashlib
+import multiprocessing
+import os
+import posixpath
+import shutil
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from functools import partial
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+
+from core.models import ImageBlob, ImageStatus, Whiskey, \
+                        whiskey_image_file_path
+from core.renderers import JSONErrorRenderer
+
+from whiskey.imaging import EXTENSIONS, process_image, processed_name, \
+                            resize_image, variant_name
+
+
+image_storage = Whiskey._meta.get_field('image').storage
+upload_directory = posixpath.dirname(whiskey_image_file_path(None, 'a.jpg'))
+
+IMAGE_TYPES = OrderedDict((
+    ('webp', 'WEBP'),
+    ('jpeg', 'JPEG'),
+    ('png', 'PNG'),
+))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process pool shared by image uploads"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.WHISKEY_IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+
+def reset_executor(executor):
+    """Drop a broken pool so the next upload starts a new one"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+
+
+def shutdown_executor():
+    """Wait for the queued images and stop the process pool"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown()
+
+
+def image_variants(name):
+    """Return the thumbnail names of a processed image by size"""
+    return OrderedDict(
+        (size, variant_name(name, size))
+        for size in sorted(settings.WHISKEY_IMAGE_SIZES)
+    )
+
+
+def delete_image_files(name):
+    """Delete an image and its thumbnails"""
+    for path in (name, *image_variants(name).values()):
+        image_storage.delete(path)
+
+
+def stored_size(name):
+    """Return the bytes used by an image and its thumbnails"""
+    size = 0
+    for path in (name, *image_variants(name).values()):
+        try:
+            size += image_storage.size(path)
+        except OSError:
+            pass
+
+    return size
+
+
+def lock_image(name):
+    """Lock the reference count of an image, returning whether it is stored
+
+    Until the transaction ends the image cannot be released, so a
+    stored one stays stored.
+    """
+    return ImageBlob.objects.select_for_update().filter(name=name).exists()
+
+
+def acquire_image(name):
+    """Count a reference to a stored image"""
+    with transaction.atomic():
+        blob, created = ImageBlob.objects.select_for_update().get_or_create(
+            name=name, defaults={'size': stored_size(name)}
+        )
+        blob.references = F('references') + 1
+        blob.save(update_fields=['references'])
+
+
+def release_image(name):
+    """Drop a reference to a stored image, deleting it with the last one
+
+    The files are deleted while the row is locked, so an upload of the
+    same content, which takes the lock while saving, waits and stores
+    them again. Images stored before reference counting have no row and
+    are left alone.
+    """
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(
+            name=name
+        ).first()
+        if blob is None:
+            return
+        if blob.references > 1:
+            blob.references = F('references') - 1
+            blob.save(update_fields=['references'])
+            return
+        blob.delete()
+        delete_image_files(name)
+
+
+def storage_report():
+    """Return how much storage deduplication saves"""
+    totals = ImageBlob.objects.filter(references__gt=0).aggregate(
+        blobs=Count('pk'),
+        references=Sum('references'),
+        stored=Sum('size'),
+        referenced=Sum(F('size') * F('references'))
+    )
+    report = {name: value or 0 for name, value in totals.items()}
+    report['saved'] = report['referenced'] - report['stored']
+
+    return report
+
+
+def orphaned_images(min_age):
+    """Yield uploaded files that no image reference accounts for
+
+    Files younger than min_age seconds are skipped, as they may belong
+    to an upload whose reference is not committed yet.
+    """
+    referenced = set()
+    for name in ImageBlob.objects.values_list('name', flat=True).iterator():
+        referenced.add(name)
+        referenced.update(image_variants(name).values())
+
+    root = image_storage.path(upload_directory)
+    cutoff = time.time() - min_age
+    for directory, dirs, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            name = posixpath.join(
+                upload_directory,
+                *os.path.relpath(path, root).split(os.sep)
+            )
+            if name not in referenced and os.path.getmtime(path) < cutoff:
+                yield name
+
+
+def process_upload(whiskey):
+    """Re-encode the image just uploaded to a whiskey
+
+    Content already processed for another whiskey is reused at once.
+    Without workers the image is processed before returning. Otherwise
+    it is handed to the pool once the upload is committed and the
+    whiskey stays pending until a worker finishes.
+    """
+    source = whiskey.image.name
+    target = processed_name(source, settings.WHISKEY_IMAGE_FORMAT)
+    args = (
+        image_storage.path(source),
+        image_storage.path(target),
+        settings.WHISKEY_IMAGE_SIZES,
+        settings.WHISKEY_IMAGE_MAX_SIZE,
+        settings.WHISKEY_IMAGE_FORMAT,
+        settings.WHISKEY_IMAGE_QUALITY,
+    )
+    with transaction.atomic():
+        reused = lock_image(target)
+        if reused:
+            finish_processing(whiskey.pk, source, target, False)
+    if reused:
+        whiskey.refresh_from_db(fields=['image', 'image_status'])
+    elif settings.WHISKEY_IMAGE_WORKERS:
+        transaction.on_commit(
+            partial(submit, whiskey.pk, source, target, args)
+        )
+    else:
+        try:
+            process_image(*args)
+        except Exception:
+            failed = True
+        else:
+            failed = False
+        finish_processing(whiskey.pk, source, target, failed)
+        whiskey.refresh_from_db(fields=['image', 'image_status'])
+
+
+def requeue_uploads():
+    """Queue again the uploads left pending, returning how many
+
+    Uploads queued on the pool of a server that stopped are never
+    finished, so pending whiskeys are processed again. A whiskey still
+    being processed elsewhere is finished by whichever worker is first.
+    """
+    whiskeys = Whiskey.objects.filter(
+        image_status=ImageStatus.PENDING, image__gt=''
+    ).only('image', 'image_status')
+    count = 0
+    for whiskey in whiskeys.iterator():
+        process_upload(whiskey)
+        count += 1
+
+    return count
+
+
+def submit(whiskey_id, source, target, args):
+    """Queue an image on the process pool"""
+    executor = get_executor()
+    try:
+        future = executor.submit(process_image, *args)
+    except BrokenProcessPool:
+        reset_executor(executor)
+        executor = get_executor()
+        future = executor.submit(process_image, *args)
+    future.add_done_callback(
+        partial(processed, executor, whiskey_id, source, target)
+    )
+
+
+def processed(executor, whiskey_id, source, target, future):
+    """Record the outcome of a worker, from the pool's callback thread"""
+    error = future.exception()
+    if isinstance(error, BrokenProcessPool):
+        reset_executor(executor)
+    try:
+        finish_processing(whiskey_id, source, target, error is not None)
+    finally:
+        connection.close()
+
+
+def finish_processing(whiskey_id, source, target, failed):
+    """Point a whiskey at its processed image
+
+    The save moves the whiskey's reference from the upload to the
+    processed image. Whiskeys that received another image meanwhile are
+    left alone, and processed files nobody references are deleted. A
+    target deleted by the release of another whiskey's reference while
+    it was processed counts as a failure.
+    """
+    with transaction.atomic():
+        whiskey = Whiskey.objects.select_for_update().filter(
+            pk=whiskey_id, image=source
+        ).first()
+        if whiskey is not None:
+            if not failed:
+                failed = not lock_image(target) and \
+                    not image_storage.exists(target)
+            whiskey.image_status = ImageStatus.FAILED if failed \
+                else ImageStatus.READY
+            if not failed:
+                whiskey.image = target
+            whiskey.save(update_fields=['image', 'image_status'])
+            if not failed:
+                ImageBlob.objects.filter(name=target).update(
+                    size=stored_size(target)
+                )
+
+    if (whiskey is None or failed) and \
+            not ImageBlob.objects.filter(name=target).exists():
+        delete_image_files(target)
+
+
+class ImageRenderer(JSONErrorRenderer):
+    """Accept requests for images"""
+    media_type = 'image/*'
+    format = 'image'
+    charset = None
+
+
+class VariantCache:
+    """Size bounded LRU of resized images on disk
+
+    Variants are keyed by the source image name, which changes with
+    every upload, so they never need invalidating. Reads refresh the
+    modification time and the least recently used files are evicted
+    once the cache grows past WHISKEY_IMAGE_CACHE_MAX_BYTES. Renders of
+    the same variant are serialized by striped thread and file locks,
+    so concurrent requests from any process render it once.
+    """
+    stripes = 256
+
+    def __init__(self):
+        self._size = None
+        self._size_lock = threading.Lock()
+        self._locks = [threading.Lock() for _ in range(self.stripes)]
+
+    @property
+    def root(self):
+        return os.path.join(
+            settings.MEDIA_ROOT, settings.WHISKEY_IMAGE_CACHE_PATH
+        )
+
+    def key(self, name, width, image_format):
+        """Return the cache key of a variant"""
+        return hashlib.sha1(
+            f'{name}:{width}:{image_format}'.encode()
+        ).hexdigest()
+
+    def path(self, key, image_format):
+        """Return the file of a variant"""
+        return os.path.join(
+            self.root, key[:2], f'{key}.{EXTENSIONS[image_format]}'
+        )
+
+    def open(self, name, width, image_format):
+        """Return an open file of a variant, rendering it on first use"""
+        key = self.key(name, width, image_format)
+        path = self.path(key, image_format)
+        variant = self._open(path)
+        if variant is not None:
+            return variant
+
+        with self._locked(key):
+            variant = self._open(path)
+            if variant is None:
+                self._render(name, path, width, image_format)
+                variant = open(path, 'rb')
+                self._added(os.fstat(variant.fileno()).st_size)
+
+        return variant
+
+    def clear(self):
+        """Delete every cached variant"""
+        with self._size_lock:
+            shutil.rmtree(self.root, ignore_errors=True)
+            self._size = None
+
+    def _open(self, path):
+        try:
+            variant = open(path, 'rb')
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        return variant
+
+    @contextmanager
+    def _locked(self, key):
+        stripe = int(key[:2], 16) % self.stripes
+        with self._locks[stripe]:
+            if fcntl is None:
+                yield
+                return
+            directory = os.path.join(self.root, 'locks')
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f'{stripe}.lock'), 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _render(self, name, path, width, image_format):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        resize_image(
+            image_storage.path(name), path, width, image_format,
+            settings.WHISKEY_IMAGE_QUALITY
+        )
+
+    def _files(self):
+        """Yield the path and stat result of every cached variant"""
+        for directory in os.scandir(self.root):
+            if not directory.is_dir() or directory.name == 'locks':
+                continue
+            for entry in os.scandir(directory.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    yield entry.path, entry.stat()
+                except FileNotFoundError:
+                    pass
+
+    def _added(self, size):
+        """Count a new variant and evict the oldest ones when full"""
+        with self._size_lock:
+            if self._size is None:
+                self._size = sum(
+                    stat.st_size for path, stat in self._files()
+                )
+            else:
+                self._size += size
+            if self._size > settings.WHISKEY_IMAGE_CACHE_MAX_BYTES:
+                self._evict()
+
+    def _evict(self):
+        """Delete the least recently used variants down to 90% of the limit
+
+        The files are rescanned, so variants written by other processes
+        are accounted for.
+        """
+        entries = sorted(
+            (stat.st_mtime, stat.st_size, path)
+            for path, stat in self._files()
+        )
+        total = sum(size for mtime, size, path in entries)
+        limit = settings.WHISKEY_IMAGE_CACHE_MAX_BYTES * 0.9
+        for mtime, size, path in entries:
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
+
+
+variant_cache = VariantCache()
@@ -0,0 +1,123 @@
+import os
+import threading
+
+from PIL import Image, ImageOps
+
+# Worker processes import this module without setting up Django, so it
+# must only depend on Pillow.
+
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg', 'PNG': 'png'}
+CONTENT_TYPES = {
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+}
+ORIENTATION = 0x0112
+PROCESSED_SUFFIX = '_processed'
+
+
+def processed_name(name, image_format):
+    """Return the name of the re-encoded version of an uploaded image
+
+    The suffix keeps it apart from the upload even when both have the
+    same format, so an uploaded file is never overwritten.
+    """
+    root = os.path.splitext(name)[0]
+    return f'{root}{PROCESSED_SUFFIX}.{EXTENSIONS[image_format]}'
+
+
+def variant_name(name, size):
+    """Return the name of the thumbnail of an image at a size"""
+    root, ext = os.path.splitext(name)
+    return f'{root}_{size}{ext}'
+
+
+def convert_mode(image, image_format):
+    """Convert an image to RGB, or RGBA when it has transparency to keep"""
+    alpha = image.mode in ('RGBA', 'LA') or \
+        image.mode == 'P' and 'transparency' in image.info
+    mode = 'RGBA' if alpha and image_format != 'JPEG' else 'RGB'
+
+    return image if image.mode == mode else image.convert(mode)
+
+
+def save_image(image, path, image_format, quality, icc_profile):
+    """Encode an image without its metadata
+
+    The image is written to a temporary file renamed over path, so
+    readers never see a partly written file.
+    """
+    options = {'quality': quality}
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    if image_format == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    elif image_format == 'WEBP':
+        options['method'] = 4
+    temp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        image.save(temp, image_format, **options)
+        os.replace(temp, path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+def process_image(source, target, sizes, max_size, image_format, quality):
+    """Re-encode an uploaded image and write its thumbnails
+
+    The source is decoded once, at a reduced scale when the format
+    allows it, oriented by its EXIF tag and saved to target without
+    metadata. Thumbnails are derived from progressively smaller copies
+    and written next to target. Returns the written paths.
+    """
+    with Image.open(source) as image:
+        image.draft('RGB', (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+
+    icc_profile = image.info.get('icc_profile')
+    image = convert_mode(image, image_format)
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+
+    save_image(image, target, image_format, quality, icc_profile)
+    written = [target]
+    for size in sorted(sizes, reverse=True):
+        image = image.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        path = variant_name(target, size)
+        save_image(image, path, image_format, quality, icc_profile)
+        written.append(path)
+
+    return written
+
+
+def resize_image(source, target, width, image_format, quality):
+    """Write a copy of an image scaled down to a width
+
+    JPEG sources are decoded straight at a reduced scale with draft()
+    and other formats are shrunk by an integer factor with reduce()
+    before the final resampling, which keeps twice the target size for
+    quality. Images narrower than width keep their size.
+    """
+    with Image.open(source) as image:
+        rotated = image.getexif().get(ORIENTATION, 1) >= 5
+        if not rotated:
+            width = min(width, image.width)
+            box = (width, max(1, image.height * width // image.width))
+        else:
+            box = (width, width)
+        image.draft('RGB', box)
+        image = ImageOps.exif_transpose(image)
+
+    icc_profile = image.info.get('icc_profile')
+    image = convert_mode(image, image_format)
+    width = min(width, image.width)
+    height = max(1, round(image.height * width / image.width))
+    factor = image.width // (width * 2)
+    if factor >= 2:
+        image = image.reduce(factor)
+    if image.size != (width, height):
+        image = image.resize((width, height), Image.LANCZOS)
+
+    save_image(image, target, image_format, quality, icc_profile)
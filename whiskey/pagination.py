@@ -0,0 +1,175 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def order_expressions(model, ordering):
+    """Return order_by() arguments sorting null values last"""
+    expressions = []
+    for field in ordering:
+        name = field.lstrip('-')
+        if not model._meta.get_field(name).null:
+            expressions.append(field)
+        elif field.startswith('-'):
+            expressions.append(F(name).desc(nulls_last=True))
+        else:
+            expressions.append(F(name).asc(nulls_last=True))
+
+    return expressions
+
+
+class KeysetPagination(BasePagination):
+    """Paginate on the view ordering key using an opaque cursor
+
+    The cursor holds the ordering values of the last row served, so every
+    page is an index range scan instead of an OFFSET over earlier rows.
+    Pagination only applies when the client sends cursor or page_size.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return a single page of results, or None if not requested"""
+        params = request.query_params
+        if self.cursor_query_param not in params and \
+                self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.ordering = view.ordering
+        self.model = queryset.model
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(
+            *order_expressions(self.model, self.ordering)
+        )
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(
+                    self.get_position_filter(position)
+                )
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        return self.page
+
+    def get_page_size(self, request):
+        """Return the requested page size capped to the configured max"""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        if page_size <= 0:
+            return api_settings.PAGE_SIZE
+
+        return min(page_size, settings.WHISKEY_MAX_PAGE_SIZE)
+
+    def get_position_filter(self, position):
+        """Return a filter selecting rows after the cursor position
+
+        Null values of nullable fields sort after every other value.
+        """
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            after = self.get_after_filter(field, position[index])
+            if after is None:
+                continue
+            for prev_field, value in zip(self.ordering[:index], position):
+                name = prev_field.lstrip('-')
+                after &= Q(**{f'{name}__isnull': True}) if value is None \
+                    else Q(**{name: value})
+            condition |= after
+
+        return condition
+
+    def get_after_filter(self, field, value):
+        """Return a filter on one field selecting values after value"""
+        name = field.lstrip('-')
+        if value is None:
+            return None
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        after = Q(**{f'{name}__{lookup}': value})
+        if self.model._meta.get_field(name).null:
+            after |= Q(**{f'{name}__isnull': True})
+
+        return after
+
+    def get_position(self, instance):
+        """Return the ordering key values of an instance or values() row"""
+        if isinstance(instance, dict):
+            return [instance[field.lstrip('-')] for field in self.ordering]
+
+        return [
+            getattr(instance, field.lstrip('-')) for field in self.ordering
+        ]
+
+    def decode_cursor(self, request):
+        """Decode the cursor query parameter into a position"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or \
+                len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position
+
+    def encode_cursor(self, position):
+        """Encode a position into an opaque cursor"""
+        data = json.dumps(
+            position, separators=(',', ':'), cls=DjangoJSONEncoder
+        ).encode()
+
+        return base64.urlsafe_b64encode(data).decode()
+
+    def get_next_link(self):
+        """Return the url of the next page, if there is one"""
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+        cursor = self.encode_cursor(self.get_position(self.page[-1]))
+
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        """Wrap a page of data with the next page link"""
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                },
+                'results': schema,
+            },
+        }
@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.db.models import IntegerField, Value
+
+from rest_framework.response import Response
+
+
+def blank_string(value):
+    """Format a value as a string, with '' for None"""
+    return '' if value is None else str(value)
+
+
+def related_ids(model, field_names, ids):
+    """Return the sorted related ids of each object, per relation
+
+    Every many to many table is read in a single UNION query.
+    """
+    related = {pk: [[] for name in field_names] for pk in ids}
+    if not field_names or not ids:
+        return related
+
+    queries = []
+    for position, name in enumerate(field_names):
+        field = model._meta.get_field(name)
+        source = f'{field.m2m_field_name()}_id'
+        target = f'{field.m2m_reverse_field_name()}_id'
+        queries.append(
+            field.remote_field.through.objects.filter(
+                **{f'{source}__in': ids}
+            ).annotate(
+                relation=Value(position, output_field=IntegerField())
+            ).values_list(source, target, 'relation')
+        )
+
+    for pk, related_pk, position in \
+            queries[0].union(*queries[1:], all=True):
+        related[pk][position].append(related_pk)
+    for lists in related.values():
+        for pks in lists:
+            pks.sort()
+
+    return related
+
+
+class ValuesListMixin:
+    """Build list responses from values() rows when WHISKEY_FAST_LIST is set
+
+    The rows skip serializer fields entirely, so value_fields and
+    relation_fields must reproduce the list serializer output: values
+    are copied as they are unless value_formatters has a function for
+    them, and relations become sorted lists of ids. Key fields are read
+    for pagination and relations without being returned.
+    """
+    value_fields = ()
+    value_formatters = {}
+    relation_fields = ()
+
+    def get_value_fields(self):
+        """Return the fields copied from each values() row"""
+        return self.value_fields
+
+    def get_relation_fields(self):
+        """Return the relations listed as ids in each row"""
+        return self.relation_fields
+
+    def get_key_fields(self):
+        """Return the fields each row needs for pagination and relations"""
+        return ('id',)
+
+    def list(self, request, *args, **kwargs):
+        if not settings.WHISKEY_FAST_LIST:
+            return super().list(request, *args, **kwargs)
+
+        value_fields = self.get_value_fields()
+        relation_fields = self.get_relation_fields()
+        key_fields = [
+            name for name in self.get_key_fields()
+            if name not in value_fields
+        ]
+        queryset = self.filter_queryset(
+            self.get_queryset()
+        ).prefetch_related(None).values(*value_fields, *key_fields)
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+
+        related = related_ids(
+            queryset.model,
+            relation_fields,
+            [row['id'] for row in rows]
+        )
+        # the page rows are left as read, for the next page cursor
+        data = []
+        for row in rows:
+            item = {
+                name: self.value_formatters[name](row[name])
+                if name in self.value_formatters else row[name]
+                for name in value_fields
+            }
+            for name, pks in zip(relation_fields, related[row['id']]):
+                item[name] = pks
+            data.append(item)
+
+        if page is not None:
+            return self.get_paginated_response(data)
+
+        return Response(data)
@@ -0,0 +1,157 @@
+import difflib
+import re
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+                                           SearchVector, TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, F, IntegerField, OuterRef, Q, \
+                             QuerySet, Subquery, When
+from django.db.models.functions import Greatest
+
+from core.models import Whiskey
+
+from whiskey.export import related_names
+
+
+WORD_RE = re.compile(r'\w+')
+FUZZY_RATIO = 0.75
+
+_trigram_available = {}
+
+
+def uses_postgres_search():
+    """Return True if the database supports full-text search"""
+    return connection.vendor == 'postgresql'
+
+
+def trigram_available():
+    """Return True if the pg_trgm extension is installed"""
+    if connection.alias not in _trigram_available:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+            )
+            _trigram_available[connection.alias] = \
+                cursor.fetchone() is not None
+
+    return _trigram_available[connection.alias]
+
+
+def related_names_expression(field_name):
+    """Return a subquery aggregating the related names of a whiskey"""
+    field = Whiskey._meta.get_field(field_name)
+    name = f'{field.m2m_reverse_field_name()}__name'
+
+    return Subquery(
+        field.remote_field.through.objects.filter(
+            whiskey_id=OuterRef('pk')
+        ).values('whiskey_id').annotate(
+            names=StringAgg(name, ' ')
+        ).values('names')
+    )
+
+
+def search_vector():
+    """Return the weighted document searched for each whiskey"""
+    config = settings.WHISKEY_SEARCH_CONFIG
+
+    return (
+        SearchVector('brand', weight='A', config=config) +
+        SearchVector('style', weight='B', config=config) +
+        SearchVector(
+            related_names_expression('tags'), weight='C', config=config
+        ) +
+        SearchVector(
+            related_names_expression('places'), weight='D', config=config
+        )
+    )
+
+
+def update_search_vectors(whiskeys):
+    """Recompute the stored search vector of whiskeys
+
+    whiskeys is a queryset or a list of whiskey ids.
+    """
+    if not uses_postgres_search():
+        return
+    if not isinstance(whiskeys, QuerySet):
+        whiskeys = Whiskey.objects.filter(pk__in=list(whiskeys))
+
+    whiskeys.update(search_vector=search_vector())
+
+
+def search_terms(term):
+    """Split a search string into lowercase words"""
+    return WORD_RE.findall(term.lower())
+
+
+def search(queryset, term):
+    """Filter and rank whiskeys matching a search string"""
+    words = search_terms(term)
+    if not words:
+        return queryset.none()
+    if not uses_postgres_search():
+        return python_search(queryset, words)
+
+    query = SearchQuery(
+        ' & '.join(f'{word}:*' for word in words),
+        config=settings.WHISKEY_SEARCH_CONFIG,
+        search_type='raw'
+    )
+    rank = SearchRank(F('search_vector'), query)
+    condition = Q(search_vector=query)
+    if trigram_available():
+        text = ' '.join(words)
+        rank = rank + Greatest(
+            TrigramSimilarity('brand', text),
+            TrigramSimilarity('style', text)
+        )
+        condition |= Q(brand__trigram_similar=text) | \
+            Q(style__trigram_similar=text)
+
+    return queryset.annotate(
+        search_rank=rank
+    ).filter(condition).order_by('-search_rank', '-id')
+
+
+def word_score(word, tokens):
+    """Score how well a search word matches a document's tokens"""
+    best = 0.0
+    for token in tokens:
+        if token.startswith(word):
+            return 1.0
+        ratio = difflib.SequenceMatcher(None, word, token).ratio()
+        if ratio >= FUZZY_RATIO:
+            best = max(best, ratio)
+
+    return best
+
+
+def python_search(queryset, words):
+    """Rank whiskeys in Python for databases without full-text search"""
+    rows = list(queryset.values_list('id', 'brand', 'style'))
+    ids = [row[0] for row in rows]
+    tags = related_names('tags', ids)
+    places = related_names('places', ids)
+
+    scores = {}
+    for pk, brand, style in rows:
+        document = ' '.join(
+            [brand, style] + tags.get(pk, []) + places.get(pk, [])
+        )
+        tokens = set(search_terms(document))
+        word_scores = [word_score(word, tokens) for word in words]
+        if all(word_scores):
+            scores[pk] = sum(word_scores)
+
+    ranked = sorted(scores, key=lambda pk: (scores[pk], pk), reverse=True)
+    if not ranked:
+        return queryset.none()
+    order = Case(
+        *[When(pk=pk, then=position) for position, pk in enumerate(ranked)],
+        output_field=IntegerField()
+    )
+
+    return queryset.filter(pk__in=ranked).order_by(order)
@@ -1,6 +1,196 @@
+import warnings
+from collections import OrderedDict
+
+from PIL import Image
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from core.models import CollectionStats, ImageStatus, Tag, Place, Whiskey
+from core.numbers import parse_price, parse_year
+
+from whiskey.images import image_variants
+
+
+class UserManyRelatedField(serializers.ManyRelatedField):
+    """Resolve a list of primary keys with a single query
+
+    Objects resolved ahead with prefetch() are used instead, so a list
+    of items is validated with one query per relation.
+    """
+    resolved = None
+
+    def to_pk(self, item):
+        """Return a submitted primary key as a python value"""
+        child = self.child_relation
+        if isinstance(item, bool):
+            child.fail('incorrect_type', data_type=type(item).__name__)
+        try:
+            return child.get_queryset().model._meta.pk.to_python(item)
+        except DjangoValidationError:
+            child.fail('incorrect_type', data_type=type(item).__name__)
+
+    def prefetch(self, values):
+        """Resolve the primary keys submitted in many items at once"""
+        pks = set()
+        for data in values:
+            if isinstance(data, str) or not hasattr(data, '__iter__'):
+                continue
+            for item in data:
+                try:
+                    pks.add(self.to_pk(item))
+                except serializers.ValidationError:
+                    pass
+
+        self.resolved = self.child_relation.get_queryset().only(
+            'pk'
+        ).in_bulk(pks)
+
+    def to_internal_value(self, data):
+        """Return the objects for the submitted primary keys"""
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        pks = list(dict.fromkeys(self.to_pk(item) for item in data))
+
+        objects = self.resolved
+        if objects is None:
+            objects = child.get_queryset().only('pk').in_bulk(pks)
+        missing = [pk for pk in pks if pk not in objects]
+        if missing:
+            raise serializers.ValidationError([
+                child.error_messages['does_not_exist'].format(pk_value=pk)
+                for pk in missing
+            ], code='does_not_exist')
+
+        return [objects[pk] for pk in pks]
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key relation limited to the requesting user's objects"""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+
+        return UserManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        """Return only objects owned by the requesting user"""
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is None:
+            return queryset.none()
+
+        return queryset.filter(user=request.user)
+
+
+class BlankNumberMixin:
+    """Read and write a missing number as an empty string
+
+    price and year used to be text columns, so clients send and receive
+    '' for a missing value and numbers as strings. Values are read with
+    parse, the function the migration from those columns used.
+    """
+
+    def __init__(self, parse, **kwargs):
+        self.parse = parse
+        kwargs.setdefault('allow_null', True)
+        kwargs.setdefault('required', False)
+        super().__init__(**kwargs)
+
+    def validate_empty_values(self, data):
+        if data == '':
+            return (True, None)
+
+        return super().validate_empty_values(data)
+
+    def to_internal_value(self, data):
+        value = self.parse(data)
+        if value is None:
+            self.fail('invalid')
+
+        return super().to_internal_value(value)
+
+    def get_attribute(self, instance):
+        value = super().get_attribute(instance)
+        return '' if value is None else value
+
+    def to_representation(self, value):
+        if value == '':
+            return ''
+
+        return str(super().to_representation(value))
+
+
+class BlankIntegerField(BlankNumberMixin, serializers.IntegerField):
+    """Integer represented as a string, with '' for no value"""
+
+
+class BlankDecimalField(BlankNumberMixin, serializers.DecimalField):
+    """Decimal represented as a string, with '' for no value"""
+
+
+class HeaderImageField(serializers.ImageField):
+    """Validate an uploaded image from its header
+
+    Only the header is parsed, so the format, dimensions and pixel count
+    are checked against the configured limits without decoding pixels.
+    """
+    default_error_messages = {
+        'max_size': 'Ensure the image is at most {max_size} bytes.',
+        'format': 'Upload a {formats} image.',
+        'max_dimension': 'Ensure the image is at most {max_dimension} '
+                         'pixels wide and high.',
+        'max_pixels': 'Ensure the image has at most {max_pixels} pixels.',
+    }
+
+    def to_internal_value(self, data):
+        data = serializers.FileField.to_internal_value(self, data)
+        if data.size > settings.WHISKEY_IMAGE_MAX_UPLOAD_BYTES:
+            self.fail(
+                'max_size', max_size=settings.WHISKEY_IMAGE_MAX_UPLOAD_BYTES
+            )
+
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+                with Image.open(data) as image:
+                    image_format, (width, height) = image.format, image.size
+        except Image.DecompressionBombError:
+            self.fail(
+                'max_pixels', max_pixels=settings.WHISKEY_IMAGE_MAX_PIXELS
+            )
+        except Exception:
+            self.fail('invalid_image')
+        finally:
+            data.seek(0)
 
-from core.models import Tag, Place, Whiskey
+        if image_format not in settings.WHISKEY_IMAGE_UPLOAD_FORMATS:
+            self.fail('format', formats=', '.join(
+                settings.WHISKEY_IMAGE_UPLOAD_FORMATS
+            ))
+        if max(width, height) > settings.WHISKEY_IMAGE_MAX_DIMENSION:
+            self.fail(
+                'max_dimension',
+                max_dimension=settings.WHISKEY_IMAGE_MAX_DIMENSION
+            )
+        if width * height > settings.WHISKEY_IMAGE_MAX_PIXELS:
+            self.fail(
+                'max_pixels', max_pixels=settings.WHISKEY_IMAGE_MAX_PIXELS
+            )
+        data.content_type = Image.MIME.get(image_format)
+
+        return data
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -12,6 +202,14 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
+class TagCountSerializer(TagSerializer):
+    """Serializer for tag objects with the number of whiskeys using them"""
+    whiskey_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ('whiskey_count',)
+
+
 class PlaceSerializer(serializers.ModelSerializer):
     """Serializer for place objects"""
 
@@ -21,16 +219,72 @@ class PlaceSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class WhiskeySerializer(serializers.ModelSerializer):
+class PlaceCountSerializer(PlaceSerializer):
+    """Serializer for place objects with the number of whiskeys using them"""
+    whiskey_count = serializers.IntegerField(read_only=True)
+
+    class Meta(PlaceSerializer.Meta):
+        fields = PlaceSerializer.Meta.fields + ('whiskey_count',)
+
+
+class SparseFieldsMixin:
+    """Serialize only the field names passed as fields, when given"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class WhiskeyBulkListSerializer(serializers.ListSerializer):
+    """Create a list of whiskeys with batched inserts"""
+
+    def to_internal_value(self, data):
+        """Validate every item, resolving their relations together"""
+        fields = [
+            field for field in self.child.fields.values()
+            if isinstance(field, UserManyRelatedField)
+        ]
+        if isinstance(data, list):
+            for field in fields:
+                field.prefetch(
+                    item.get(field.field_name) or ()
+                    for item in data if isinstance(item, dict)
+                )
+        try:
+            return super().to_internal_value(data)
+        finally:
+            for field in fields:
+                field.resolved = None
+
+    def create(self, validated_data):
+        """Insert every whiskey and relation in one transaction"""
+        whiskeys, tags, places = [], [], []
+        for attrs in validated_data:
+            tags.append([tag.pk for tag in attrs.pop('tags', [])])
+            places.append([place.pk for place in attrs.pop('places', [])])
+            whiskeys.append(Whiskey(**attrs))
+
+        return Whiskey.objects.bulk_create_with_relations(
+            whiskeys, tags, places
+        )
+
+
+class WhiskeySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serialize a Whiskey"""
-    places = serializers.PrimaryKeyRelatedField(
+    places = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Place.objects.all()
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
+    year = BlankIntegerField(parse_year, min_value=1, max_value=9999)
+    price = BlankDecimalField(
+        parse_price, max_digits=10, decimal_places=2, min_value=0
+    )
 
     class Meta:
         model = Whiskey
@@ -41,16 +295,83 @@ class WhiskeySerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class WhiskeyDetailSerializer(WhiskeySerializer):
+class WhiskeyBulkSerializer(WhiskeySerializer):
+    """Serialize one item of a bulk create, where relations are optional"""
+    places = UserPrimaryKeyRelatedField(
+        many=True,
+        required=False,
+        queryset=Place.objects.all()
+    )
+    tags = UserPrimaryKeyRelatedField(
+        many=True,
+        required=False,
+        queryset=Tag.objects.all()
+    )
+
+    class Meta(WhiskeySerializer.Meta):
+        list_serializer_class = WhiskeyBulkListSerializer
+
+
+class ImageVariantsMixin(serializers.Serializer):
+    """Add the URLs of the thumbnails of a processed image"""
+    image_variants = serializers.SerializerMethodField()
+
+    def get_image_variants(self, whiskey):
+        """Return the thumbnail URL of each size once processing is done"""
+        if not whiskey.image or whiskey.image_status != ImageStatus.READY:
+            return {}
+
+        request = self.context.get('request')
+        variants = OrderedDict()
+        for size, name in image_variants(whiskey.image.name).items():
+            url = whiskey.image.storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            variants[str(size)] = url
+
+        return variants
+
+
+class WhiskeyDetailSerializer(ImageVariantsMixin, WhiskeySerializer):
     """Serialize a whiskey detail"""
     places = PlaceSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
 
+    class Meta(WhiskeySerializer.Meta):
+        fields = WhiskeySerializer.Meta.fields + (
+            'image', 'image_status', 'image_variants'
+        )
+        read_only_fields = ('id', 'image', 'image_status')
+
 
-class WhiskeyImageSerializer(serializers.ModelSerializer):
+class WhiskeyImageSerializer(ImageVariantsMixin,
+                             serializers.ModelSerializer):
     """Serialize a whiskey image"""
+    image = HeaderImageField()
 
     class Meta:
         model = Whiskey
-        fields = ('id', 'image')
-        read_only = ('id',)
+        fields = ('id', 'image', 'image_status', 'image_variants')
+        read_only_fields = ('id', 'image_status')
+
+
+class CollectionStatsSerializer(serializers.ModelSerializer):
+    """Serialize the running totals of a collection"""
+    styles = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CollectionStats
+        fields = (
+            'whiskey_count', 'priced_count', 'total_spend', 'styles',
+            'tag_count', 'place_count', 'tag_assignments',
+            'place_assignments'
+        )
+        read_only_fields = fields
+
+    def get_styles(self, stats):
+        """Return the style counts, most common first"""
+        counts = stats.get_style_counts()
+        return [
+            {'value': style, 'count': counts[style]}
+            for style in sorted(counts, key=lambda s: (-counts[s], s))
+        ]
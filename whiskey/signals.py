@@ -0,0 +1,249 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, \
+                                     pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from core.models import CollectionStats, CollectionVersion, Tag, Place, \
+                        Whiskey
+from core.signals import whiskeys_created
+
+from whiskey.autocomplete import SOURCES, autocomplete_index
+from whiskey.cache import collection_bumped, collection_changes, \
+                          mark_collection_changed
+from whiskey.images import acquire_image, release_image
+from whiskey.search import update_search_vectors
+from whiskey.stats import OBJECT_COUNTERS, RELATION_COUNTERS, \
+                          apply_changes, count_links, merge_changes, \
+                          record_whiskeys_created, whiskey_changes
+
+
+TRACKED_FIELDS = ('style', 'price', 'image')
+
+AUTOCOMPLETE_SOURCES = {
+    model: (kind, field)
+    for kind, (model, field) in SOURCES.items()
+}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Place)
+@receiver(post_save, sender=Whiskey)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Place)
+@receiver(post_delete, sender=Whiskey)
+def collection_changed(sender, instance, signal, **kwargs):
+    """Invalidate the owner's cached responses when an object changes"""
+    kind, field = AUTOCOMPLETE_SOURCES[sender]
+    name = getattr(instance, field) if signal is post_save else None
+    mark_collection_changed(instance.user_id, (kind, instance.pk, name))
+
+
+@receiver(m2m_changed, sender=Whiskey.tags.through)
+@receiver(m2m_changed, sender=Whiskey.places.through)
+def relations_changed(sender, instance, action, **kwargs):
+    """Invalidate the owner's cached responses when relations change"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        mark_collection_changed(instance.user_id)
+
+
+@receiver(whiskeys_created)
+def bulk_collection_changed(sender, whiskeys, **kwargs):
+    """Invalidate the owners' cached responses after a bulk insert"""
+    kind, field = AUTOCOMPLETE_SOURCES[Whiskey]
+    with collection_changes():
+        for whiskey in whiskeys:
+            mark_collection_changed(
+                whiskey.user_id, (kind, whiskey.pk, getattr(whiskey, field))
+            )
+
+
+@receiver(collection_bumped)
+def collection_version_bumped(sender, user_id, version, changes, **kwargs):
+    """Apply the names changed by a bump to the autocomplete index"""
+    transaction.on_commit(partial(
+        autocomplete_index.apply, user_id, version, changes
+    ))
+
+
+@receiver(post_save, sender=Whiskey)
+def whiskey_saved(sender, instance, **kwargs):
+    """Index the brand and style of a saved whiskey"""
+    update_search_vectors([instance.pk])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Place)
+def attribute_saved(sender, instance, created, **kwargs):
+    """Reindex the whiskeys using a renamed tag or place"""
+    if not created:
+        update_search_vectors(instance.whiskey_set.all())
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Place)
+def attribute_deleting(sender, instance, **kwargs):
+    """Remember the whiskeys using a tag or place before it is deleted"""
+    instance._search_whiskey_ids = list(
+        instance.whiskey_set.values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Place)
+def attribute_deleted(sender, instance, **kwargs):
+    """Reindex the whiskeys that used a deleted tag or place"""
+    update_search_vectors(getattr(instance, '_search_whiskey_ids', []))
+
+
+@receiver(m2m_changed, sender=Whiskey.tags.through)
+@receiver(m2m_changed, sender=Whiskey.places.through)
+def search_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    """Reindex whiskeys whose tags or places changed"""
+    if reverse:
+        if action == 'pre_clear':
+            instance._search_whiskey_ids = list(
+                instance.whiskey_set.values_list('pk', flat=True)
+            )
+        elif action == 'post_clear':
+            update_search_vectors(instance._search_whiskey_ids)
+        elif action in ('post_add', 'post_remove'):
+            update_search_vectors(pk_set)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        update_search_vectors([instance.pk])
+
+
+@receiver(whiskeys_created)
+def bulk_whiskeys_saved(sender, whiskeys, **kwargs):
+    """Index whiskeys inserted in bulk, with their relations"""
+    update_search_vectors([whiskey.pk for whiskey in whiskeys])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    """Start the version and statistics of a new user's collection"""
+    if created and not raw:
+        CollectionVersion.objects.create(user=instance)
+        CollectionStats.objects.create(user=instance)
+
+
+@receiver(pre_save, sender=Whiskey)
+def whiskey_saving(sender, instance, update_fields=None, **kwargs):
+    """Remember the style, price and image a whiskey is saved over"""
+    instance._previous = None
+    if instance.pk is None or update_fields is not None and \
+            not set(TRACKED_FIELDS) & set(update_fields):
+        return
+
+    instance._previous = Whiskey.objects.filter(
+        pk=instance.pk
+    ).only(*TRACKED_FIELDS).first()
+
+
+@receiver(post_save, sender=Whiskey)
+def whiskey_stats_saved(sender, instance, created, **kwargs):
+    """Count a created whiskey or move a changed one between totals"""
+    previous = getattr(instance, '_previous', None)
+    if created:
+        instance._stats_counted = True
+        changes = whiskey_changes([instance])
+    elif previous is not None:
+        changes = merge_changes(
+            whiskey_changes([instance]),
+            whiskey_changes([previous], sign=-1)
+        )
+    else:
+        return
+
+    apply_changes(instance.user_id, **changes)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Place)
+@receiver(pre_delete, sender=Whiskey)
+def stats_deleting(sender, instance, **kwargs):
+    """Count the relations removed along with a deleted object"""
+    column = f'{sender._meta.model_name}_id'
+    instance._stats_links = {
+        name: count_links(through, **{column: instance.pk})
+        for through, name in RELATION_COUNTERS.items()
+        if column in (field.column for field in through._meta.fields)
+    }
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Place)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Place)
+@receiver(post_delete, sender=Whiskey)
+def stats_object_changed(sender, instance, signal, created=False,
+                         **kwargs):
+    """Count created and deleted tags, places and whiskeys"""
+    if signal is post_save:
+        if created:
+            apply_changes(instance.user_id, **{OBJECT_COUNTERS[sender]: 1})
+        return
+
+    changes = {
+        name: -count
+        for name, count in getattr(instance, '_stats_links', {}).items()
+    }
+    if sender is Whiskey:
+        changes = merge_changes(changes, whiskey_changes([instance], -1))
+    else:
+        changes[OBJECT_COUNTERS[sender]] = -1
+    apply_changes(instance.user_id, **changes)
+
+
+@receiver(m2m_changed, sender=Whiskey.tags.through)
+@receiver(m2m_changed, sender=Whiskey.places.through)
+def stats_relations_changed(sender, instance, action, reverse, model,
+                            pk_set, **kwargs):
+    """Count added and removed tag and place assignments"""
+    name = RELATION_COUNTERS[sender]
+    if action in ('pre_remove', 'pre_clear'):
+        filters = {f'{instance._meta.model_name}_id': instance.pk}
+        if pk_set is not None:
+            filters[f'{model._meta.model_name}_id__in'] = pk_set
+        instance._stats_removed = count_links(sender, **filters)
+    elif action == 'post_add':
+        apply_changes(instance.user_id, **{name: len(pk_set)})
+    elif action in ('post_remove', 'post_clear'):
+        apply_changes(instance.user_id, **{name: -instance._stats_removed})
+
+
+@receiver(whiskeys_created)
+def stats_bulk_created(sender, whiskeys, **kwargs):
+    """Count whiskeys inserted in bulk and their relations"""
+    owners = {}
+    for whiskey in whiskeys:
+        owners.setdefault(whiskey.user_id, []).append(whiskey)
+    for user_id, owned in owners.items():
+        record_whiskeys_created(user_id, owned)
+
+
+@receiver(post_save, sender=Whiskey)
+def image_saved(sender, instance, created, **kwargs):
+    """Move the image reference of a whiskey given a new image"""
+    previous = getattr(instance, '_previous', None)
+    if not created and previous is None:
+        return
+
+    old = previous.image.name if previous is not None else None
+    new = instance.image.name
+    if old == new:
+        return
+    if new:
+        acquire_image(new)
+    if old:
+        release_image(old)
+
+
+@receiver(post_delete, sender=Whiskey)
+def image_deleted(sender, instance, **kwargs):
+    """Release the image of a deleted whiskey"""
+    if instance.image:
+        release_image(instance.image.name)
@@ -0,0 +1,179 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+
+from core.models import CollectionStats, Tag, Place, Whiskey
+
+
+COUNTERS = (
+    'whiskey_count', 'priced_count', 'tag_count', 'place_count',
+    'tag_assignments', 'place_assignments',
+)
+OBJECT_COUNTERS = {Tag: 'tag_count', Place: 'place_count'}
+RELATION_COUNTERS = {
+    Whiskey.tags.through: 'tag_assignments',
+    Whiskey.places.through: 'place_assignments',
+}
+
+
+def to_price(value):
+    """Return a price as a Decimal, or None"""
+    return Whiskey._meta.get_field('price').to_python(value)
+
+
+def whiskey_changes(whiskeys, sign=1):
+    """Return the changes made by adding (or removing) whiskeys"""
+    changes = {'whiskey_count': 0, 'priced_count': 0, 'total_spend': 0,
+               'styles': Counter()}
+    for whiskey in whiskeys:
+        changes['whiskey_count'] += sign
+        changes['styles'][whiskey.style] += sign
+        price = to_price(whiskey.price)
+        if price is not None:
+            changes['priced_count'] += sign
+            changes['total_spend'] += sign * price
+
+    return changes
+
+
+def merge_changes(*changes):
+    """Add several sets of changes together"""
+    merged = {'styles': Counter()}
+    for change in changes:
+        for name, value in change.items():
+            if name == 'styles':
+                merged['styles'].update(value)
+            else:
+                merged[name] = merged.get(name, 0) + value
+
+    return merged
+
+
+def apply_changes(user_id, styles=None, **changes):
+    """Add changes to the statistics row of a user
+
+    Counters are updated with F() expressions. Changes to the style
+    counts lock the row while its JSON is rewritten. Users without a
+    row, such as users being deleted, are left alone.
+    """
+    changes = {name: value for name, value in changes.items() if value}
+    styles = {style: count for style, count in (styles or {}).items()
+              if count}
+    if not changes and not styles:
+        return
+
+    rows = CollectionStats.objects.filter(user_id=user_id)
+    if not styles:
+        rows.update(**{
+            name: F(name) + value if name == 'total_spend'
+            else Greatest(F(name) + value, 0)
+            for name, value in changes.items()
+        })
+        return
+
+    with transaction.atomic(savepoint=False):
+        stats = rows.select_for_update().first()
+        if stats is None:
+            return
+        for name, value in changes.items():
+            value += getattr(stats, name)
+            setattr(stats, name, value if name == 'total_spend'
+                    else max(value, 0))
+        counts = Counter(stats.get_style_counts())
+        counts.update(styles)
+        stats.set_style_counts(counts)
+        stats.save()
+
+
+def count_links(through, **filters):
+    """Return the number of relation rows matching the filters"""
+    return through.objects.filter(**filters).count()
+
+
+def record_whiskeys_created(user_id, whiskeys):
+    """Apply whiskeys created in bulk, with their relations
+
+    Whiskeys already counted by their post_save signal are skipped.
+    """
+    ids = [whiskey.pk for whiskey in whiskeys]
+    uncounted = [
+        whiskey for whiskey in whiskeys
+        if not getattr(whiskey, '_stats_counted', False)
+    ]
+    apply_changes(user_id, **merge_changes(whiskey_changes(uncounted), {
+        name: count_links(through, whiskey_id__in=ids)
+        for through, name in RELATION_COUNTERS.items()
+    }))
+
+
+def compute_stats(user_id):
+    """Return the statistics of a user's collection from scratch"""
+    whiskeys = Whiskey.objects.filter(user_id=user_id)
+    stats = whiskeys.aggregate(
+        whiskey_count=Count('pk'),
+        priced_count=Count('price'),
+        total_spend=Sum('price')
+    )
+    if stats['total_spend'] is None:
+        stats['total_spend'] = 0
+    stats['style_counts'] = dict(
+        whiskeys.values_list('style').annotate(
+            count=Count('pk')
+        ).order_by('style')
+    )
+    for model, name in OBJECT_COUNTERS.items():
+        stats[name] = model.objects.filter(user_id=user_id).count()
+    for through, name in RELATION_COUNTERS.items():
+        stats[name] = count_links(through, whiskey__user_id=user_id)
+
+    return stats
+
+
+def stored_stats(stats):
+    """Return a statistics row in the format of compute_stats"""
+    stored = {name: getattr(stats, name) for name in COUNTERS}
+    stored['total_spend'] = stats.total_spend
+    stored['style_counts'] = stats.get_style_counts()
+
+    return stored
+
+
+def rebuild_stats(user_id):
+    """Recompute and store the statistics of a user
+
+    The row is locked before counting, so changes committed meanwhile
+    are either counted or applied on top of the rebuilt row.
+    """
+    with transaction.atomic():
+        CollectionStats.objects.get_or_create(user_id=user_id)
+        stats = CollectionStats.objects.select_for_update().get(
+            user_id=user_id
+        )
+        values = compute_stats(user_id)
+        stats.set_style_counts(values.pop('style_counts'))
+        for name, value in values.items():
+            setattr(stats, name, value)
+        stats.save()
+
+    return stats
+
+
+def check_stats(user_id):
+    """Return the (stored, actual) values of every inconsistent statistic
+
+    A missing row is reported under the name 'row'.
+    """
+    stats = CollectionStats.objects.filter(user_id=user_id).first()
+    if stats is None:
+        return {'row': ('missing', 'present')}
+
+    stored = stored_stats(stats)
+    actual = compute_stats(user_id)
+
+    return {
+        name: (stored[name], value)
+        for name, value in actual.items()
+        if stored[name] != value
+    }
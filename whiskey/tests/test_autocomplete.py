@@ -0,0 +1,147 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Place, Whiskey
+
+from whiskey.autocomplete import NameIndex, autocomplete_index
+
+
+AUTOCOMPLETE_URL = reverse('whiskey:autocomplete')
+
+
+class NameIndexTests(TestCase):
+    """Test the sorted prefix index of names"""
+
+    def test_complete_prefix(self):
+        """Test completions are case insensitive and in order"""
+        index = NameIndex(
+            [(1, 'Bulleit'), (2, 'buffalo Trace'), (3, 'Ardbeg')]
+        )
+
+        self.assertEqual(
+            index.complete('BU', 10), ['buffalo Trace', 'Bulleit']
+        )
+        self.assertEqual(index.complete('bu', 1), ['buffalo Trace'])
+        self.assertEqual(index.complete('c', 10), [])
+
+    def test_duplicate_names_counted(self):
+        """Test a name shared by objects stays until the last is gone"""
+        index = NameIndex([(1, 'Bulleit'), (2, 'Bulleit')])
+        self.assertEqual(len(index), 1)
+
+        index.delete(1)
+        self.assertEqual(index.complete('b', 10), ['Bulleit'])
+        index.set(2, 'Blanton')
+        self.assertEqual(index.complete('b', 10), ['Blanton'])
+
+
+class AutocompleteApiTests(TestCase):
+    """Test the autocomplete endpoint"""
+
+    def setUp(self):
+        autocomplete_index.clear()
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Whiskey.objects.create(user=self.user, brand='Bulleit', style='Rye')
+        Whiskey.objects.create(
+            user=self.user, brand='Buffalo Trace', style='Bourbon'
+        )
+        Tag.objects.create(user=self.user, name='Burnt')
+        Place.objects.create(user=self.user, name='Bar')
+
+    def test_login_required(self):
+        """Test that authentication is required"""
+        res = APIClient().get(AUTOCOMPLETE_URL, {'q': 'b'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_autocomplete(self):
+        """Test completing each kind of name"""
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'bu'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'brands': ['Buffalo Trace', 'Bulleit'],
+            'tags': ['Burnt'],
+            'places': [],
+        })
+
+    def test_autocomplete_limit_and_kinds(self):
+        """Test limiting the completions and kinds returned"""
+        res = self.client.get(
+            AUTOCOMPLETE_URL, {'q': 'b', 'limit': 1, 'kinds': 'brands'}
+        )
+
+        self.assertEqual(res.data, {'brands': ['Buffalo Trace']})
+
+    def test_autocomplete_invalid_params(self):
+        """Test invalid limits and kinds are rejected"""
+        res = self.client.get(AUTOCOMPLETE_URL, {'limit': 0})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'kinds': 'brands,colors'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('kinds', res.data)
+
+    def test_autocomplete_limited_to_user(self):
+        """Test other users' names are not completed"""
+        other = get_user_model().objects.create_user('Other', 'TestPass123')
+        Whiskey.objects.create(user=other, brand='Booker', style='Bourbon')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'boo'})
+
+        self.assertEqual(res.data['brands'], [])
+
+    def test_index_reused_until_collection_changes(self):
+        """Test the index is built once and rebuilt after a change"""
+        self.client.get(AUTOCOMPLETE_URL, {'q': 'b'})
+        with self.assertNumQueries(1):
+            self.client.get(AUTOCOMPLETE_URL, {'q': 'b'})
+
+        Whiskey.objects.create(user=self.user, brand='Booker', style='Rye')
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'boo'})
+
+        self.assertEqual(res.data['brands'], ['Booker'])
+
+
+class AutocompleteUpdateTests(TransactionTestCase):
+    """Test committed writes update the index in place"""
+
+    def setUp(self):
+        autocomplete_index.clear()
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.whiskey = Whiskey.objects.create(
+            user=self.user, brand='Bulleit', style='Rye'
+        )
+        self.client.get(AUTOCOMPLETE_URL)
+
+    def complete(self, prefix):
+        with self.assertNumQueries(1):
+            res = self.client.get(AUTOCOMPLETE_URL, {'q': prefix})
+        return res.data
+
+    def test_writes_applied_without_rebuild(self):
+        """Test creates, renames and deletes are applied incrementally"""
+        tag = Tag.objects.create(user=self.user, name='Spicy')
+        self.assertEqual(self.complete('sp')['tags'], ['Spicy'])
+
+        self.whiskey.brand = 'Blanton'
+        self.whiskey.save()
+        self.assertEqual(self.complete('b')['brands'], ['Blanton'])
+
+        self.whiskey.tags.add(tag)
+        tag.delete()
+        self.assertEqual(self.complete('sp')['tags'], [])
@@ -0,0 +1,153 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings, skipUnlessDBFeature
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import CollectionStats, CollectionVersion, Tag, Place, \
+                        Whiskey
+
+from whiskey.cache import get_cache
+
+
+WHISKEY_URL = reverse('whiskey:whiskey-list')
+BULK_URL = reverse('whiskey:whiskey-bulk-create')
+
+
+class BulkCreateWhiskeyTests(TestCase):
+    """Test creating whiskeys in bulk"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Smoky')
+        self.place = Place.objects.create(user=self.user, name='Home')
+
+    def test_bulk_create_whiskeys(self):
+        """Test creating a list of whiskeys with relations"""
+        payload = [
+            {
+                'brand': f'Whiskey {i}',
+                'style': 'Bourbon',
+                'tags': [self.tag.id],
+                'places': [self.place.id],
+            }
+            for i in range(5)
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [item['brand'] for item in res.data],
+            [item['brand'] for item in payload]
+        )
+        whiskeys = Whiskey.objects.filter(user=self.user)
+        self.assertEqual(whiskeys.count(), 5)
+        for whiskey in whiskeys:
+            self.assertEqual(list(whiskey.tags.all()), [self.tag])
+            self.assertEqual(list(whiskey.places.all()), [self.place])
+
+    @skipUnlessDBFeature('can_return_rows_from_bulk_insert')
+    def test_bulk_create_batches_inserts(self):
+        """Test the query count does not grow with the number of items"""
+        other = Tag.objects.create(user=self.user, name='Sweet')
+
+        def payload(count):
+            return [
+                {'brand': f'Whiskey {i}', 'style': 'Rye',
+                 'tags': [self.tag.id, other.id][:i % 3],
+                 'places': [self.place.id] if i % 2 else []}
+                for i in range(count)
+            ]
+
+        self.client.post(BULK_URL, payload(3), format='json')
+        with self.assertNumQueries(18):
+            self.client.post(BULK_URL, payload(3), format='json')
+        with self.assertNumQueries(18):
+            res = self.client.post(BULK_URL, payload(100), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data[2]['tags'], [self.tag.id, other.id])
+        self.assertEqual(res.data[1]['places'], [self.place.id])
+
+    def test_bulk_create_reports_item_errors(self):
+        """Test invalid items are reported by position and nothing saved"""
+        payload = [
+            {'brand': 'Bulleit', 'style': 'Rye'},
+            {'brand': '', 'style': 'Rye'},
+            {'brand': 'Jameson', 'style': 'Irish', 'tags': [0]},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('brand', res.data[1])
+        self.assertIn('tags', res.data[2])
+        self.assertFalse(Whiskey.objects.exists())
+
+    def test_bulk_create_requires_list(self):
+        """Test a single object payload is rejected"""
+        res = self.client.post(
+            BULK_URL, {'brand': 'Bulleit', 'style': 'Rye'}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(WHISKEY_BULK_MAX_ITEMS=1)
+    def test_bulk_create_item_limit(self):
+        """Test payloads above the item limit are rejected"""
+        payload = [{'brand': 'Bulleit', 'style': 'Rye'}] * 2
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Whiskey.objects.exists())
+
+    def test_bulk_create_invalidates_cache(self):
+        """Test whiskeys created in bulk show up in the list"""
+        self.client.get(WHISKEY_URL)
+
+        self.client.post(
+            BULK_URL, [{'brand': 'Bulleit', 'style': 'Rye'}], format='json'
+        )
+        res = self.client.get(WHISKEY_URL)
+
+        self.assertEqual(len(res.data), 1)
+
+    def test_single_create_requires_relations(self):
+        """Test relations stay required outside bulk creates"""
+        res = self.client.post(
+            WHISKEY_URL, {'brand': 'Bulleit', 'style': 'Rye'}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
+        self.assertIn('places', res.data)
+
+    def test_manager_counts_and_invalidates(self):
+        """Test bulk inserts outside a request are counted and invalidate"""
+        version = CollectionVersion.objects.get(user=self.user).version
+        whiskeys = [
+            Whiskey(user=self.user, brand=f'Whiskey {i}', style='Rye')
+            for i in range(3)
+        ]
+
+        Whiskey.objects.bulk_create_with_relations(
+            whiskeys, [[self.tag.id]] * 3, [[]] * 3
+        )
+
+        stats = CollectionStats.objects.get(user=self.user)
+        self.assertEqual(stats.whiskey_count, 3)
+        self.assertEqual(stats.tag_assignments, 3)
+        self.assertEqual(stats.get_style_counts(), {'Rye': 3})
+        self.assertGreater(
+            CollectionVersion.objects.get(user=self.user).version, version
+        )
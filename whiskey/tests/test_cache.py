@@ -0,0 +1,240 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import CollectionVersion, Tag, Place, Whiskey
+
+from whiskey import cache
+
+
+WHISKEY_URL = reverse('whiskey:whiskey-list')
+TAGS_URL = reverse('whiskey:tag-list')
+CACHE_STATS_URL = reverse('whiskey:cache-stats')
+ME_URL = reverse('user:me')
+
+
+def detail_url(whiskey_id):
+    """Return whiskey detail url"""
+    return reverse('whiskey:whiskey-detail', args=[whiskey_id])
+
+
+class ResponseCacheTests(TestCase):
+    """Test caching of whiskey read responses"""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        cache.reset_stats()
+
+    def test_repeated_list_served_from_cache(self):
+        """Test an unchanged list only looks up the collection version"""
+        Whiskey.objects.create(user=self.user, brand='Bulleit', style='Rye')
+        first = self.client.get(WHISKEY_URL)
+
+        with self.assertNumQueries(1):
+            second = self.client.get(WHISKEY_URL)
+
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(cache.get_stats()['hits'], 1)
+        self.assertEqual(cache.get_stats()['misses'], 1)
+
+    def test_query_params_cached_separately(self):
+        """Test different query parameters do not share a cache entry"""
+        tag = Tag.objects.create(user=self.user, name='Smoky')
+        whiskey = Whiskey.objects.create(
+            user=self.user, brand='Laphroaig', style='Scotch'
+        )
+        whiskey.tags.add(tag)
+        Whiskey.objects.create(user=self.user, brand='Bulleit', style='Rye')
+
+        all_res = self.client.get(WHISKEY_URL)
+        filtered = self.client.get(WHISKEY_URL, {'tags': tag.id})
+
+        self.assertEqual(len(all_res.data), 2)
+        self.assertEqual(len(filtered.data), 1)
+
+    def test_write_invalidates_cache(self):
+        """Test creating an object invalidates the cached list"""
+        self.client.get(TAGS_URL)
+
+        self.client.post(TAGS_URL, {'name': 'Sweet'})
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual([tag['name'] for tag in res.data], ['Sweet'])
+
+    def test_relation_change_invalidates_cache(self):
+        """Test adding a tag to a whiskey invalidates the cached detail"""
+        whiskey = Whiskey.objects.create(
+            user=self.user, brand='Bulleit', style='Rye'
+        )
+        self.client.get(detail_url(whiskey.id))
+
+        whiskey.tags.add(Tag.objects.create(user=self.user, name='Spicy'))
+        res = self.client.get(detail_url(whiskey.id))
+
+        self.assertEqual(res.data['tags'][0]['name'], 'Spicy')
+
+    def test_write_bumps_version_once(self):
+        """Test a write firing several signals bumps the version once"""
+        whiskey = Whiskey.objects.create(
+            user=self.user, brand='Bulleit', style='Rye'
+        )
+        whiskey.tags.add(Tag.objects.create(user=self.user, name='Spicy'))
+        place = Place.objects.create(user=self.user, name='Home')
+        version = CollectionVersion.objects.get(user=self.user).version
+        payload = {
+            'brand': 'Bulleit',
+            'style': 'Bourbon',
+            'tags': [],
+            'places': [place.id]
+        }
+
+        self.client.put(detail_url(whiskey.id), payload)
+
+        self.assertEqual(
+            CollectionVersion.objects.get(user=self.user).version,
+            version + 1
+        )
+
+    def test_user_save_keeps_version(self):
+        """Test saving a user does not undo a collection change"""
+        self.client.get(WHISKEY_URL)
+        self.client.post(WHISKEY_URL, {'brand': 'Bulleit', 'style': 'Rye'})
+
+        self.client.patch(ME_URL, {'name': 'New Name'})
+        self.user.save()
+        res = self.client.get(WHISKEY_URL)
+
+        self.assertEqual(len(res.data), 1)
+
+    def test_recreated_version_is_not_served(self):
+        """Test a new collection key ignores responses cached before it"""
+        Tag.objects.create(user=self.user, name='Sweet')
+        self.client.get(TAGS_URL)
+        version = CollectionVersion.objects.get(user=self.user).version
+        CollectionVersion.objects.filter(user=self.user).delete()
+        Tag.objects.filter(user=self.user).delete()
+        CollectionVersion.objects.create(user=self.user, version=version)
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.data, [])
+
+    def test_cache_not_shared_between_users(self):
+        """Test a cached response is never served to another user"""
+        Tag.objects.create(user=self.user, name='Sweet')
+        self.client.get(TAGS_URL)
+        other = get_user_model().objects.create_user('Other', 'TestPass123')
+        self.client.force_authenticate(other)
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.data, [])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Requires PostgreSQL')
+class WriteQueryCountTests(TestCase):
+    """Test whiskey writes run a fixed number of queries"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_version(self):
+        """Return the collection version of the test user"""
+        return CollectionVersion.objects.get(user=self.user).version
+
+    def test_create_bumps_version_once(self):
+        """Test creating a whiskey with relations bumps the version once"""
+        tag = Tag.objects.create(user=self.user, name='Spicy')
+        place = Place.objects.create(user=self.user, name='Home')
+        version = self.get_version()
+        payload = {
+            'brand': 'Bulleit',
+            'style': 'Rye',
+            'tags': [tag.id],
+            'places': [place.id]
+        }
+
+        with self.assertNumQueries(21):
+            res = self.client.post(WHISKEY_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.get_version(), version + 1)
+
+    def test_update_bumps_version_once(self):
+        """Test updating a whiskey and its relations bumps the version once"""
+        whiskey = Whiskey.objects.create(
+            user=self.user, brand='Bulleit', style='Rye'
+        )
+        whiskey.tags.add(Tag.objects.create(user=self.user, name='Spicy'))
+        place = Place.objects.create(user=self.user, name='Home')
+        version = self.get_version()
+        payload = {
+            'brand': 'Bulleit',
+            'style': 'Bourbon',
+            'tags': [],
+            'places': [place.id]
+        }
+
+        with self.assertNumQueries(22):
+            res = self.client.put(detail_url(whiskey.id), payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_version(), version + 1)
+
+    def test_delete_bumps_version_once(self):
+        """Test deleting a whiskey with relations bumps the version once"""
+        whiskey = Whiskey.objects.create(
+            user=self.user, brand='Bulleit', style='Rye'
+        )
+        whiskey.tags.add(Tag.objects.create(user=self.user, name='Spicy'))
+        whiskey.places.add(Place.objects.create(user=self.user, name='Home'))
+        version = self.get_version()
+
+        with self.assertNumQueries(11):
+            res = self.client.delete(detail_url(whiskey.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_version(), version + 1)
+
+
+class CacheStatsTests(TestCase):
+    """Test the cache statistics endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_stats_require_staff(self):
+        """Test only staff users can read cache statistics"""
+        user = get_user_model().objects.create_user('TestUser', 'TestPass')
+        self.client.force_authenticate(user)
+
+        res = self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stats_for_staff(self):
+        """Test staff users can read cache statistics"""
+        admin = get_user_model().objects.create_superuser('Admin', 'Pass')
+        self.client.force_authenticate(admin)
+
+        res = self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('hit_rate', res.data)
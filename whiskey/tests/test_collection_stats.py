@@ -0,0 +1,164 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import CollectionStats, Tag, Place, Whiskey
+
+from whiskey.stats import check_stats, rebuild_stats
+
+
+STATS_URL = reverse('whiskey:collection-stats')
+BULK_URL = reverse('whiskey:whiskey-bulk-create')
+
+
+class CollectionStatsTests(TestCase):
+    """Test the incrementally maintained collection statistics"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.smoky = Tag.objects.create(user=self.user, name='Smoky')
+        self.home = Place.objects.create(user=self.user, name='Home')
+
+    def stats(self):
+        return CollectionStats.objects.get(user=self.user)
+
+    def assert_consistent(self):
+        self.assertEqual(check_stats(self.user.pk), {})
+
+    def test_new_user_has_stats(self):
+        """Test a row is created with every new user"""
+        user = get_user_model().objects.create_user('Other', 'TestPass123')
+
+        self.assertEqual(CollectionStats.objects.get(user=user).tag_count, 0)
+
+    def test_whiskey_changes_are_counted(self):
+        """Test creating, changing and deleting whiskeys updates the row"""
+        whiskey = Whiskey.objects.create(
+            user=self.user, brand='Bulleit', style='Rye', price='30'
+        )
+        Whiskey.objects.create(user=self.user, brand='Ardbeg', style='Scotch')
+        self.assert_consistent()
+
+        whiskey.style = 'Bourbon'
+        whiskey.price = Decimal('45.50')
+        whiskey.save()
+        self.assert_consistent()
+        self.assertEqual(self.stats().total_spend, Decimal('45.50'))
+
+        whiskey.delete()
+        stats = self.stats()
+        self.assertEqual(stats.whiskey_count, 1)
+        self.assertEqual(stats.priced_count, 0)
+        self.assertEqual(stats.get_style_counts(), {'Scotch': 1})
+        self.assert_consistent()
+
+    def test_relation_changes_are_counted(self):
+        """Test assignments made from either side update the row"""
+        sweet = Tag.objects.create(user=self.user, name='Sweet')
+        whiskey = Whiskey.objects.create(
+            user=self.user, brand='Bulleit', style='Rye'
+        )
+        whiskey.tags.add(self.smoky, sweet)
+        whiskey.tags.add(self.smoky)
+        whiskey.places.add(self.home)
+        self.assertEqual(self.stats().tag_assignments, 2)
+
+        whiskey.tags.remove(sweet, sweet)
+        self.smoky.whiskey_set.clear()
+        self.home.whiskey_set.add(whiskey)
+        self.assert_consistent()
+        self.assertEqual(self.stats().tag_assignments, 0)
+
+        whiskey.tags.add(sweet)
+        sweet.delete()
+        self.home.delete()
+        self.assert_consistent()
+        self.assertEqual(self.stats().tag_count, 1)
+
+    def test_whiskey_delete_removes_assignments(self):
+        """Test deleting a whiskey uncounts its tags and places"""
+        whiskey = Whiskey.objects.create(
+            user=self.user, brand='Bulleit', style='Rye'
+        )
+        whiskey.tags.add(self.smoky)
+        whiskey.places.add(self.home)
+
+        whiskey.delete()
+
+        self.assert_consistent()
+        self.assertEqual(self.stats().place_assignments, 0)
+
+    def test_bulk_create_is_counted(self):
+        """Test whiskeys created in bulk are added to the row"""
+        payload = [
+            {'brand': 'Bulleit', 'style': 'Rye', 'price': '30',
+             'tags': [self.smoky.id], 'places': [self.home.id]},
+            {'brand': 'Ardbeg', 'style': 'Scotch', 'tags': [self.smoky.id]},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assert_consistent()
+        self.assertEqual(self.stats().tag_assignments, 2)
+
+    def test_check_reports_drift(self):
+        """Test the checker reports values that differ from the data"""
+        Whiskey.objects.create(user=self.user, brand='Bulleit', style='Rye')
+        CollectionStats.objects.filter(user=self.user).update(
+            whiskey_count=5
+        )
+
+        self.assertEqual(check_stats(self.user.pk), {'whiskey_count': (5, 1)})
+        rebuild_stats(self.user.pk)
+        self.assert_consistent()
+
+    def test_retrieve_stats(self):
+        """Test the endpoint returns the stored row"""
+        Whiskey.objects.create(
+            user=self.user, brand='Bulleit', style='Rye', price='30'
+        )
+        Whiskey.objects.create(user=self.user, brand='Rittenhouse',
+                               style='Rye', price='25.50')
+        Whiskey.objects.create(user=self.user, brand='Ardbeg', style='Scotch')
+
+        with self.assertNumQueries(1):
+            res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['whiskey_count'], 3)
+        self.assertEqual(res.data['priced_count'], 2)
+        self.assertEqual(res.data['total_spend'], '55.50')
+        self.assertEqual(res.data['styles'], [
+            {'value': 'Rye', 'count': 2},
+            {'value': 'Scotch', 'count': 1},
+        ])
+        self.assertEqual(res.data['tag_count'], 1)
+
+    def test_retrieve_rebuilds_missing_row(self):
+        """Test a missing row is rebuilt on first read"""
+        Whiskey.objects.create(user=self.user, brand='Bulleit', style='Rye')
+        CollectionStats.objects.filter(user=self.user).delete()
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['whiskey_count'], 1)
+        self.assertTrue(
+            CollectionStats.objects.filter(user=self.user).exists()
+        )
+
+    def test_stats_require_login(self):
+        """Test authentication is required"""
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,115 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.http import parse_http_date
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Place, Whiskey
+
+from whiskey.cache import get_cache
+
+
+WHISKEY_URL = reverse('whiskey:whiskey-list')
+TAGS_URL = reverse('whiskey:tag-list')
+PLACE_URL = reverse('whiskey:place-list')
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag and Last-Modified validators on whiskey resources"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.whiskey = Whiskey.objects.create(
+            user=self.user, brand='Bulleit', style='Rye'
+        )
+        Tag.objects.create(user=self.user, name='Spicy')
+        Place.objects.create(user=self.user, name='Home')
+
+    def test_validators_emitted(self):
+        """Test list responses carry an ETag and Last-Modified"""
+        for url in (WHISKEY_URL, TAGS_URL, PLACE_URL):
+            res = self.client.get(url)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertTrue(res['ETag'].startswith('"'))
+            self.assertIn('Last-Modified', res)
+            self.assertIn('private', res['Cache-Control'])
+
+    def test_if_none_match_not_modified(self):
+        """Test a matching ETag is answered with one query and a 304"""
+        etag = self.client.get(WHISKEY_URL)['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(WHISKEY_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertFalse(res.content)
+
+    def test_etag_changes_after_write(self):
+        """Test the ETag no longer matches once the collection changes"""
+        etag = self.client.get(WHISKEY_URL)['ETag']
+
+        self.whiskey.tags.add(Tag.objects.create(user=self.user, name='Hot'))
+        res = self.client.get(WHISKEY_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_etag_differs_per_resource(self):
+        """Test different endpoints do not share an ETag"""
+        whiskey_etag = self.client.get(WHISKEY_URL)['ETag']
+        tag_etag = self.client.get(TAGS_URL)['ETag']
+
+        self.assertNotEqual(whiskey_etag, tag_etag)
+
+    def test_if_modified_since_not_modified(self):
+        """Test an unchanged collection answers If-Modified-Since with 304"""
+        last_modified = self.client.get(TAGS_URL)['Last-Modified']
+
+        res = self.client.get(TAGS_URL, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_not_modified(self):
+        """Test whiskey details support conditional requests"""
+        url = reverse('whiskey:whiskey-detail', args=[self.whiskey.id])
+        etag = self.client.get(url)['ETag']
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_write_in_same_second_is_modified(self):
+        """Test the ETag catches writes within one Last-Modified second"""
+        res = self.client.get(TAGS_URL)
+
+        Tag.objects.create(user=self.user, name='Sweet')
+        res = self.client.get(
+            TAGS_URL,
+            HTTP_IF_NONE_MATCH=res['ETag'],
+            HTTP_IF_MODIFIED_SINCE=res['Last-Modified']
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_last_modified_not_in_future(self):
+        """Test rapid writes never move Last-Modified past the clock"""
+        for i in range(5):
+            Tag.objects.create(user=self.user, name=f'Tag {i}')
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertLessEqual(
+            parse_http_date(res['Last-Modified']), time.time()
+        )
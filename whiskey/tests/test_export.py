@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Place, Whiskey
+
+
+EXPORT_URL = reverse('whiskey:whiskey-export')
+
+
+class ExportTests(TestCase):
+    """Test streaming export of a whiskey collection"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.smoky = Tag.objects.create(user=self.user, name='Smoky')
+        self.sweet = Tag.objects.create(user=self.user, name='Sweet')
+        self.home = Place.objects.create(user=self.user, name='Home')
+        self.first = Whiskey.objects.create(
+            user=self.user, brand='Laphroaig', style='Scotch', year='2010'
+        )
+        self.first.tags.add(self.smoky, self.sweet)
+        self.first.places.add(self.home)
+        self.second = Whiskey.objects.create(
+            user=self.user, brand='Bulleit', style='Rye'
+        )
+
+    def get_content(self, res):
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        return b''.join(res.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        """Test exporting the collection as newline delimited JSON"""
+        res = self.client.get(EXPORT_URL, {'format': 'ndjson'})
+
+        lines = self.get_content(res).splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(
+            res['Content-Type'], 'application/x-ndjson; charset=utf-8'
+        )
+        self.assertEqual(rows[0], {
+            'id': self.first.id,
+            'brand': 'Laphroaig',
+            'style': 'Scotch',
+            'year': '2010',
+            'price': '',
+            'link': '',
+            'tags': ['Smoky', 'Sweet'],
+            'places': ['Home'],
+        })
+        self.assertEqual(rows[1]['tags'], [])
+
+    def test_export_csv(self):
+        """Test exporting the collection as CSV"""
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT='text/csv')
+
+        rows = list(csv.DictReader(io.StringIO(self.get_content(res))))
+        self.assertIn('whiskeys.csv', res['Content-Disposition'])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['brand'], 'Laphroaig')
+        self.assertEqual(rows[0]['tags'], 'Smoky|Sweet')
+        self.assertEqual(rows[1]['places'], '')
+
+    def test_export_csv_error_is_json(self):
+        """Test errors of a CSV export are rendered and labelled as JSON"""
+        self.client.force_authenticate(None)
+
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT='text/csv')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertIn('detail', json.loads(res.content))
+
+    def test_export_limited_to_user(self):
+        """Test only the requesting user's whiskeys are exported"""
+        other = get_user_model().objects.create_user('Other', 'TestPass123')
+        Whiskey.objects.create(user=other, brand='Jameson', style='Irish')
+
+        res = self.client.get(EXPORT_URL, {'format': 'ndjson'})
+
+        self.assertEqual(len(self.get_content(res).splitlines()), 2)
+
+    def test_export_in_chunks(self):
+        """Test relations are fetched once per chunk of whiskeys"""
+        with self.settings(WHISKEY_EXPORT_CHUNK_SIZE=1):
+            res = self.client.get(EXPORT_URL, {'format': 'ndjson'})
+            with self.assertNumQueries(5):
+                content = self.get_content(res)
+
+        self.assertEqual(len(content.splitlines()), 2)
@@ -0,0 +1,111 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Place, Whiskey
+
+from whiskey.cache import get_cache
+
+
+FACETS_URL = reverse('whiskey:whiskey-facets')
+
+
+class FacetTests(TestCase):
+    """Test the collection facets endpoint"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.smoky = Tag.objects.create(user=self.user, name='Smoky')
+        self.sweet = Tag.objects.create(user=self.user, name='Sweet')
+        self.home = Place.objects.create(user=self.user, name='Home')
+        laphroaig = Whiskey.objects.create(
+            user=self.user, brand='Laphroaig', style='Scotch',
+            year=2010, price='60'
+        )
+        laphroaig.tags.add(self.smoky, self.sweet)
+        laphroaig.places.add(self.home)
+        ardbeg = Whiskey.objects.create(
+            user=self.user, brand='Ardbeg', style='Scotch',
+            year=2015, price='45.50'
+        )
+        ardbeg.tags.add(self.smoky)
+        Whiskey.objects.create(user=self.user, brand='Bulleit', style='Rye')
+        other = get_user_model().objects.create_user('Other', 'TestPass123')
+        Whiskey.objects.create(
+            user=other, brand='Booker', style='Bourbon', price='90'
+        )
+
+    def test_login_required(self):
+        """Test that authentication is required"""
+        res = APIClient().get(FACETS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_facets(self):
+        """Test histograms and price statistics of the collection"""
+        # collection version, price stats, styles, years, tags and places
+        with self.assertNumQueries(6):
+            res = self.client.get(FACETS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'count': 3,
+            'price': {'min': '45.50', 'max': '60.00', 'avg': '52.75'},
+            'styles': [
+                {'value': 'Scotch', 'count': 2},
+                {'value': 'Rye', 'count': 1},
+            ],
+            'years': [
+                {'value': '2010', 'count': 1},
+                {'value': '2015', 'count': 1},
+                {'value': '', 'count': 1},
+            ],
+            'tags': [
+                {'id': self.smoky.id, 'name': 'Smoky', 'count': 2},
+                {'id': self.sweet.id, 'name': 'Sweet', 'count': 1},
+            ],
+            'places': [
+                {'id': self.home.id, 'name': 'Home', 'count': 1},
+            ],
+        })
+
+    def test_facets_follow_filters(self):
+        """Test facets honour the whiskey list filters"""
+        res = self.client.get(FACETS_URL, {
+            'tags': f'{self.smoky.id},{self.sweet.id}',
+            'tags_match': 'all',
+        })
+
+        self.assertEqual(res.data['count'], 1)
+        self.assertEqual(res.data['styles'], [{'value': 'Scotch', 'count': 1}])
+        self.assertEqual(res.data['price']['avg'], '60.00')
+
+    def test_facets_of_search(self):
+        """Test facets of a search"""
+        res = self.client.get(FACETS_URL, {'search': 'rye'})
+
+        self.assertEqual(res.data['count'], 1)
+        self.assertEqual(
+            res.data['price'], {'min': None, 'max': None, 'avg': None}
+        )
+        self.assertEqual(res.data['tags'], [])
+
+    def test_facets_cached(self):
+        """Test facets are cached until the collection changes"""
+        self.client.get(FACETS_URL)
+        with self.assertNumQueries(1):
+            self.client.get(FACETS_URL)
+
+        Whiskey.objects.create(user=self.user, brand='Blanton', style='Rye')
+        res = self.client.get(FACETS_URL)
+
+        self.assertEqual(res.data['count'], 4)
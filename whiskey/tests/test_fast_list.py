@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Place, Whiskey
+
+from whiskey.cache import get_cache
+
+
+WHISKEYS_URL = reverse('whiskey:whiskey-list')
+TAGS_URL = reverse('whiskey:tag-list')
+PLACES_URL = reverse('whiskey:place-list')
+
+
+class FastListTests(TestCase):
+    """Test list responses built from values() rows"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Smoky', 'Sweet', 'Spicy')
+        ]
+        places = [
+            Place.objects.create(user=self.user, name=name)
+            for name in ('Home', 'Bar')
+        ]
+        for i in range(5):
+            whiskey = Whiskey.objects.create(
+                user=self.user,
+                brand=f'Brand {i}',
+                style='Rye' if i % 2 else 'Bourbon',
+                year=str(2000 + i),
+                link='https://example.com/"quoted"' if i == 3 else ''
+            )
+            whiskey.tags.add(*reversed(tags[:i % 4]))
+            whiskey.places.add(*places[:i % 3])
+
+    def get_content(self, url, params, fast):
+        get_cache().clear()
+        with self.settings(WHISKEY_FAST_LIST=fast):
+            res = self.client.get(url, params, HTTP_ACCEPT='application/json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.content
+
+    def assertSameContent(self, url, params=None):
+        self.assertEqual(
+            self.get_content(url, params, fast=True),
+            self.get_content(url, params, fast=False)
+        )
+
+    def test_whiskey_list_identical(self):
+        """Test the whiskey list is byte for byte the serializer output"""
+        self.assertSameContent(WHISKEYS_URL)
+
+    def test_filtered_and_paginated_identical(self):
+        """Test filters and keyset pages give identical output"""
+        tag = Tag.objects.get(name='Smoky')
+        self.assertSameContent(WHISKEYS_URL, {'tags': tag.id})
+        self.assertSameContent(WHISKEYS_URL, {'page_size': 2})
+        self.assertSameContent(WHISKEYS_URL, {'search': 'rye'})
+        self.assertSameContent(TAGS_URL, {'page_size': 2})
+
+        res = self.client.get(WHISKEYS_URL, {'page_size': 2})
+        self.assertSameContent(res.data['next'])
+
+    def test_attribute_lists_identical(self):
+        """Test tag and place lists are byte for byte identical"""
+        self.assertSameContent(TAGS_URL)
+        self.assertSameContent(PLACES_URL, {'assigned_only': 1})
+        self.assertSameContent(TAGS_URL, {'with_counts': 1})
+
+    @override_settings(WHISKEY_FAST_LIST=True)
+    def test_whiskey_list_query_count(self):
+        """Test relations are read in a single query"""
+        get_cache().clear()
+        # collection version, whiskey rows and one UNION of relations
+        with self.assertNumQueries(3):
+            self.client.get(WHISKEYS_URL)
@@ -0,0 +1,640 @@
+import hashlib
+import io
+import json
+import os
+import resource
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from unittest import skipUnless
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageBlob, ImageStatus, Whiskey
+
+from whiskey.cache import get_cache
+from whiskey.images import delete_image_files, image_storage, \
+                           image_variants, lock_image, orphaned_images, \
+                           release_image, requeue_uploads, \
+                           shutdown_executor, storage_report, variant_cache
+from whiskey.imaging import process_image, resize_image
+from whiskey.serializers import HeaderImageField
+
+
+MAKE = 0x010f
+ORIENTATION = 0x0112
+
+
+def image_upload_url(whiskey_id):
+    return reverse('whiskey:whiskey-upload-image', args=[whiskey_id])
+
+
+def detail_url(whiskey_id):
+    return reverse('whiskey:whiskey-detail', args=[whiskey_id])
+
+
+def image_url(whiskey_id):
+    return reverse('whiskey:whiskey-image', args=[whiskey_id])
+
+
+def write_photo(path, size=(400, 200), orientation=None):
+    """Save a JPEG with EXIF metadata"""
+    exif = Image.Exif()
+    exif[MAKE] = 'Camera'
+    if orientation is not None:
+        exif[ORIENTATION] = orientation
+    Image.new('RGB', size, 'red').save(path, 'JPEG', exif=exif.tobytes())
+
+
+def png_header(width, height):
+    """Return a tiny PNG file claiming the given dimensions"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + \
+            struct.pack('>I', zlib.crc32(kind + data))
+
+    return b'\x89PNG\r\n\x1a\n' + \
+        chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) \
+        + chunk(b'IDAT', zlib.compress(b'')) + chunk(b'IEND', b'')
+
+
+def peak_rss_growth(func):
+    """Return the growth of the peak resident set size in bytes"""
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result = func()
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return result, (after - before) * 1024
+
+
+class ProcessImageTests(TestCase):
+    """Test re-encoding images with Pillow"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.tempdir.name, name)
+
+    def test_process_image(self):
+        """Test the image is oriented, shrunk and stripped of metadata"""
+        write_photo(self.path('photo.jpg'), orientation=6)
+
+        written = process_image(
+            self.path('photo.jpg'), self.path('photo.webp'),
+            (50, 100), 150, 'WEBP', 80
+        )
+
+        self.assertEqual(written, [
+            self.path('photo.webp'),
+            self.path('photo_100.webp'),
+            self.path('photo_50.webp'),
+        ])
+        with Image.open(self.path('photo.webp')) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (75, 150))
+            self.assertNotIn(MAKE, image.getexif())
+        with Image.open(self.path('photo_50.webp')) as image:
+            self.assertEqual(image.size, (25, 50))
+
+    def test_small_images_are_not_enlarged(self):
+        """Test thumbnails never exceed the source size"""
+        Image.new('RGBA', (40, 20)).save(self.path('logo.png'))
+
+        process_image(
+            self.path('logo.png'), self.path('logo.jpg'),
+            (100,), 150, 'JPEG', 80
+        )
+
+        with Image.open(self.path('logo_100.jpg')) as image:
+            self.assertEqual((image.mode, image.size), ('RGB', (40, 20)))
+
+    def test_resize_image(self):
+        """Test JPEG and PNG sources are scaled to the requested width"""
+        write_photo(self.path('photo.jpg'), size=(1600, 800))
+        Image.new('RGB', (1600, 800)).save(self.path('photo.png'))
+
+        for source in ('photo.jpg', 'photo.png'):
+            resize_image(self.path(source), self.path('small.png'),
+                         300, 'PNG', 80)
+            with Image.open(self.path('small.png')) as image:
+                self.assertEqual(image.size, (300, 150))
+
+    def test_resize_rotated_image(self):
+        """Test the EXIF orientation is applied before resizing"""
+        write_photo(self.path('photo.jpg'), size=(1600, 800), orientation=6)
+
+        resize_image(self.path('photo.jpg'), self.path('small.jpg'),
+                     200, 'JPEG', 80)
+
+        with Image.open(self.path('small.jpg')) as image:
+            self.assertEqual(image.size, (200, 400))
+
+    def test_resize_does_not_enlarge(self):
+        """Test narrow images keep their size"""
+        Image.new('RGB', (40, 20)).save(self.path('logo.png'))
+
+        resize_image(self.path('logo.png'), self.path('big.webp'),
+                     500, 'WEBP', 80)
+
+        with Image.open(self.path('big.webp')) as image:
+            self.assertEqual(image.size, (40, 20))
+
+
+class ImageEndpointTests(TestCase):
+    """Test serving resized images from the variant cache"""
+
+    def setUp(self):
+        get_cache().clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.addCleanup(variant_cache.clear)
+        variant_cache.clear()
+
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.whiskey = Whiskey.objects.create(
+            user=self.user, brand='Bulleit', style='Rye'
+        )
+        with tempfile.TemporaryFile() as photo:
+            Image.new('RGB', (800, 400), 'red').save(photo, 'PNG')
+            photo.seek(0)
+            self.whiskey.image = default_storage.save(
+                'uploads/whiskey/photo.png', ContentFile(photo.read())
+            )
+        self.whiskey.save()
+
+    def get_image(self, **params):
+        return self.client.get(image_url(self.whiskey.id), params)
+
+    def test_get_resized_image(self):
+        """Test the image is served at the requested width and format"""
+        res = self.get_image(width=200, type='jpeg')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        with Image.open(io.BytesIO(b''.join(res.streaming_content))) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (200, 100)))
+
+    def test_variants_are_cached(self):
+        """Test a variant is rendered once and revalidated by ETag"""
+        with patch('whiskey.images.resize_image', wraps=resize_image) as rs:
+            first = self.get_image(width=100)
+            second = self.get_image(width=100)
+            not_modified = self.client.get(
+                image_url(self.whiskey.id), {'width': 100},
+                HTTP_IF_NONE_MATCH=first['ETag']
+            )
+
+        self.assertEqual(rs.call_count, 1)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(first['Content-Type'], 'image/webp')
+        self.assertEqual(
+            not_modified.status_code, status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_concurrent_requests_render_once(self):
+        """Test requests for the same variant are coalesced"""
+        barrier = threading.Barrier(4)
+
+        def slow_resize(*args):
+            time.sleep(0.2)
+            resize_image(*args)
+
+        def request():
+            barrier.wait()
+            variant_cache.open(self.whiskey.image.name, 50, 'WEBP').close()
+
+        with patch('whiskey.images.resize_image', side_effect=slow_resize) \
+                as rs:
+            threads = [threading.Thread(target=request) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(rs.call_count, 1)
+
+    def test_least_recently_used_variants_are_evicted(self):
+        """Test the cache stays under its size limit"""
+        name = self.whiskey.image.name
+        variant_cache.open(name, 400, 'PNG').close()
+        limit = os.path.getsize(
+            variant_cache.path(variant_cache.key(name, 400, 'PNG'), 'PNG')
+        )
+
+        with self.settings(WHISKEY_IMAGE_CACHE_MAX_BYTES=int(limit * 1.5)):
+            variant_cache.open(name, 300, 'PNG').close()
+
+        self.assertFalse(os.path.exists(
+            variant_cache.path(variant_cache.key(name, 400, 'PNG'), 'PNG')
+        ))
+        self.assertTrue(os.path.exists(
+            variant_cache.path(variant_cache.key(name, 300, 'PNG'), 'PNG')
+        ))
+
+    def test_invalid_parameters(self):
+        """Test invalid widths and formats are rejected"""
+        for params in ({'width': 0}, {'width': 'big'}, {'width': 5000},
+                       {'type': 'gif'}):
+            res = self.get_image(**params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_whiskey_without_image(self):
+        """Test whiskeys without an image return 404"""
+        whiskey = Whiskey.objects.create(
+            user=self.user, brand='Ardbeg', style='Scotch'
+        )
+
+        res = self.client.get(image_url(whiskey.id), HTTP_ACCEPT='image/*')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertIn('detail', json.loads(res.content))
+
+    def test_other_users_image(self):
+        """Test images of other users' whiskeys are not served"""
+        other = get_user_model().objects.create_user('Other', 'TestPass123')
+        self.client.force_authenticate(other)
+
+        res = self.get_image()
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(WHISKEY_IMAGE_WORKERS=0)
+class ImageUploadTests(TestCase):
+    """Test uploads processed during the request"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.whiskey = Whiskey.objects.create(
+            user=self.user, brand='Bulleit', style='Rye'
+        )
+
+    def upload(self):
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as photo:
+            write_photo(photo, size=(3000, 1500))
+            photo.seek(0)
+            return self.client.post(
+                image_upload_url(self.whiskey.id),
+                {'image': photo},
+                format='multipart'
+            )
+
+    def test_upload_is_processed(self):
+        """Test the upload is replaced by its processed version"""
+        res = self.upload()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], 'ready')
+        self.assertEqual(list(res.data['image_variants']), ['128', '512'])
+        self.whiskey.refresh_from_db()
+        self.addCleanup(delete_image_files, self.whiskey.image.name)
+        self.assertTrue(self.whiskey.image.name.endswith('.webp'))
+        with Image.open(self.whiskey.image.path) as image:
+            self.assertEqual(image.size, (2048, 1024))
+        for name in image_variants(self.whiskey.image.name).values():
+            self.assertTrue(self.whiskey.image.storage.exists(name))
+        original = self.whiskey.image.name.replace('_processed.webp', '.jpg')
+        self.assertFalse(self.whiskey.image.storage.exists(original))
+
+    def test_detail_shows_variants(self):
+        """Test the whiskey detail includes the processing status"""
+        self.upload()
+        self.whiskey.refresh_from_db()
+        self.addCleanup(delete_image_files, self.whiskey.image.name)
+
+        res = self.client.get(detail_url(self.whiskey.id))
+
+        self.assertEqual(res.data['image_status'], 'ready')
+        self.assertTrue(res.data['image_variants']['128'].endswith(
+            image_variants(self.whiskey.image.name)[128]
+        ))
+
+    def test_detail_without_image(self):
+        """Test whiskeys without an image have no variants"""
+        res = self.client.get(detail_url(self.whiskey.id))
+
+        self.assertIsNone(res.data['image'])
+        self.assertEqual(res.data['image_variants'], {})
+
+
+@override_settings(WHISKEY_IMAGE_WORKERS=0)
+class ImageStorageTests(TestCase):
+    """Test content-addressed image storage"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.photo = io.BytesIO()
+        write_photo(self.photo, size=(600, 300))
+
+    def upload(self, content=None):
+        whiskey = Whiskey.objects.create(
+            user=self.user, brand='Bulleit', style='Rye'
+        )
+        upload = io.BytesIO(content or self.photo.getvalue())
+        upload.name = 'photo.JPG'
+        res = self.client.post(
+            image_upload_url(whiskey.id), {'image': upload},
+            format='multipart'
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        whiskey.refresh_from_db()
+
+        return whiskey
+
+    def test_files_are_named_by_content(self):
+        """Test identical content is stored once under its digest"""
+        first = image_storage.save('uploads/whiskey/a.JPG', ContentFile(b'x'))
+        second = image_storage.save('uploads/whiskey/b.jpg', ContentFile(b'x'))
+        self.addCleanup(image_storage.delete, first)
+
+        self.assertEqual(first, second)
+        self.assertRegex(first, r'^uploads/whiskey/2d/2d71[0-9a-f]{60}\.jpg$')
+
+    def test_identical_uploads_share_files(self):
+        """Test whiskeys with the same image reference one stored copy"""
+        first = self.upload()
+        second = self.upload()
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(second.image_status, ImageStatus.READY)
+        blob = ImageBlob.objects.get(name=first.image.name)
+        self.assertEqual(blob.references, 2)
+        self.assertEqual(ImageBlob.objects.count(), 1)
+
+        report = storage_report()
+        self.assertEqual(report['references'], 2)
+        self.assertEqual(report['saved'], blob.size)
+        self.assertGreater(blob.size, 0)
+
+        first.delete()
+        self.assertTrue(image_storage.exists(second.image.name))
+        second.delete()
+        self.assertFalse(image_storage.exists(second.image.name))
+        for name in image_variants(second.image.name).values():
+            self.assertFalse(image_storage.exists(name))
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_webp_upload_is_not_overwritten(self):
+        """Test an upload in the processed format keeps its own file"""
+        photo = io.BytesIO()
+        Image.new('RGB', (600, 300), 'red').save(photo, 'WEBP')
+        digest = hashlib.sha256(photo.getvalue()).hexdigest()
+
+        whiskey = self.upload(photo.getvalue())
+        self.addCleanup(whiskey.delete)
+
+        self.assertEqual(
+            whiskey.image.name,
+            f'uploads/whiskey/{digest[:2]}/{digest}_processed.webp'
+        )
+        self.assertEqual(whiskey.image_status, ImageStatus.READY)
+        self.assertEqual(
+            list(ImageBlob.objects.values_list('name', flat=True)),
+            [whiskey.image.name]
+        )
+
+    def test_replaced_image_is_released(self):
+        """Test uploading another image deletes the unreferenced one"""
+        whiskey = self.upload()
+        previous = whiskey.image.name
+        other = io.BytesIO()
+        write_photo(other, size=(300, 600))
+
+        upload = io.BytesIO(other.getvalue())
+        upload.name = 'other.jpg'
+        self.client.post(
+            image_upload_url(whiskey.id), {'image': upload},
+            format='multipart'
+        )
+        whiskey.refresh_from_db()
+        self.addCleanup(whiskey.delete)
+
+        self.assertNotEqual(whiskey.image.name, previous)
+        self.assertFalse(image_storage.exists(previous))
+        self.assertFalse(ImageBlob.objects.filter(name=previous).exists())
+
+    def test_orphaned_images(self):
+        """Test files without a reference are reported once old enough"""
+        whiskey = self.upload()
+        self.addCleanup(whiskey.delete)
+        orphan = image_storage.save(
+            'uploads/whiskey/orphan.webp', ContentFile(b'orphan')
+        )
+        self.addCleanup(image_storage.delete, orphan)
+
+        self.assertNotIn(orphan, orphaned_images(3600))
+        found = list(orphaned_images(-1))
+        self.assertIn(orphan, found)
+        self.assertNotIn(whiskey.image.name, found)
+
+
+@override_settings(WHISKEY_IMAGE_WORKERS=1)
+class ImageWorkerTests(TransactionTestCase):
+    """Test uploads processed by the worker pool"""
+
+    def test_upload_is_processed_in_background(self):
+        """Test the upload is accepted then finished by a worker"""
+        user = get_user_model().objects.create_user('TestUser', 'Pass123')
+        whiskey = Whiskey.objects.create(
+            user=user, brand='Bulleit', style='Rye'
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as photo:
+            write_photo(photo)
+            photo.seek(0)
+            res = client.post(
+                image_upload_url(whiskey.id), {'image': photo},
+                format='multipart'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            whiskey.refresh_from_db()
+            if whiskey.image_status != ImageStatus.PENDING:
+                break
+            time.sleep(0.1)
+        self.addCleanup(delete_image_files, whiskey.image.name)
+        self.assertEqual(whiskey.image_status, ImageStatus.READY)
+        self.assertTrue(whiskey.image.name.endswith('.webp'))
+
+    def test_requeue_pending_upload(self):
+        """Test an upload left pending by a restart is processed again"""
+        user = get_user_model().objects.create_user('TestUser', 'Pass123')
+        whiskey = Whiskey.objects.create(
+            user=user, brand='Bulleit', style='Rye',
+            image_status=ImageStatus.PENDING
+        )
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as photo:
+            write_photo(photo)
+            photo.seek(0)
+            whiskey.image.save('photo.jpg', photo)
+
+        self.assertEqual(requeue_uploads(), 1)
+        shutdown_executor()
+
+        whiskey.refresh_from_db()
+        self.addCleanup(delete_image_files, whiskey.image.name)
+        self.assertEqual(whiskey.image_status, ImageStatus.READY)
+        self.assertTrue(whiskey.image.name.endswith('.webp'))
+
+
+@skipUnless(connection.features.has_select_for_update,
+            'Requires row locks')
+class ImageReleaseTests(TransactionTestCase):
+    """Test releasing an image while the same content is uploaded"""
+
+    def test_save_waits_for_release(self):
+        """Test content saved as its last reference goes is stored again"""
+        name = image_storage.save('uploads/whiskey/a.jpg', ContentFile(b'x'))
+        self.addCleanup(image_storage.delete, name)
+        ImageBlob.objects.create(name=name, references=1)
+        saved = []
+
+        def save():
+            try:
+                saved.append(image_storage.save(
+                    'uploads/whiskey/b.jpg', ContentFile(b'x')
+                ))
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=save)
+        with transaction.atomic():
+            lock_image(name)
+            thread.start()
+            thread.join(0.5)
+            self.assertTrue(thread.is_alive())
+            release_image(name)
+        thread.join()
+
+        self.assertEqual(saved, [name])
+        self.assertTrue(image_storage.exists(name))
+
+
+class ImageValidationTests(TestCase):
+    """Test uploads are validated from their header"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.whiskey = Whiskey.objects.create(
+            user=self.user, brand='Bulleit', style='Rye'
+        )
+
+    def upload(self, content, suffix='.png'):
+        with tempfile.NamedTemporaryFile(suffix=suffix) as upload:
+            upload.write(content)
+            upload.seek(0)
+            return self.client.post(
+                image_upload_url(self.whiskey.id),
+                {'image': upload},
+                format='multipart'
+            )
+
+    def encode(self, image, image_format):
+        content = io.BytesIO()
+        image.save(content, image_format)
+        return content.getvalue()
+
+    def test_decompression_bomb_is_rejected(self):
+        """Test a huge image is rejected without decoding it"""
+        res, growth = peak_rss_growth(
+            lambda: self.upload(png_header(30000, 30000))
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('pixels', res.data['image'][0])
+        self.assertLess(growth, 20 * 1024 * 1024)
+        self.whiskey.refresh_from_db()
+        self.assertFalse(self.whiskey.image)
+
+    def test_limits(self):
+        """Test the dimension, pixel and format limits"""
+        with self.settings(WHISKEY_IMAGE_MAX_DIMENSION=100):
+            res = self.upload(png_header(101, 10))
+            self.assertIn('wide and high', res.data['image'][0])
+        with self.settings(WHISKEY_IMAGE_MAX_PIXELS=99):
+            res = self.upload(png_header(10, 10))
+            self.assertIn('99 pixels', res.data['image'][0])
+
+        res = self.upload(self.encode(Image.new('RGB', (10, 10)), 'GIF'),
+                          suffix='.gif')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('JPEG, PNG, WEBP', res.data['image'][0])
+
+    def test_size_limit(self):
+        """Test files over the size limit are rejected"""
+        content = self.encode(Image.new('RGB', (10, 10)), 'PNG')
+
+        with self.settings(WHISKEY_IMAGE_MAX_UPLOAD_BYTES=len(content) - 1):
+            res = self.upload(content)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('bytes', res.data['image'][0])
+
+    def test_oversized_body_is_not_read(self):
+        """Test requests far over the size limit are refused up front"""
+        with self.settings(WHISKEY_IMAGE_MAX_UPLOAD_BYTES=1000):
+            res = self.upload(os.urandom(128 * 1024))
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+
+    def test_large_upload_is_streamed_to_disk(self):
+        """Test large uploads reach validation as temporary files"""
+        noise = Image.frombytes('RGB', (1000, 1000), os.urandom(3000000))
+        content = self.encode(noise, 'PNG')
+        validate = HeaderImageField.to_internal_value
+
+        with patch.object(HeaderImageField, 'to_internal_value',
+                          autospec=True, side_effect=validate) as field:
+            res, growth = peak_rss_growth(lambda: self.upload(content))
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertIsInstance(field.call_args[0][1], TemporaryUploadedFile)
+        self.assertLess(growth, len(content))
+        self.whiskey.refresh_from_db()
+        self.addCleanup(self.whiskey.image.delete, save=False)
@@ -0,0 +1,113 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Place, Whiskey
+
+from whiskey.cache import get_cache
+
+
+WHISKEY_URL = reverse('whiskey:whiskey-list')
+TAGS_URL = reverse('whiskey:tag-list')
+PLACE_URL = reverse('whiskey:place-list')
+
+
+class KeysetPaginationTests(TestCase):
+    """Test cursor pagination of the whiskey endpoints"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def collect_pages(self, url, params):
+        """Follow next links and return every page of results"""
+        pages = []
+        res = self.client.get(url, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append(res.data['results'])
+            if res.data['next'] is None:
+                return pages
+            res = self.client.get(res.data['next'])
+
+    def test_unpaginated_without_params(self):
+        """Test the list is returned as before when no page is requested"""
+        Whiskey.objects.create(user=self.user, brand='Bulleit', style='Rye')
+
+        res = self.client.get(WHISKEY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(res.data, list)
+
+    def test_whiskeys_paginated_by_id(self):
+        """Test whiskey pages follow descending id without gaps"""
+        whiskeys = [
+            Whiskey.objects.create(
+                user=self.user, brand=f'Whiskey {i}', style='Bourbon'
+            )
+            for i in range(7)
+        ]
+
+        pages = self.collect_pages(WHISKEY_URL, {'page_size': 3})
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        ids = [item['id'] for page in pages for item in page]
+        self.assertEqual(ids, sorted((w.id for w in whiskeys), reverse=True))
+
+    def test_tags_paginated_by_name_with_ties(self):
+        """Test tag pages order by name and break ties on id"""
+        for name in ['Smoky', 'Sweet', 'Smoky', 'Peaty', 'Sweet']:
+            Tag.objects.create(user=self.user, name=name)
+
+        pages = self.collect_pages(TAGS_URL, {'page_size': 2})
+
+        items = [item for page in pages for item in page]
+        expected = Tag.objects.filter(user=self.user).order_by('-name', '-id')
+        self.assertEqual(
+            [item['id'] for item in items],
+            [tag.id for tag in expected]
+        )
+
+    def test_places_assigned_only_paginated(self):
+        """Test the assigned_only filter is honoured while paginating"""
+        whiskey = Whiskey.objects.create(
+            user=self.user, brand='Bulleit', style='Rye'
+        )
+        assigned = []
+        for i in range(4):
+            place = Place.objects.create(user=self.user, name=f'Bar {i}')
+            if i % 2:
+                whiskey.places.add(place)
+                assigned.append(place.id)
+
+        pages = self.collect_pages(
+            PLACE_URL, {'page_size': 1, 'assigned_only': 1}
+        )
+
+        ids = [item['id'] for page in pages for item in page]
+        self.assertEqual(sorted(ids), sorted(assigned))
+
+    @override_settings(WHISKEY_MAX_PAGE_SIZE=2)
+    def test_page_size_capped(self):
+        """Test the requested page size is capped to the maximum"""
+        for i in range(3):
+            Tag.objects.create(user=self.user, name=f'Tag {i}')
+
+        res = self.client.get(TAGS_URL, {'page_size': 100})
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor returns not found"""
+        res = self.client.get(WHISKEY_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -7,6 +7,7 @@ from rest_framework.test import APIClient
 
 from core.models import Place, Whiskey
 
+from whiskey.cache import get_cache
 from whiskey.serializers import PlaceSerializer
 
 PLACE_URL = reverse('whiskey:place-list')
@@ -29,6 +30,7 @@ class PrivatePlaceAPITest(TestCase):
     """Test place can be retrieved by authorized user"""
 
     def setUp(self):
+        get_cache().clear()
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
             username='Test User',
@@ -123,3 +125,19 @@ class PrivatePlaceAPITest(TestCase):
         res = self.client.get(PLACE_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_retrieve_places_with_counts(self):
+        '''Test places are annotated with their number of whiskeys'''
+        place = Place.objects.create(user=self.user, name='BoilerMaker')
+        whiskey = Whiskey.objects.create(
+            user=self.user,
+            brand='Woodford',
+            style='Whiskey'
+        )
+        whiskey.places.add(place)
+
+        res = self.client.get(PLACE_URL, {'with_counts': 1})
+
+        self.assertEqual(res.data, [
+            {'id': place.id, 'name': 'BoilerMaker', 'whiskey_count': 1},
+        ])
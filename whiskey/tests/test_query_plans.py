@@ -0,0 +1,123 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Place, Whiskey
+
+from whiskey.cache import get_cache
+
+
+WHISKEY_URL = reverse('whiskey:whiskey-list')
+TAGS_URL = reverse('whiskey:tag-list')
+PLACE_URL = reverse('whiskey:place-list')
+
+
+def seed_collection(user, size=200):
+    """Create a tagged whiskey collection for a user"""
+    tags = Tag.objects.bulk_create(
+        Tag(user=user, name=f'Tag {i}') for i in range(20)
+    )
+    places = Place.objects.bulk_create(
+        Place(user=user, name=f'Place {i}') for i in range(20)
+    )
+    whiskeys = Whiskey.objects.bulk_create(
+        Whiskey(
+            user=user,
+            brand=f'Brand {i}',
+            style='Bourbon',
+            year=1990 + i % 30 if i % 10 else None,
+            price=i % 100 if i % 10 else None
+        )
+        for i in range(size)
+    )
+    Whiskey.tags.through.objects.bulk_create(
+        Whiskey.tags.through(whiskey_id=w.id, tag_id=tags[i % 20].id)
+        for i, w in enumerate(whiskeys)
+    )
+    Whiskey.places.through.objects.bulk_create(
+        Whiskey.places.through(whiskey_id=w.id, place_id=places[i % 20].id)
+        for i, w in enumerate(whiskeys)
+    )
+
+    return whiskeys, tags, places
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Requires PostgreSQL')
+class QueryPlanTests(TestCase):
+    """Test the hot endpoint queries are served from indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        cls.whiskeys, cls.tags, cls.places = seed_collection(cls.user)
+        other = get_user_model().objects.create_user(
+            'OtherUser',
+            'TestPass123'
+        )
+        seed_collection(other, size=2000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertNoSeqScan(self, url, params=None):
+        """Assert no query issued by a request plans a sequential scan"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            for query in ctx.captured_queries:
+                cursor.execute(f'EXPLAIN {query["sql"]}')
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+                self.assertNotIn('Seq Scan', plan, f'{query["sql"]}\n{plan}')
+
+    def test_whiskey_list_plans(self):
+        """Test listing and filtering whiskeys uses indexes"""
+        self.assertNoSeqScan(WHISKEY_URL)
+        self.assertNoSeqScan(WHISKEY_URL, {'page_size': 20})
+        self.assertNoSeqScan(WHISKEY_URL, {'tags': self.tags[0].id})
+        self.assertNoSeqScan(WHISKEY_URL, {'places': self.places[0].id})
+
+    def test_whiskey_page_plans(self):
+        """Test fetching a later whiskey page uses indexes"""
+        res = self.client.get(WHISKEY_URL, {'page_size': 20})
+
+        self.assertNoSeqScan(res.data['next'])
+
+    def test_whiskey_number_plans(self):
+        """Test price and year ranges and orderings use indexes"""
+        self.assertNoSeqScan(WHISKEY_URL, {'price_min': 10, 'price_max': 20})
+        self.assertNoSeqScan(WHISKEY_URL, {'year_min': 2000})
+        for ordering in ('price', '-price', 'year', '-year'):
+            res = self.client.get(
+                WHISKEY_URL, {'ordering': ordering, 'page_size': 20}
+            )
+            self.assertNoSeqScan(res.data['next'])
+
+    def test_whiskey_detail_plans(self):
+        """Test viewing a whiskey detail uses indexes"""
+        url = reverse('whiskey:whiskey-detail', args=[self.whiskeys[0].id])
+
+        self.assertNoSeqScan(url)
+
+    def test_attribute_list_plans(self):
+        """Test listing tags and places uses indexes"""
+        for url in (TAGS_URL, PLACE_URL):
+            self.assertNoSeqScan(url)
+            self.assertNoSeqScan(url, {'assigned_only': 1})
+            self.assertNoSeqScan(url, {'page_size': 5})
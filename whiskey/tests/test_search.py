@@ -0,0 +1,111 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Place, Whiskey
+
+from whiskey.cache import get_cache
+from whiskey.search import python_search, search_terms
+
+
+WHISKEYS_URL = reverse('whiskey:whiskey-list')
+
+
+class SearchTests(TestCase):
+    """Test searching a whiskey collection"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.smoky = Tag.objects.create(user=self.user, name='Smoky')
+        self.islay = Place.objects.create(user=self.user, name='Islay')
+        self.laphroaig = Whiskey.objects.create(
+            user=self.user, brand='Laphroaig', style='Scotch'
+        )
+        self.laphroaig.tags.add(self.smoky)
+        self.laphroaig.places.add(self.islay)
+        self.bulleit = Whiskey.objects.create(
+            user=self.user, brand='Bulleit', style='Rye'
+        )
+        self.buffalo = Whiskey.objects.create(
+            user=self.user, brand='Buffalo Trace', style='Bourbon'
+        )
+
+    def search(self, term):
+        res = self.client.get(WHISKEYS_URL, {'search': term})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [whiskey['id'] for whiskey in res.data]
+
+    def test_search_brand_prefix(self):
+        """Test searching by the start of a brand"""
+        self.assertEqual(self.search('laph'), [self.laphroaig.id])
+
+    def test_search_matches_every_word(self):
+        """Test all words of the search must match"""
+        self.assertEqual(self.search('buffalo bourbon'), [self.buffalo.id])
+        self.assertEqual(self.search('buffalo rye'), [])
+
+    def test_search_tags_and_places(self):
+        """Test searching by tag and place names"""
+        self.assertEqual(self.search('smoky'), [self.laphroaig.id])
+        self.assertEqual(self.search('islay'), [self.laphroaig.id])
+
+    def test_search_follows_relation_changes(self):
+        """Test the index follows added, renamed and deleted tags"""
+        self.bulleit.tags.add(self.smoky)
+        self.assertEqual(
+            sorted(self.search('smoky')),
+            sorted([self.laphroaig.id, self.bulleit.id])
+        )
+
+        self.smoky.name = 'Peaty'
+        self.smoky.save()
+        self.assertEqual(self.search('smoky'), [])
+        self.assertEqual(len(self.search('peaty')), 2)
+
+        self.smoky.delete()
+        self.assertEqual(self.search('peaty'), [])
+
+    def test_search_ranks_brand_over_tags(self):
+        """Test brand matches rank above tag matches"""
+        trace = Tag.objects.create(user=self.user, name='Trace')
+        self.bulleit.tags.add(trace)
+
+        self.assertEqual(
+            self.search('trace'), [self.buffalo.id, self.bulleit.id]
+        )
+
+    def test_search_limited_to_user(self):
+        """Test other users' whiskeys are not searched"""
+        other = get_user_model().objects.create_user('Other', 'TestPass123')
+        Whiskey.objects.create(user=other, brand='Laphroaig', style='Scotch')
+
+        self.assertEqual(self.search('laphroaig'), [self.laphroaig.id])
+
+    def test_search_without_words(self):
+        """Test a search without words matches nothing"""
+        self.assertEqual(self.search('!!'), [])
+
+    def test_python_search_fallback(self):
+        """Test the ranking used on databases without full-text search"""
+        queryset = Whiskey.objects.filter(user=self.user)
+
+        self.assertEqual(
+            list(python_search(queryset, search_terms('lafroaig'))),
+            [self.laphroaig]
+        )
+        self.assertEqual(
+            list(python_search(queryset, search_terms('bu'))),
+            [self.buffalo, self.bulleit]
+        )
+        self.assertEqual(
+            list(python_search(queryset, search_terms('smoky rye'))), []
+        )
@@ -0,0 +1,113 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Place, Whiskey
+
+from whiskey.cache import get_cache
+
+
+WHISKEY_URL = reverse('whiskey:whiskey-list')
+
+
+def detail_url(whiskey_id):
+    return reverse('whiskey:whiskey-detail', args=[whiskey_id])
+
+
+class SparseFieldsTests(TestCase):
+    """Test selecting whiskey fields with ?fields="""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            'TestUser',
+            'TestPass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        tag = Tag.objects.create(user=self.user, name='Smoky')
+        place = Place.objects.create(user=self.user, name='Home')
+        for i in range(5):
+            whiskey = Whiskey.objects.create(
+                user=self.user,
+                brand=f'Brand {i}',
+                style='Rye',
+                price=str(10 + i) if i % 2 else None,
+                link='https://example.com'
+            )
+            whiskey.tags.add(tag)
+            whiskey.places.add(place)
+        self.whiskey = whiskey
+
+    def test_list_fields(self):
+        """Test only the requested fields are returned and queried"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(WHISKEY_URL, {'fields': 'brand,id'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0], {'id': self.whiskey.id,
+                                       'brand': 'Brand 4'})
+        # collection version and whiskeys, without the relations
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertNotIn('"link"', ctx.captured_queries[1]['sql'])
+
+    def test_list_relation_fields(self):
+        """Test only the requested relations are prefetched"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(WHISKEY_URL, {'fields': 'id,tags'})
+
+        self.assertEqual(list(res.data[0]), ['id', 'tags'])
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertFalse(any(
+            'core_place' in query['sql'] for query in ctx.captured_queries
+        ))
+
+    def test_fast_list_identical(self):
+        """Test values() rows match the serializer with sparse fields"""
+        params = {'fields': 'brand,places', 'ordering': 'price',
+                  'page_size': 2}
+
+        def content(url, params, fast):
+            get_cache().clear()
+            with self.settings(WHISKEY_FAST_LIST=fast):
+                res = self.client.get(url, params,
+                                      HTTP_ACCEPT='application/json')
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            return res.content
+
+        self.assertEqual(content(WHISKEY_URL, params, True),
+                         content(WHISKEY_URL, params, False))
+        res = self.client.get(WHISKEY_URL, params)
+        self.assertEqual(list(res.data['results'][0]), ['brand', 'places'])
+        self.assertEqual(content(res.data['next'], None, True),
+                         content(res.data['next'], None, False))
+
+    def test_retrieve_fields(self):
+        """Test the detail can be trimmed to a few fields"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(
+                detail_url(self.whiskey.id),
+                {'fields': 'brand,image_variants'}
+            )
+
+        self.assertEqual(res.data, {'brand': 'Brand 4', 'image_variants': {}})
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_unknown_fields(self):
+        """Test unknown field names are rejected"""
+        for value in ('id,colour', ','):
+            res = self.client.get(WHISKEY_URL, {'fields': value})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('fields', res.data)
+
+    def test_list_image_fields_rejected(self):
+        """Test detail only fields cannot be requested from the list"""
+        res = self.client.get(WHISKEY_URL, {'fields': 'id,image'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
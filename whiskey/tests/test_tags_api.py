@@ -7,6 +7,7 @@ from rest_framework.test import APIClient
 
 from core.models import Tag, Whiskey
 
+from whiskey.cache import get_cache
 from whiskey.serializers import TagSerializer
 
 TAGS_URL = reverse('whiskey:tag-list')
@@ -29,6 +30,7 @@ class PrivateTagsAPITest(TestCase):
     """Test the authorized user tags API"""
 
     def setUp(self):
+        get_cache().clear()
         self.user = get_user_model().objects.create_user(
             'TestUser',
             'TestPassword123'
@@ -121,3 +123,62 @@ class PrivateTagsAPITest(TestCase):
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_retrieve_tags_with_counts(self):
+        """Test tags are annotated with their number of whiskeys"""
+        smoky = Tag.objects.create(user=self.user, name='Smoky')
+        sweet = Tag.objects.create(user=self.user, name='Sweet')
+        for brand in ('Laphroaig', 'Ardbeg'):
+            whiskey = Whiskey.objects.create(
+                brand=brand,
+                style='Scotch',
+                user=self.user
+            )
+            whiskey.tags.add(smoky)
+
+        # collection version and the annotated tags
+        with self.assertNumQueries(2):
+            res = self.client.get(TAGS_URL, {'with_counts': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': sweet.id, 'name': 'Sweet', 'whiskey_count': 0},
+            {'id': smoky.id, 'name': 'Smoky', 'whiskey_count': 2},
+        ])
+
+    def test_retrieve_tags_with_counts_true(self):
+        """Test flags also accept true and false"""
+        Tag.objects.create(user=self.user, name='Smoky')
+
+        res = self.client.get(
+            TAGS_URL, {'with_counts': 'true', 'assigned_only': 'false'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['whiskey_count'], 0)
+
+    def test_retrieve_tags_invalid_flag(self):
+        """Test a flag that is not a boolean is a bad request"""
+        res = self.client.get(TAGS_URL, {'with_counts': 'maybe'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('with_counts', res.data)
+
+    def test_retrieve_tags_assigned_with_counts(self):
+        """Test combining assigned_only with counts"""
+        tag = Tag.objects.create(user=self.user, name='Smoky')
+        Tag.objects.create(user=self.user, name='Sweet')
+        whiskey = Whiskey.objects.create(
+            brand='Laphroaig',
+            style='Scotch',
+            user=self.user
+        )
+        whiskey.tags.add(tag)
+
+        res = self.client.get(
+            TAGS_URL, {'assigned_only': 1, 'with_counts': 1}
+        )
+
+        self.assertEqual(res.data, [
+            {'id': tag.id, 'name': 'Smoky', 'whiskey_count': 1},
+        ])
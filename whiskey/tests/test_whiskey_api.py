@@ -4,7 +4,9 @@ import os
 from PIL import Image
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -12,6 +14,7 @@ from rest_framework.test import APIClient
 
 from core.models import Whiskey, Tag, Place
 
+from whiskey.cache import get_cache
 from whiskey.serializers import WhiskeySerializer, WhiskeyDetailSerializer
 
 
@@ -66,6 +69,7 @@ class PrivateWhiskeyAPITest(TestCase):
     """Test authenticated Whiskey API Access"""
 
     def setUp(self):
+        get_cache().clear()
         self.user = get_user_model().objects.create_user(
             'Test User',
             'TestPass123'
@@ -116,6 +120,38 @@ class PrivateWhiskeyAPITest(TestCase):
         serializer = WhiskeyDetailSerializer(whiskey)
         self.assertEqual(res.data, serializer.data)
 
+    def test_list_query_count_is_constant(self):
+        """Test listing whiskeys does not issue a query per whiskey"""
+        tag = sample_tag(user=self.user)
+        place = sample_place(user=self.user)
+        for i in range(10):
+            whiskey = sample_whiskey(user=self.user, brand=f'Whiskey {i}')
+            whiskey.tags.add(tag)
+            whiskey.places.add(place)
+
+        # collection version, whiskeys, tags and places
+        with self.assertNumQueries(4):
+            res = self.client.get(WHISKEY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 10)
+        self.assertEqual(res.data[0]['tags'], [tag.id])
+        self.assertEqual(res.data[0]['places'], [place.id])
+
+    def test_detail_query_count_is_constant(self):
+        """Test viewing a whiskey detail prefetches nested relations"""
+        whiskey = sample_whiskey(user=self.user)
+        for i in range(5):
+            whiskey.tags.add(sample_tag(user=self.user, name=f'Tag {i}'))
+            whiskey.places.add(sample_place(user=self.user, name=f'Bar {i}'))
+
+        # collection version, whiskey, tags and places
+        with self.assertNumQueries(4):
+            res = self.client.get(detail_url(whiskey.id))
+
+        self.assertEqual(len(res.data['tags']), 5)
+        self.assertEqual(len(res.data['places']), 5)
+
     def test_create_basic_whiskey(self):
         """Test creating a whiskey"""
         payload = {
@@ -168,6 +204,56 @@ class PrivateWhiskeyAPITest(TestCase):
         self.assertIn(place1, places)
         self.assertIn(place2, places)
 
+    def test_create_whiskey_tags_single_lookup(self):
+        """Test submitted tag ids are resolved with a single query"""
+        tags = [sample_tag(user=self.user, name=f'Tag {i}') for i in range(20)]
+        payload = {
+            'brand': 'Jack Daniel',
+            'style': 'Bourbon',
+            'tags': [tag.id for tag in tags],
+            'places': []
+        }
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(WHISKEY_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        tag_lookups = [
+            query for query in ctx.captured_queries
+            if '"core_tag"."id" IN' in query['sql']
+        ]
+        self.assertEqual(len(tag_lookups), 1)
+        self.assertEqual(len(res.data['tags']), 20)
+
+    def test_create_whiskey_with_other_users_tag(self):
+        """Test tags owned by another user are rejected"""
+        user2 = get_user_model().objects.create_user('Other', 'Testpass123')
+        tag = sample_tag(user=user2)
+        payload = {
+            'brand': 'Jack Daniel',
+            'style': 'Bourbon',
+            'tags': [tag.id],
+        }
+
+        res = self.client.post(WHISKEY_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Whiskey.objects.exists())
+
+    def test_create_whiskey_reports_missing_tags_together(self):
+        """Test every missing tag id is reported in one response"""
+        tag = sample_tag(user=self.user)
+        payload = {
+            'brand': 'Jack Daniel',
+            'style': 'Bourbon',
+            'tags': [tag.id, 0, -1],
+        }
+
+        res = self.client.post(WHISKEY_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['tags']), 2)
+
     def test_update_whiskey_partial(self):
         """Test updating a whiskey with patch"""
         whiskey = sample_whiskey(user=self.user)
@@ -205,6 +291,7 @@ class PrivateWhiskeyAPITest(TestCase):
 class WhiskeyImageUploadTest(TestCase):
 
     def setUp(self):
+        get_cache().clear()
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
             'SampleUser',
@@ -217,7 +304,7 @@ class WhiskeyImageUploadTest(TestCase):
         self.whiskey.image.delete()
 
     def test_upload_image_to_whiskey(self):
-        """Test uploaded an image to whiskey"""
+        """Test uploading an image to whiskey queues its processing"""
         url = image_upload_url(self.whiskey.id)
         with tempfile.NamedTemporaryFile(suffix='.jpeg') as ntf:
             img = Image.new('RGB', (10, 10))
@@ -225,8 +312,9 @@ class WhiskeyImageUploadTest(TestCase):
             ntf.seek(0)
             res = self.client.post(url, {'image': ntf}, format='multipart')
             self.whiskey.refresh_from_db()
-            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
             self.assertIn('image', res.data)
+            self.assertEqual(res.data['image_status'], 'pending')
             self.assertTrue(os.path.exists(self.whiskey.image.path))
 
     def test_upload_image_bad_request(self):
@@ -279,3 +367,220 @@ class WhiskeyImageUploadTest(TestCase):
         self.assertIn(serializer1.data, res.data)
         self.assertIn(serializer2.data, res.data)
         self.assertNotIn(serializer3.data, res.data)
+
+
+class WhiskeyMatchFilterTests(TestCase):
+    """Test matching any or all of the requested tags and places"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            'test@testemail.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.smoky = sample_tag(user=self.user, name='Smoky')
+        self.sweet = sample_tag(user=self.user, name='Sweet')
+        self.home = sample_place(user=self.user, name='Home')
+        self.bar = sample_place(user=self.user, name='Bar')
+        self.both = sample_whiskey(user=self.user, brand='Both')
+        self.both.tags.add(self.smoky, self.sweet)
+        self.both.places.add(self.home, self.bar)
+        self.smoky_only = sample_whiskey(user=self.user, brand='Smoky only')
+        self.smoky_only.tags.add(self.smoky)
+        self.smoky_only.places.add(self.home)
+        sample_whiskey(user=self.user, brand='Plain')
+
+    def get_ids(self, params):
+        res = self.client.get(WHISKEY_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [whiskey['id'] for whiskey in res.data]
+
+    def test_match_any_returns_unique_rows(self):
+        """Test whiskeys matching several ids are returned once"""
+        ids = self.get_ids({
+            'tags': f'{self.smoky.id},{self.sweet.id}',
+            'places': f'{self.home.id},{self.bar.id}',
+        })
+
+        self.assertEqual(ids, [self.smoky_only.id, self.both.id])
+
+    def test_match_all_tags(self):
+        """Test matching whiskeys with every requested tag"""
+        ids = self.get_ids({
+            'tags': f'{self.smoky.id},{self.sweet.id},{self.sweet.id}',
+            'tags_match': 'all',
+        })
+
+        self.assertEqual(ids, [self.both.id])
+
+    def test_match_all_places_with_any_tags(self):
+        """Test combining match modes across relations"""
+        ids = self.get_ids({
+            'tags': f'{self.sweet.id}',
+            'places': f'{self.home.id}',
+            'places_match': 'all',
+        })
+
+        self.assertEqual(ids, [self.both.id])
+
+    def test_invalid_match_mode(self):
+        """Test an unknown match mode is rejected"""
+        res = self.client.get(
+            WHISKEY_URL, {'tags': f'{self.smoky.id}', 'tags_match': 'most'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags_match', res.data)
+
+    def test_match_filters_do_not_join_relations(self):
+        """Test filters use subqueries instead of joining through tables"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(WHISKEY_URL, {
+                'tags': f'{self.smoky.id}',
+                'places': f'{self.home.id}',
+                'places_match': 'all',
+            })
+
+        select = next(
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT "core_whiskey"."id"')
+        )
+        self.assertNotIn('INNER JOIN', select)
+        self.assertIn('EXISTS', select)
+        self.assertIn('HAVING', select)
+
+
+class WhiskeyNumberFieldTests(TestCase):
+    """Test numeric prices and years, their filters and ordering"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            'test@testemail.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.cheap = sample_whiskey(
+            user=self.user, brand='Cheap', price='19.99', year=2018
+        )
+        self.dear = sample_whiskey(
+            user=self.user, brand='Dear', price='150', year=1995
+        )
+        self.unpriced = sample_whiskey(user=self.user, brand='Unpriced')
+
+    def get_ids(self, params):
+        res = self.client.get(WHISKEY_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [whiskey['id'] for whiskey in res.data]
+
+    def test_numbers_keep_string_format(self):
+        """Test prices and years are still read and written as strings"""
+        res = self.client.post(
+            WHISKEY_URL,
+            {'brand': 'Ardbeg', 'style': 'Scotch', 'year': '2010',
+             'price': '45.5'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['year'], '2010')
+        self.assertEqual(res.data['price'], '45.50')
+        whiskey = Whiskey.objects.get(id=res.data['id'])
+        self.assertEqual(whiskey.year, 2010)
+        self.assertEqual(str(whiskey.price), '45.50')
+
+    def test_blank_numbers(self):
+        """Test missing prices and years are read and written as ''"""
+        res = self.client.post(
+            WHISKEY_URL,
+            {'brand': 'Ardbeg', 'style': 'Scotch', 'year': '', 'price': ''}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['year'], '')
+        self.assertEqual(res.data['price'], '')
+        whiskey = Whiskey.objects.get(id=res.data['id'])
+        self.assertIsNone(whiskey.year)
+        self.assertIsNone(whiskey.price)
+
+    def test_formatted_numbers(self):
+        """Test prices are read like the migration from text read them"""
+        res = self.client.post(
+            WHISKEY_URL,
+            {'brand': 'Ardbeg', 'style': 'Scotch', 'year': '2010',
+             'price': '$1,200'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['price'], '1200.00')
+
+    def test_invalid_numbers(self):
+        """Test prices and years that are not numbers are rejected"""
+        res = self.client.post(
+            WHISKEY_URL,
+            {'brand': 'Ardbeg', 'style': 'Scotch', 'year': 'old',
+             'price': '-1'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('year', res.data)
+        self.assertIn('price', res.data)
+
+    def test_range_filters(self):
+        """Test filtering whiskeys by price and year ranges"""
+        self.assertEqual(self.get_ids({'price_max': '20'}), [self.cheap.id])
+        self.assertEqual(self.get_ids({'price_min': '20'}), [self.dear.id])
+        self.assertEqual(
+            self.get_ids({'year_min': '1990', 'year_max': '2000'}),
+            [self.dear.id]
+        )
+
+    def test_invalid_range_filter(self):
+        """Test a range bound that is not a number is rejected"""
+        res = self.client.get(WHISKEY_URL, {'price_min': 'cheap'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('price_min', res.data)
+
+    def test_ordering_puts_missing_values_last(self):
+        """Test ordering by price in either direction"""
+        self.assertEqual(
+            self.get_ids({'ordering': 'price'}),
+            [self.cheap.id, self.dear.id, self.unpriced.id]
+        )
+        self.assertEqual(
+            self.get_ids({'ordering': '-price'}),
+            [self.dear.id, self.cheap.id, self.unpriced.id]
+        )
+        self.assertEqual(
+            self.get_ids({'ordering': 'year'}),
+            [self.dear.id, self.cheap.id, self.unpriced.id]
+        )
+
+    def test_invalid_ordering(self):
+        """Test ordering by an unsupported field is rejected"""
+        res = self.client.get(WHISKEY_URL, {'ordering': 'link'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ordered_pages(self):
+        """Test keyset pages follow the requested ordering past nulls"""
+        second_unpriced = sample_whiskey(user=self.user, brand='Unpriced 2')
+        for ordering in ('price', '-price'):
+            ids = []
+            url, params = WHISKEY_URL, {'ordering': ordering, 'page_size': 1}
+            while url:
+                res = self.client.get(url, params)
+                ids.extend(whiskey['id'] for whiskey in res.data['results'])
+                url, params = res.data['next'], None
+
+            self.assertEqual(ids, self.get_ids({'ordering': ordering}))
+            self.assertEqual(
+                ids[2:],
+                sorted(
+                    [self.unpriced.id, second_unpriced.id],
+                    reverse=ordering.startswith('-')
+                )
+            )
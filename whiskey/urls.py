@@ -12,5 +12,16 @@ router.register('whiskeys', views.WhiskeyViewSet)
 app_name = 'whiskey'
 
 urlpatterns = [
+    path(
+        'autocomplete/',
+        views.AutocompleteView.as_view(),
+        name='autocomplete'
+    ),
+    path(
+        'collection-stats/',
+        views.CollectionStatsView.as_view(),
+        name='collection-stats'
+    ),
+    path('cache-stats/', views.CacheStatsView.as_view(), name='cache-stats'),
     path('', include(router.urls))
 ]
@@ -1,33 +1,119 @@
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Avg, Count, Exists, IntegerField, Max, Min, \
+                             OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.fields import BooleanField
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.views import APIView
+
+from core.models import CollectionStats, ImageStatus, Tag, Place, Whiskey
+from core.renderers import FastJSONRenderer
 
-from core.models import Tag, Place, Whiskey
+from user.authentication import CachedTokenAuthentication
 
 from whiskey import serializers
+from whiskey.autocomplete import SOURCES, autocomplete_index
+from whiskey.export import NDJSONRenderer, CSVRenderer, ENCODERS, \
+                          iter_collection
+from whiskey.images import IMAGE_TYPES, ImageRenderer, process_upload, \
+                           variant_cache
+from whiskey.imaging import CONTENT_TYPES
+from whiskey.cache import CachedListMixin, CachedRetrieveMixin, \
+                         CollectionWriteMixin, get_stats
+from whiskey.pagination import order_expressions
+from whiskey.rows import ValuesListMixin, blank_string
+from whiskey.search import search
+from whiskey.stats import rebuild_stats
 
 
-class BaseWhiskeyAttrViewset(viewsets.GenericViewSet,
+# Room left for multipart boundaries and headers when comparing the length
+# of an upload request with the image size limit
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class BaseWhiskeyAttrViewset(CollectionWriteMixin,
+                             CachedListMixin,
+                             ValuesListMixin,
+                             viewsets.GenericViewSet,
                              mixins.ListModelMixin,
                              mixins.CreateModelMixin):
     """Base viewset for user owned whiskey attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    ordering = ('-name', '-id')
+    value_fields = ('id', 'name')
 
-    def get_queryset(self):
-        """Return objects for the current authenticated user only"""
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only', 0))
+    def _flag(self, name):
+        """Return a boolean query parameter such as 1, 0, true or false"""
+        value = self.request.query_params.get(name)
+        if value is None:
+            return False
+        try:
+            return BooleanField().to_internal_value(value)
+        except ValidationError as exc:
+            raise ValidationError({name: exc.detail})
+
+    def _whiskey_rows(self):
+        """Return the through table rows of each object and their column"""
+        field = Whiskey._meta.get_field(self.relation_name)
+        column = f'{field.m2m_reverse_field_name()}_id'
+        rows = field.remote_field.through.objects.filter(
+            **{column: OuterRef('pk')}
         )
+
+        return rows, column
+
+    def get_queryset(self):
+        """Return objects for the current authenticated user only
+
+        assigned_only and with_counts use correlated subqueries on the
+        through table, so objects are never joined to their whiskeys.
+        """
         queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(whiskey__isnull=False)
+        rows, column = self._whiskey_rows()
+        if self._flag('assigned_only'):
+            queryset = queryset.filter(Exists(rows))
+        if self._flag('with_counts'):
+            queryset = queryset.annotate(whiskey_count=Coalesce(
+                Subquery(
+                    rows.order_by().values(column).annotate(
+                        count=Count('*')
+                    ).values('count'),
+                    output_field=IntegerField()
+                ),
+                0
+            ))
 
         return queryset.filter(
             user=self.request.user
-        ).order_by('-name').distinct()
+        ).order_by(*self.ordering)
+
+    def get_value_fields(self):
+        """Return the values() fields of the fast list path"""
+        if self._flag('with_counts'):
+            return self.value_fields + ('whiskey_count',)
+
+        return self.value_fields
+
+    def get_serializer_class(self):
+        """Return the serializer including usage counts if requested"""
+        if self.action == 'list' and self._flag('with_counts'):
+            return self.count_serializer_class
+
+        return self.serializer_class
 
     def perform_create(self, serializer):
         """Create a new object"""
@@ -38,20 +124,49 @@ class TagViewSet(BaseWhiskeyAttrViewset):
     """Manage tags in the database"""
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    count_serializer_class = serializers.TagCountSerializer
+    relation_name = 'tags'
 
 
 class PlaceViewSet(BaseWhiskeyAttrViewset):
     """Manage places in the database"""
     queryset = Place.objects.all()
     serializer_class = serializers.PlaceSerializer
+    count_serializer_class = serializers.PlaceCountSerializer
+    relation_name = 'places'
 
 
-class WhiskeyViewSet(viewsets.ModelViewSet):
+class WhiskeyViewSet(CollectionWriteMixin,
+                     CachedListMixin,
+                     CachedRetrieveMixin,
+                     ValuesListMixin,
+                     viewsets.ModelViewSet):
     """Manage Whiskeys in database"""
     serializer_class = serializers.WhiskeySerializer
     queryset = Whiskey.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    ordering = ('-id',)
+    row_fields = ('id', 'user', 'brand', 'style', 'year', 'price', 'link')
+    image_fields = ('image', 'image_status')
+    value_fields = ('id', 'brand', 'style', 'year', 'price', 'link')
+    value_formatters = {'year': blank_string, 'price': blank_string}
+    relation_fields = ('tags', 'places')
+    match_modes = ('any', 'all')
+    ordering_fields = ('id', 'price', 'year')
+    range_filters = {
+        'price_min': 'price__gte',
+        'price_max': 'price__lte',
+        'year_min': 'year__gte',
+        'year_max': 'year__lte',
+    }
+    related_fields = {
+        'list': ('id',),
+        'retrieve': ('id', 'name'),
+        'bulk_create': ('id',),
+    }
+    sparse_actions = ('list', 'retrieve')
+    field_columns = {'image_variants': ('image', 'image_status')}
 
     def _params_to_ints(self, qs):
         '''convert a list of string ids to a list of integers'''
@@ -59,17 +174,162 @@ class WhiskeyViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Retrieve the Whiskeys for the authenticated user"""
-        tags = self.request.query_params.get('tags')
-        places = self.request.query_params.get('places')
         queryset = self.queryset
-        if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
-        if places:
-            places_id = self._params_to_ints(places)
-            queryset = queryset.filter(places__id__in=places_id)
+        for name in self.relation_fields:
+            ids = self.request.query_params.get(name)
+            if ids:
+                queryset = queryset.filter(self._related_filter(
+                    name,
+                    self._params_to_ints(ids),
+                    self.request.query_params.get(f'{name}_match', 'any')
+                ))
+
+        for param, lookup in self.range_filters.items():
+            value = self.request.query_params.get(param)
+            if value:
+                queryset = queryset.filter(
+                    **{lookup: self._param_to_field_value(param, lookup)}
+                )
+
+        queryset = queryset.filter(
+            user=self.request.user
+        ).order_by(*order_expressions(Whiskey, self.ordering))
+
+        term = self.request.query_params.get('search')
+        if term:
+            queryset = search(queryset, term)
+            if self.action == 'list':
+                queryset = queryset[:settings.WHISKEY_SEARCH_LIMIT]
+
+        return self._plan_queryset(queryset)
+
+    def _param_to_field_value(self, param, lookup):
+        """Convert a query parameter to a value of the filtered field"""
+        field = Whiskey._meta.get_field(lookup.split('__')[0])
+        try:
+            return field.to_python(self.request.query_params[param])
+        except DjangoValidationError as exc:
+            raise ValidationError({param: exc.messages})
+
+    def get_ordering(self, request):
+        """Return the ordering requested with ?ordering=, ending with id"""
+        ordering = request.query_params.get('ordering')
+        if not ordering:
+            return self.ordering
+        name = ordering[1:] if ordering.startswith('-') else ordering
+        if name not in self.ordering_fields:
+            raise ValidationError({'ordering': [
+                f'"{ordering}" is not one of '
+                f'{", ".join(self.ordering_fields)}.'
+            ]})
+        if name == 'id':
+            return (ordering,)
 
-        return queryset.filter(user=self.request.user)
+        return (ordering, '-id' if ordering.startswith('-') else 'id')
+
+    def get_requested_fields(self, request):
+        """Return the fields selected with ?fields=, or None for all"""
+        param = request.query_params.get('fields')
+        if param is None or self.action not in self.sparse_actions:
+            return None
+        available = self.get_serializer_class().Meta.fields
+        fields = [name.strip() for name in param.split(',') if name.strip()]
+        unknown = [name for name in fields if name not in available]
+        if unknown or not fields:
+            raise ValidationError({'fields': [
+                f'"{name}" is not one of {", ".join(available)}.'
+                for name in unknown or ['']
+            ]})
+
+        return tuple(dict.fromkeys(fields))
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.ordering = self.get_ordering(request)
+        self.requested_fields = self.get_requested_fields(request)
+
+    def get_serializer(self, *args, **kwargs):
+        if getattr(self, 'requested_fields', None) is not None:
+            kwargs['fields'] = self.requested_fields
+
+        return super().get_serializer(*args, **kwargs)
+
+    def get_value_fields(self):
+        """Return the requested fields read from values() rows"""
+        return self._requested(self.value_fields)
+
+    def get_relation_fields(self):
+        """Return the requested relations listed as ids"""
+        return self._requested(self.relation_fields)
+
+    def get_key_fields(self):
+        """Return the columns of the ordering key"""
+        return tuple(name.lstrip('-') for name in self.ordering)
+
+    def _requested(self, fields):
+        """Return the fields that ?fields= selected, in their order"""
+        requested = getattr(self, 'requested_fields', None)
+        if requested is None:
+            return fields
+
+        return tuple(name for name in fields if name in requested)
+
+    def _related_filter(self, name, ids, match):
+        """Return a filter on the ids of a relation without joining it
+
+        'any' matches whiskeys with at least one of the ids through an
+        EXISTS subquery, 'all' matches whiskeys with every id by grouping
+        the through table rows, so each whiskey is returned once.
+        """
+        if match not in self.match_modes:
+            raise ValidationError({f'{name}_match': [
+                f'"{match}" is not one of {", ".join(self.match_modes)}.'
+            ]})
+
+        field = Whiskey._meta.get_field(name)
+        source = f'{field.m2m_field_name()}_id'
+        target = f'{field.m2m_reverse_field_name()}_id'
+        rows = field.remote_field.through.objects.filter(
+            **{f'{target}__in': ids}
+        )
+        if match == 'any':
+            return Exists(rows.filter(**{source: OuterRef('pk')}))
+
+        return Q(pk__in=rows.values(source).annotate(
+            matched=Count(target)
+        ).filter(matched=len(set(ids))).values(source))
+
+    def _plan_queryset(self, queryset):
+        """Load only the columns and relations the action serializes
+
+        With ?fields= the columns are narrowed to the requested fields
+        and the ordering key, and unrequested relations are not fetched.
+        """
+        related_fields = self.related_fields.get(self.action)
+        if related_fields is None:
+            return queryset
+
+        row_fields = self.row_fields
+        if self.action == 'retrieve':
+            row_fields += self.image_fields
+        requested = getattr(self, 'requested_fields', None)
+        if requested is not None:
+            columns = {'id', 'user', *self.get_key_fields()}
+            for name in requested:
+                columns.update(self.field_columns.get(name, (name,)))
+            row_fields = tuple(
+                name for name in row_fields if name in columns
+            )
+
+        return queryset.only(*row_fields).prefetch_related(*(
+            Prefetch(
+                name,
+                queryset=Whiskey._meta.get_field(
+                    name
+                ).related_model.objects.only(*related_fields).order_by('id')
+            )
+            for name in self.get_relation_fields()
+        ))
 
     def get_serializer_class(self):
         """Return appropiate serializer class"""
@@ -77,30 +337,293 @@ class WhiskeyViewSet(viewsets.ModelViewSet):
             return serializers.WhiskeyDetailSerializer
         elif self.action == 'upload_image':
             return serializers.WhiskeyImageSerializer
+        elif self.action == 'bulk_create':
+            return serializers.WhiskeyBulkSerializer
 
         return self.serializer_class
 
+    def paginate_queryset(self, queryset):
+        """Return search results by rank rather than by page"""
+        if self.request.query_params.get('search'):
+            return None
+
+        return super().paginate_queryset(queryset)
+
     def perform_create(self, serializer):
         """Create a new whiskey"""
         serializer.save(user=self.request.user)
 
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk_create(self, request):
+        """Create a list of whiskeys in a single transaction"""
+        if isinstance(request.data, list) and \
+                len(request.data) > settings.WHISKEY_BULK_MAX_ITEMS:
+            return Response(
+                {'non_field_errors': [
+                    'Ensure this list has no more than '
+                    f'{settings.WHISKEY_BULK_MAX_ITEMS} items.'
+                ]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = self.get_serializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        whiskeys = serializer.save(user=request.user)
+        created = self.get_queryset().filter(
+            pk__in=[whiskey.pk for whiskey in whiskeys]
+        ).order_by('id')
+
+        return Response(
+            self.get_serializer(created, many=True).data,
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(
+        methods=['GET'],
+        detail=False,
+        renderer_classes=(NDJSONRenderer, CSVRenderer)
+    )
+    def export(self, request):
+        """Stream the whole collection as NDJSON or CSV"""
+        renderer = request.accepted_renderer
+        rows = iter_collection(
+            self.get_queryset(),
+            settings.WHISKEY_EXPORT_CHUNK_SIZE
+        )
+        response = StreamingHttpResponse(
+            ENCODERS[renderer.format](rows),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="whiskeys.{renderer.format}"'
+
+        return response
+
+    @action(methods=['GET'], detail=False)
+    def facets(self, request):
+        """Return histograms of the filtered collection"""
+        return self.cached_response(self.compute_facets, request)
+
+    def compute_facets(self, request):
+        """Aggregate the filtered whiskeys with one query per facet"""
+        whiskeys = self.get_queryset().order_by()
+        if request.query_params.get('search'):
+            whiskeys = Whiskey.objects.filter(pk__in=whiskeys.values('pk'))
+
+        stats = whiskeys.aggregate(
+            count=Count('pk'),
+            min=Min('price'),
+            max=Max('price'),
+            avg=Avg('price')
+        )
+        cent = Decimal('0.01')
+        facets = OrderedDict([
+            ('count', stats.pop('count')),
+            ('price', OrderedDict(
+                (name, None if value is None else str(
+                    Decimal(value).quantize(cent)
+                ))
+                for name, value in stats.items()
+            )),
+        ])
+        for name, ordering in (('style', ('-count', 'style')),
+                               ('year', order_expressions(Whiskey, ['year']))):
+            facets[f'{name}s'] = [
+                {'value': blank_string(row[name]), 'count': row['count']}
+                for row in whiskeys.values(name).annotate(
+                    count=Count('pk')
+                ).order_by(*ordering)
+            ]
+        for name in self.relation_fields:
+            field = Whiskey._meta.get_field(name)
+            source = f'{field.m2m_field_name()}_id'
+            target = field.m2m_reverse_field_name()
+            rows = field.remote_field.through.objects.filter(
+                **{f'{source}__in': whiskeys.values('pk')}
+            ).values(f'{target}_id', f'{target}__name').annotate(
+                count=Count(source)
+            ).order_by('-count', f'{target}__name', f'{target}_id')
+            facets[name] = [
+                {
+                    'id': row[f'{target}_id'],
+                    'name': row[f'{target}__name'],
+                    'count': row['count'],
+                }
+                for row in rows
+            ]
+
+        return Response(facets)
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """Upload an image to a whiskey"""
+        """Upload an image to a whiskey and queue its processing"""
         whiskey = self.get_object()
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length > settings.WHISKEY_IMAGE_MAX_UPLOAD_BYTES + \
+                MULTIPART_OVERHEAD:
+            return Response(
+                {'image': [
+                    'Ensure the image is at most '
+                    f'{settings.WHISKEY_IMAGE_MAX_UPLOAD_BYTES} bytes.'
+                ]},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
         serializer = self.get_serializer(
             whiskey,
             data=request.data
         )
 
         if serializer.is_valid():
-            serializer.save()
+            # The lock storing the image is held until its reference is
+            # counted, see ContentAddressedStorage
+            with transaction.atomic():
+                serializer.save(image_status=ImageStatus.PENDING)
+            process_upload(whiskey)
             return Response(
-                serializer.data,
-                status=status.HTTP_200_OK
+                self.get_serializer(whiskey).data,
+                status=status.HTTP_202_ACCEPTED
+                if whiskey.image_status == ImageStatus.PENDING
+                else status.HTTP_200_OK
             )
 
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+    @action(
+        methods=['GET'],
+        detail=True,
+        renderer_classes=(FastJSONRenderer, ImageRenderer)
+    )
+    def image(self, request, pk=None):
+        """Serve the image resized to ?width= in the ?type= format"""
+        whiskey = self.get_object()
+        if not whiskey.image:
+            raise NotFound('This whiskey has no image.')
+        width = self.get_image_width()
+        image_format = self.get_image_format()
+
+        etag = quote_etag(variant_cache.key(
+            whiskey.image.name, width, image_format
+        ))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                variant = variant_cache.open(
+                    whiskey.image.name, width, image_format
+                )
+            except OSError:
+                raise NotFound('The image could not be read.')
+            response = FileResponse(
+                variant, content_type=CONTENT_TYPES[image_format]
+            )
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+
+        return response
+
+    def get_image_width(self):
+        """Return the width requested for a resized image"""
+        width = self.request.query_params.get('width')
+        if width is None:
+            return settings.WHISKEY_IMAGE_MAX_SIZE
+        try:
+            width = int(width)
+        except ValueError:
+            width = 0
+        if not 0 < width <= settings.WHISKEY_IMAGE_MAX_SIZE:
+            raise ValidationError({'width': [
+                'Ensure this value is between 1 and '
+                f'{settings.WHISKEY_IMAGE_MAX_SIZE}.'
+            ]})
+
+        return width
+
+    def get_image_format(self):
+        """Return the format requested for a resized image"""
+        name = self.request.query_params.get('type', 'webp')
+        if name not in IMAGE_TYPES:
+            raise ValidationError({'type': [
+                f'"{name}" is not one of {", ".join(IMAGE_TYPES)}.'
+            ]})
+
+        return IMAGE_TYPES[name]
+
+
+class CacheStatsView(APIView):
+    """Report response cache counters for monitoring"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, format=None):
+        """Return the hit and miss counters of this process"""
+        return Response(get_stats())
+
+
+class CollectionStatsView(APIView):
+    """Return the running totals of the user's collection"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, format=None):
+        """Read the statistics row, building it if it is missing"""
+        stats = CollectionStats.objects.filter(user=request.user).first()
+        if stats is None:
+            stats = rebuild_stats(request.user.pk)
+
+        return Response(serializers.CollectionStatsSerializer(stats).data)
+
+
+class AutocompleteView(APIView):
+    """Complete brand, tag and place names from a typed prefix"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get_limit(self):
+        """Return the number of completions requested per kind"""
+        limit = self.request.query_params.get('limit')
+        if limit is None:
+            return settings.WHISKEY_AUTOCOMPLETE_LIMIT
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= settings.WHISKEY_AUTOCOMPLETE_MAX_LIMIT:
+            raise ValidationError({'limit': [
+                'Ensure this value is between 1 and '
+                f'{settings.WHISKEY_AUTOCOMPLETE_MAX_LIMIT}.'
+            ]})
+
+        return limit
+
+    def get_kinds(self):
+        """Return the kinds of names to complete"""
+        kinds = self.request.query_params.get('kinds')
+        if not kinds:
+            return list(SOURCES)
+        kinds = kinds.split(',')
+        unknown = [kind for kind in kinds if kind not in SOURCES]
+        if unknown:
+            raise ValidationError({'kinds': [
+                f'Unknown kind "{kind}".' for kind in unknown
+            ]})
+
+        return kinds
+
+    def get(self, request, format=None):
+        """Return the first names of each kind starting with q"""
+        return Response(autocomplete_index.complete(
+            request.user.pk,
+            request.query_params.get('q', ''),
+            self.get_limit(),
+            self.get_kinds()
+        ))